@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк задержки ответов бота при одновременных пользователях
+
+Запуск:
+    python benchmarks/bench_bot_latency.py [пользователей ...]
+
+Поднимает локальный поддельный Bot API (каждый запрос отвечает с задержкой
+сети) и сравнивает две схемы обработки одних и тех же команд /last и /top:
+  • прежнюю — синхронные обработчики telebot на пуле из 2 потоков
+    (как infinity_polling по умолчанию) с time.sleep между карточками;
+  • новую — Application из bot/bot.py с concurrent_updates.
+Задержка пользователя — время от прихода обновления до последнего
+сообщения, которое получил его чат
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+import requests
+from telegram import Update
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_snapshot import generate_products
+from utils.storage import write_products_atomic
+
+import bot.bot as bot_module
+from bot.bot import ProductCache, build_application, format_product_card
+from utils.product import Product
+
+TOKEN = '123456:BENCHMARK'
+API_LATENCY = 0.05  # задержка ответа Bot API, секунды
+LEGACY_THREADS = 2  # потоков у telebot по умолчанию
+PRODUCTS = 10000
+
+# Сколько карточек получает чат за команду
+EXPECTED_CARDS = {'/last': 5, '/top': 1}
+
+
+class FakeBotAPI:
+    """
+    Минимальный HTTP/1.1 сервер с методами Bot API, нужными командам
+    Запоминает время каждой доставленной карточки по chat_id
+    (альбом sendMediaGroup — по карточке на фото) и число запросов
+    """
+
+    def __init__(self, latency: float = API_LATENCY):
+        self.latency = latency
+        self.sends: Dict[int, List[float]] = defaultdict(list)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.port = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> 'FakeBotAPI':
+        ready = threading.Event()
+        self.loop.call_soon(ready.set)
+        self.thread.start()
+        ready.wait()
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, '127.0.0.1', 0), self.loop
+        )
+        self.server = future.result()
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    def reset(self):
+        with self.lock:
+            self.sends.clear()
+            self.calls = 0
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                method = request_line.split()[1].decode().rsplit('/', 1)[-1]
+                params = self._params(headers.get('content-type', ''), body)
+                await asyncio.sleep(self.latency)
+                payload = json.dumps(self._reply(method, params)).encode()
+
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(payload)}\r\n\r\n'.encode() + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _params(content_type: str, body: bytes) -> Dict[str, str]:
+        if 'json' in content_type:
+            return json.loads(body or b'{}')
+        if 'multipart' in content_type:
+            # Bot API клиенты шлют альбом multipart-ом; нужны только chat_id и media
+            params = {}
+            for name in ('chat_id', 'media'):
+                match = re.search(rb'name="%s"\r\n(?:[^\r\n]+\r\n)*\r\n(.*?)\r\n--' % name.encode(), body, re.S)
+                if match:
+                    params[name] = match.group(1).decode()
+            return params
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _reply(self, method: str, params: Dict[str, str]) -> dict:
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'PriceHunter', 'username': 'PriceHunter2bot',
+                      'can_join_groups': True, 'can_read_all_group_messages': False,
+                      'supports_inline_queries': False}
+        elif method in ('sendMessage', 'sendPhoto', 'sendMediaGroup'):
+            chat_id = int(params['chat_id'])
+            cards = len(json.loads(params['media'])) if method == 'sendMediaGroup' else 1
+            with self.lock:
+                self.calls += 1
+                self.sends[chat_id].extend([time.perf_counter()] * cards)
+            message = {'message_id': 1, 'date': int(time.time()),
+                       'chat': {'id': chat_id, 'type': 'private'}, 'text': 'ok'}
+            result = [message] * cards if method == 'sendMediaGroup' else message
+        else:
+            result = True
+        return {'ok': True, 'result': result}
+
+
+# ========== ПРЕЖНЯЯ СХЕМА: синхронные обработчики на пуле потоков ==========
+
+_sessions = threading.local()
+
+
+def _legacy_call(api: FakeBotAPI, method: str, **params):
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    session.post(f"{api.base_url}{TOKEN}/{method}", data=params).raise_for_status()
+
+
+def _legacy_handle(api: FakeBotAPI, chat_id: int, command: str):
+    """
+    Повторяет прежние обработчики /last и /top: блокирующие отправки и паузы
+    """
+    products = bot_module.load_products()
+    if command == '/last':
+        for product in map(Product.from_dict, products[:5]):
+            text = format_product_card(product)
+            if product.image:
+                _legacy_call(api, 'sendPhoto', chat_id=chat_id, photo=product.image, caption=text, parse_mode='HTML')
+            else:
+                _legacy_call(api, 'sendMessage', chat_id=chat_id, text=text, parse_mode='HTML')
+            time.sleep(0.5)
+    else:
+        text = "🏆 <b>ТОП-10 САМЫХ ВЫГОДНЫХ ПРЕДЛОЖЕНИЙ</b>\n\n"
+        for i, product in enumerate(map(Product.from_dict, products[:10]), 1):
+            text += f"{i}. {product.name[:50]}\n"
+        _legacy_call(api, 'sendMessage', chat_id=chat_id, text=text, parse_mode='HTML')
+
+
+def run_legacy(api: FakeBotAPI, users: List[Tuple[int, str]]) -> Dict[int, float]:
+    started = {}
+    with ThreadPoolExecutor(max_workers=LEGACY_THREADS) as pool:
+        for chat_id, command in users:
+            started[chat_id] = time.perf_counter()
+            pool.submit(_legacy_handle, api, chat_id, command)
+    return started
+
+
+# ========== НОВАЯ СХЕМА: Application из bot/bot.py ==========
+
+def _update(update_id: int, chat_id: int, command: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+            'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        },
+    }
+
+
+async def _run_async(api: FakeBotAPI, users: List[Tuple[int, str]]) -> Dict[int, float]:
+    application = build_application(TOKEN, base_url=api.base_url)
+    await application.initialize()
+    await application.start()
+
+    started = {}
+    for update_id, (chat_id, command) in enumerate(users, 1):
+        started[chat_id] = time.perf_counter()
+        await application.update_queue.put(Update.de_json(_update(update_id, chat_id, command), application.bot))
+
+    while not _all_answered(api, users):
+        await asyncio.sleep(0.05)
+
+    await application.stop()
+    await application.shutdown()
+    return started
+
+
+def run_async(api: FakeBotAPI, users: List[Tuple[int, str]]) -> Dict[int, float]:
+    return asyncio.run(_run_async(api, users))
+
+
+# ========== ИЗМЕРЕНИЕ ==========
+
+def _all_answered(api: FakeBotAPI, users: List[Tuple[int, str]]) -> bool:
+    with api.lock:
+        return all(len(api.sends[chat_id]) >= EXPECTED_CARDS[command] for chat_id, command in users)
+
+
+def measure(api: FakeBotAPI, runner, users: List[Tuple[int, str]]) -> Tuple[List[float], int]:
+    """
+    Задержки пользователей и число запросов к Bot API на отправку
+    """
+    api.reset()
+    started = runner(api, users)
+    while not _all_answered(api, users):
+        time.sleep(0.05)
+    with api.lock:
+        return [api.sends[chat_id][-1] - started[chat_id] for chat_id, _ in users], api.calls
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 10, 50]
+    logging.getLogger('price_bot').setLevel(logging.WARNING)  # без строки лога на каждую команду
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_products_atomic(generate_products(PRODUCTS), os.path.join(data_dir, 'wildberries.jsonl'))
+        bot_module.product_cache = ProductCache(data_dir)
+        bot_module.load_products()  # прогрев кеша, чтобы мерить только отправку
+
+        api = FakeBotAPI().start()
+        print(f"Bot API: задержка {API_LATENCY * 1000:.0f} мс на запрос, /last = 5 карточек, /top = 1 сообщение")
+        print(f"{'польз.':>7} | {'схема':<22} | {'p50':>8} | {'p95':>8} | {'макс':>8} | {'запросов':>8}")
+        print('-' * 77)
+
+        for count in sizes:
+            users = [(100000 + i, '/last' if i % 2 == 0 else '/top') for i in range(count)]
+            for title, runner in ((f'telebot, {LEGACY_THREADS} потока', run_legacy),
+                                  ('asyncio Application', run_async)):
+                latencies, calls = measure(api, runner, users)
+                print(f"{count:>7} | {title:<22} | {percentile(latencies, 0.5):>7.2f}с | "
+                      f"{percentile(latencies, 0.95):>7.2f}с | {max(latencies):>7.2f}с | {calls:>8}")
+
+
+if __name__ == '__main__':
+    main()
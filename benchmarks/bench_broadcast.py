@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк рассылки: скорость движка и продолжение после падения
+
+Запуск:
+    python benchmarks/bench_broadcast.py [пользователей]
+
+Рассылка идёт в отдельном процессе на поддельный Bot API в памяти
+(каждый 50-й пользователь заблокировал бота). Процесс убивается SIGKILL
+посреди рассылки и запускается снова: рассылка должна продолжиться с
+контрольной точки, никого не пропустив и повторив не больше окна отправок.
+Лимит Telegram здесь поднят, чтобы мерить накладные расходы самого движка
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from telegram.error import Forbidden
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.broadcast import CHECKPOINT_EVERY, BroadcastEngine
+from utils.telegram_dispatcher import TelegramDispatcher
+from utils.user_store import UserStore
+
+API_LATENCY = 0.02  # задержка ответа Bot API, секунды
+FAST_RATE = 5000  # сообщений/сек вместо лимита Telegram
+WINDOW = 500
+ADMIN_CHAT = 1
+BLOCKED_EVERY = 50
+
+
+class FakeBot:
+    """
+    Bot API в памяти: доставленные ID пишутся в файл сразу, без буфера
+    """
+
+    def __init__(self, log_path: str):
+        self.log = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(API_LATENCY)
+        if chat_id != ADMIN_CHAT:
+            if chat_id % BLOCKED_EVERY == 0:
+                raise Forbidden('Forbidden: bot was blocked by the user')
+            os.write(self.log, f'{chat_id}\n'.encode())
+        return SimpleNamespace(message_id=1)
+
+    async def edit_message_text(self, **kwargs):
+        await asyncio.sleep(API_LATENCY)
+        return True
+
+
+async def worker(db_path: str, log_path: str):
+    user_store = UserStore(db_path, None)
+    dispatcher = TelegramDispatcher(FakeBot(log_path), global_rate=FAST_RATE)
+    engine = BroadcastEngine(user_store, dispatcher, db_path, window=WINDOW)
+
+    broadcast_ids = engine.unfinished() or [engine.create('📣 Новые скидки!', ADMIN_CHAT)]
+    await engine.start(broadcast_ids[0])
+    await dispatcher.stop()
+    state = engine.get(broadcast_ids[0])
+    print(f"sent={state['sent']} blocked={state['blocked']} failed={state['failed']}")
+
+
+def run_worker(db_path: str, log_path: str, kill_after: float = None) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, __file__, '--worker', db_path, log_path])
+    if kill_after is not None:
+        time.sleep(kill_after)
+        process.send_signal(signal.SIGKILL)
+    process.wait()
+    return time.perf_counter() - started
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'users.db')
+        store = UserStore(db_path, None)
+        for i in range(users):
+            store.touch(1000000 + i, f'user{i}', 'Тест')
+        store.close()
+
+        # Без падения: скорость движка
+        log_path = os.path.join(tmp, 'clean.log')
+        elapsed = run_worker(db_path, log_path)
+        with open(log_path) as f:
+            delivered = sum(1 for _ in f)
+        print(f"{users} пользователей: {elapsed:.1f} с, {delivered / elapsed:.0f} сообщ/сек "
+              f"(с запуском процесса), доставлено {delivered}")
+
+        blocked = UserStore(db_path, None).count() - UserStore(db_path, None).count_recipients()
+        print(f"Отмечено заблокировавших: {blocked} (ожидалось {users // BLOCKED_EVERY})")
+
+        # Вторая рассылка с падением посередине; заблокировавшие уже пропускаются
+        log_path = os.path.join(tmp, 'crash.log')
+        run_worker(db_path, log_path, kill_after=elapsed / 2)
+        with open(log_path) as f:
+            before_crash = sum(1 for _ in f)
+        run_worker(db_path, log_path)
+
+        with open(log_path) as f:
+            counts = Counter(line.strip() for line in f)
+        expected = users - users // BLOCKED_EVERY
+        duplicates = sum(count - 1 for count in counts.values())
+        print(f"Падение после {before_crash} отправок: доставлено {len(counts)} из {expected}, "
+              f"повторов {duplicates} (граница {WINDOW + CHECKPOINT_EVERY})")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--worker':
+        asyncio.run(worker(sys.argv[2], sys.argv[3]))
+    else:
+        main()
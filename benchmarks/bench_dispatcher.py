@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк очереди исходящих сообщений
+
+Запуск:
+    python benchmarks/bench_dispatcher.py [получателей]
+
+Поддельный Bot API в памяти ведёт себя как Telegram: не больше 30 сообщений
+за любую секунду на всех и token bucket на каждый чат, сверх лимита —
+RetryAfter. Сравниваются:
+  • рассылка N получателям: все запросы сразу и через диспетчер;
+  • 40 коротких сообщений одному чату подряд: по одному и со склейкой
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict
+
+from telegram.error import RetryAfter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.telegram_dispatcher import PRIORITY_LOW, TelegramDispatcher, TokenBucket
+
+API_LATENCY = 0.05  # задержка ответа Bot API, секунды
+GLOBAL_LIMIT = 30  # сообщений за любую секунду
+
+
+class FakeBot:
+    """
+    Bot API с лимитами Telegram
+    """
+
+    def __init__(self):
+        self.window = deque()
+        self.chats: Dict[int, TokenBucket] = {}
+        self.calls = 0
+        self.delivered = 0
+        self.throttled = 0
+
+    async def _request(self, chat_id: int, count: int = 1):
+        self.calls += 1
+        now = time.monotonic()
+        while self.window and self.window[0] <= now - 1:
+            self.window.popleft()
+        bucket = self.chats.setdefault(chat_id, TokenBucket(1, 3))
+
+        await asyncio.sleep(API_LATENCY)
+        if len(self.window) + count > GLOBAL_LIMIT or bucket.delay(count, now) > 0:
+            self.throttled += 1
+            raise RetryAfter(1)
+
+        self.window.extend([now] * count)
+        bucket.take(count, now)
+        self.delivered += count
+        return {'chat_id': chat_id}
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        return await self._request(chat_id)
+
+
+async def broadcast(recipients: int, use_dispatcher: bool) -> Dict[str, float]:
+    bot = FakeBot()
+    started = time.perf_counter()
+
+    if use_dispatcher:
+        dispatcher = TelegramDispatcher(bot)
+        sends = [dispatcher.send_message(100000 + i, 'Скидка дня', priority=PRIORITY_LOW)
+                 for i in range(recipients)]
+    else:
+        sends = [bot.send_message(100000 + i, 'Скидка дня') for i in range(recipients)]
+    results = await asyncio.gather(*sends, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    failed = sum(isinstance(r, Exception) for r in results)
+    if use_dispatcher:
+        await dispatcher.stop()
+    return {'time': elapsed, 'delivered': bot.delivered, 'failed': failed,
+            'throttled': bot.throttled, 'rate': bot.delivered / elapsed}
+
+
+async def burst(messages: int, use_dispatcher: bool) -> Dict[str, float]:
+    bot = FakeBot()
+    started = time.perf_counter()
+
+    if use_dispatcher:
+        dispatcher = TelegramDispatcher(bot)
+        await asyncio.gather(*(dispatcher.send_message(1, f'Строка {i}') for i in range(messages)))
+        await dispatcher.stop()
+    else:
+        # Как раньше: по сообщению с паузой, чтобы не упереться в лимит чата
+        for i in range(messages):
+            await bot.send_message(1, f'Строка {i}')
+            await asyncio.sleep(1)
+
+    return {'time': time.perf_counter() - started, 'calls': bot.calls, 'throttled': bot.throttled}
+
+
+def main():
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    print(f"Рассылка {recipients} получателям (лимит {GLOBAL_LIMIT}/сек, задержка {API_LATENCY * 1000:.0f} мс)")
+    print(f"{'схема':<14} | {'время':>7} | {'доставлено':>10} | {'ошибок':>6} | {'429':>5} | {'сообщ/сек':>9}")
+    print('-' * 68)
+    for title, use_dispatcher in (('все сразу', False), ('диспетчер', True)):
+        r = asyncio.run(broadcast(recipients, use_dispatcher))
+        print(f"{title:<14} | {r['time']:>6.2f}с | {r['delivered']:>10} | {r['failed']:>6} | "
+              f"{r['throttled']:>5} | {r['rate']:>9.1f}")
+
+    print(f"\n40 сообщений одному чату")
+    print(f"{'схема':<14} | {'время':>7} | {'запросов':>8} | {'429':>5}")
+    print('-' * 44)
+    for title, use_dispatcher in (('по одному', False), ('склейка', True)):
+        r = asyncio.run(burst(40, use_dispatcher))
+        print(f"{title:<14} | {r['time']:>6.2f}с | {r['calls']:>8} | {r['throttled']:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк извлечения ID товаров со страницы категории Wildberries
+
+Запуск:
+    python benchmarks/bench_extract_ids.py [сохранённая_страница.html]
+
+Без аргумента генерирует синтетическую страницу размером ~5 МБ
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.wildberries import WildberriesParser
+
+
+def legacy_extract_product_id(html: str) -> List[str]:
+    """
+    Прежняя реализация: четыре прохода re.findall и list(set(...))
+    """
+    patterns = [
+        r'data-nm="(\d+)"',
+        r'data-id="(\d+)"',
+        r'data-popup-nm="(\d+)"',
+        r'/catalog/(\d+)/detail\.aspx',
+    ]
+
+    ids = []
+    for pattern in patterns:
+        found = re.findall(pattern, html)
+        ids.extend(found)
+
+    return list(set(ids))
+
+
+def make_page(target_bytes: int = 5 * 1024 * 1024) -> str:
+    """
+    Собирает страницу, похожую на выдачу каталога
+    """
+    rng = random.Random(42)
+    filler = '<div class="product-card__wrapper"><span class="price">{price} ₽</span>' + ' ' * 400 + '</div>'
+    card = (
+        '<article class="product-card" data-nm="{nm}" data-popup-nm="{nm}">'
+        '<a href="/catalog/{nm}/detail.aspx?targetUrl=GP">' + filler + '</a></article>\n'
+    )
+
+    parts = []
+    size = 0
+    while size < target_bytes:
+        chunk = card.format(nm=rng.randint(10_000_000, 250_000_000), price=rng.randint(100, 99_999))
+        parts.append(chunk)
+        size += len(chunk.encode('utf-8'))
+    return ''.join(parts)
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        source = sys.argv[1]
+    else:
+        html = make_page()
+        source = 'синтетическая страница'
+
+    parser = WildberriesParser.__new__(WildberriesParser)  # без сессий и кешей
+
+    new_ids = parser.extract_product_id(html)
+    old_ids = legacy_extract_product_id(html)
+    assert set(new_ids) == set(old_ids), 'наборы ID не совпадают'
+
+    runs = 5
+    old_time = min(timeit.repeat(lambda: legacy_extract_product_id(html), number=1, repeat=runs))
+    new_time = min(timeit.repeat(lambda: parser.extract_product_id(html), number=1, repeat=runs))
+
+    print(f"📄 {source}: {len(html.encode('utf-8')) / 1024 / 1024:.1f} МБ, {len(new_ids)} уникальных ID")
+    print(f"🐢 4 × re.findall + set: {old_time * 1000:.1f} мс")
+    print(f"🚀 2 скомпилированных прохода + порядок: {new_time * 1000:.1f} мс")
+    print(f"⚡ Ускорение: {old_time / new_time:.2f}×")
+
+
+if __name__ == '__main__':
+    main()
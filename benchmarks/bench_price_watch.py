@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк сверки цен для /watch
+
+Запуск:
+    python benchmarks/bench_price_watch.py [подписок ...]
+
+Для каждого числа подписок (по 3 подписчика на товар) сверяется прогон
+из 10k товаров, в котором отслеживается каждый десятый, а подешевел
+каждый пятый из отслеживаемых. Время сверки должно зависеть от размера
+прогона, а не от числа подписок
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_snapshot import generate_products
+from utils.price_watch import WatchStore
+
+RUN_SIZE = 10000
+SUBSCRIBERS_PER_PRODUCT = 3
+
+
+def build_store(path: str, watches: int) -> WatchStore:
+    """
+    Заполняет базу подписок напрямую (без лимита на пользователя)
+    Отслеживается каждый десятый товар прогона, остальные подписки — на товары вне прогона
+    """
+    store = WatchStore(path, limit_per_user=watches)
+    products = watches // SUBSCRIBERS_PER_PRODUCT
+    with store.conn:
+        store.conn.executemany(
+            'INSERT INTO watched_products (store, product_id, price) VALUES (?, ?, ?)',
+            (('Wildberries', str(10000000 + i * 10), 10 ** 6) for i in range(products))
+        )
+        store.conn.executemany(
+            'INSERT INTO watches (store, product_id, user_id, url, created) VALUES (?, ?, ?, ?, ?)',
+            (('Wildberries', str(10000000 + (i // SUBSCRIBERS_PER_PRODUCT) * 10), str(i), '', '')
+             for i in range(watches))
+        )
+    return store
+
+
+def run_products():
+    """
+    Прогон: каждый пятый отслеживаемый товар подешевел, остальные подорожали
+    """
+    for i, product in enumerate(generate_products(RUN_SIZE)):
+        product['store'] = 'Wildberries'
+        if i % 50 != 0:
+            product['price'] = 2 * 10 ** 6
+        yield product
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [30000, 300000, 900000]
+
+    print(f"Прогон: {RUN_SIZE} товаров, {SUBSCRIBERS_PER_PRODUCT} подписчика на товар")
+    print(f"{'подписок':>9} | {'сверка':>8} | {'отслеж.':>7} | {'снижений':>8} | {'уведомл.':>8}")
+    print('-' * 53)
+
+    for watches in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = build_store(os.path.join(tmp, 'watches.db'), watches)
+            products = list(run_products())
+
+            started = time.perf_counter()
+            stats = store.match(products)
+            elapsed = time.perf_counter() - started
+
+            print(f"{watches:>9} | {elapsed * 1000:>6.0f}мс | {stats['watched']:>7} | "
+                  f"{stats['drops']:>8} | {stats['notifications']:>8}")
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк загрузки товаров в боте: JSON Lines против бинарного снимка
+
+Запуск:
+    python benchmarks/bench_snapshot.py [размер ...]
+
+По умолчанию меряет 10k, 100k и 1M товаров. Для каждого размера
+считается время открытия, чтения топ-10 (как /top) и подсчёта товаров
+по магазинам (как /stats)
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Any, Iterator
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.snapshot import Snapshot, write_snapshot
+from utils.storage import iter_products, write_products_atomic
+
+STORES = ['Wildberries', 'Ozon', 'AliExpress']
+WORDS = ['наушники', 'смартфон', 'чайник', 'кроссовки', 'рюкзак', 'пылесос', 'часы', 'лампа']
+
+
+def generate_products(count: int) -> Iterator[Dict[str, Any]]:
+    """
+    Синтетические товары, уже отсортированные по value_score
+    """
+    rnd = random.Random(42)
+    for i in range(count):
+        price = rnd.randint(100, 100000)
+        discount = rnd.randint(20, 90)
+        yield {
+            'id': str(10000000 + i),
+            'name': f"{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS)} модель {i}",
+            'price': price,
+            'old_price': price * 100 // (100 - discount),
+            'discount': discount,
+            'rating': round(rnd.uniform(3.5, 5.0), 1),
+            'reviews': rnd.randint(0, 5000),
+            'url': f"https://www.wildberries.ru/catalog/{10000000 + i}/detail.aspx",
+            'image': f"https://basket-01.wb.ru/vol{i // 100000}/part{i // 1000}/{10000000 + i}/images/big/1.webp",
+            'store': rnd.choice(STORES),
+            'category': 'Электроника',
+            'emoji': '📱',
+            'value_score': 100 - i * 100 // count,
+            'value_reasons': ['хорошая скидка 30%+'],
+        }
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def bench(count: int, workdir: str):
+    jsonl_path = os.path.join(workdir, f'merged_{count}.jsonl')
+    snap_path = os.path.join(workdir, f'merged_{count}.snap')
+    write_products_atomic(generate_products(count), jsonl_path)
+    write_snapshot(generate_products(count), snap_path)
+
+    # Прежний путь: разобрать JSON целиком на каждый запрос
+    load_json, products = timed(lambda: list(iter_products(jsonl_path)))
+    top_json, _ = timed(lambda: [(p.get('name'), p.get('price'), p.get('store')) for p in products[:10]])
+    stats_json, _ = timed(lambda: Counter(p.get('store', 'Unknown') for p in products))
+
+    # Снимок: mmap и чтение нужных полей
+    load_snap, snapshot = timed(lambda: Snapshot(snap_path))
+    top_snap, _ = timed(lambda: [(p.get('name'), p.get('price'), p.get('store')) for p in snapshot[:10]])
+    stats_snap, _ = timed(lambda: Counter(snapshot.strings('store')))
+
+    print(f"{count:>9} товаров | JSONL {os.path.getsize(jsonl_path) / 1e6:7.1f} МБ, "
+          f"снимок {os.path.getsize(snap_path) / 1e6:7.1f} МБ")
+    print(f"          открытие: JSON {load_json * 1000:9.1f} мс | снимок {load_snap * 1000:7.3f} мс")
+    print(f"          топ-10:   JSON {(load_json + top_json) * 1000:9.1f} мс | снимок {(load_snap + top_snap) * 1000:7.3f} мс")
+    print(f"          /stats:   JSON {(load_json + stats_json) * 1000:9.1f} мс | снимок {(load_snap + stats_snap) * 1000:7.1f} мс")
+
+    snapshot.close()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in sizes:
+            bench(count, workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,16 +4,21 @@
 """
 Основной файл Telegram бота PriceHunterSK
 Обрабатывает команды пользователей и управляет подписками
+
+Бот работает на python-telegram-bot 20 (asyncio): обновления обрабатываются
+параллельно, паузы и отправка не блокируют других пользователей
 """
 
-import telebot
-import json
+import asyncio
 import os
 import sys
+import threading
 import time
 from datetime import datetime, timedelta
-from telebot import types
-from typing import Dict, Any, Optional, List
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, Update
+from telegram.error import Forbidden
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes
+from typing import Dict, Any, Optional, List, Mapping, Sequence, Tuple
 
 # Добавляем путь к проекту
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -29,6 +34,11 @@ except ImportError:
     CHANNEL_ID = os.getenv('CHANNEL_ID', '@PriceHunterSK')
     print("⚠️ config.py не найден, использую переменные окружения")
 
+try:
+    from config import WATCH_CHECK_INTERVAL
+except ImportError:
+    WATCH_CHECK_INTERVAL = float(os.getenv('WATCH_CHECK_INTERVAL', '60'))
+
 # Импортируем логгер
 try:
     from utils.logger import logger, log_info, log_error
@@ -42,91 +52,184 @@ except ImportError:
     log_info = logger.info
     log_error = logger.error
 
-# Инициализация бота
-bot = telebot.TeleBot(BOT_TOKEN)
+from utils.merge_products import load_ranked_products, load_snapshot
+from utils.broadcast import BroadcastEngine
+from utils.facets import FacetIndex, Filters
+from utils.price_watch import WatchStore, check_prices, parse_product_url
+from utils.product import Product
+from utils.search_index import SearchIndex
+from utils.snapshot import SNAPSHOT_FILE
+from utils.storage import MERGED_FILE, MERGED_SOURCES_FILE, is_store_file
+from utils.telegram_dispatcher import PRIORITY_NORMAL, TelegramDispatcher
+from utils.user_store import UserStore
 
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
 
-def load_products() -> List[Dict[str, Any]]:
+class ProductCache:
     """
-    Загружает все товары из всех JSON файлов
+    Общий для всех обработчиков кеш рейтинга товаров
+    Актуальность проверяется дешёвым stat файлов в data/: пока ни у одной
+    выгрузки не поменялись mtime, размер или inode, отдаётся готовый список.
+    Перезагрузка подменяет снимок целиком, поэтому обработчик
+    никогда не увидит наполовину загруженный рейтинг
     """
-    products = []
-    data_dir = 'data'
     
-    if not os.path.exists(data_dir):
-        return []
+    def __init__(self, data_dir: str = 'data'):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        # Счётчики меняются и без основной блокировки, поэтому у них своя
+        self.counter_lock = threading.Lock()
+        # (подпись файлов, товары) меняется только целиком
+        self.state = (None, ())
+        # (товары, поисковый индекс, индексы фильтров) строятся при первом поиске
+        self.index_state = ((), None, None)
+        
+        self.hits = 0
+        self.reloads = 0
+        self.last_reload = None
+        self.last_reload_ms = 0.0
     
-    try:
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.json') and filename != 'users.json':
-                filepath = os.path.join(data_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        products.extend(data)
-    except Exception as e:
-        log_error(f"Ошибка загрузки товаров: {e}")
+    def signature(self) -> tuple:
+        """
+        Подпись файлов с товарами: имя, mtime, размер и inode каждого
+        """
+        try:
+            entries = os.scandir(self.data_dir)
+        except FileNotFoundError:
+            return ()
+        
+        with entries:
+            files = []
+            for entry in entries:
+                # users.json в подпись не входит: активация подписки не должна сбрасывать рейтинг
+                if entry.name in (SNAPSHOT_FILE, MERGED_FILE, MERGED_SOURCES_FILE) or is_store_file(entry.name):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(sorted(files))
     
-    # Сортируем по выгодности
-    products.sort(key=lambda x: x.get('value_score', 0), reverse=True)
-    return products
+    def get(self) -> Sequence[Mapping[str, Any]]:
+        """
+        Возвращает актуальный рейтинг, при необходимости перечитывая data/
+        """
+        signature = self.signature()
+        cached_signature, products = self.state
+        if signature == cached_signature:
+            with self.counter_lock:
+                self.hits += 1
+            return products
+        
+        with self.lock:
+            # Пока ждали блокировку, другой поток мог уже перечитать данные
+            cached_signature, products = self.state
+            if signature == cached_signature:
+                with self.counter_lock:
+                    self.hits += 1
+                return products
+            
+            started = time.monotonic()
+            products = self.load()
+            self.state = (signature, products)
+            with self.counter_lock:
+                self.reloads += 1
+            self.last_reload = datetime.now()
+            self.last_reload_ms = (time.monotonic() - started) * 1000
+            log_info(f"Рейтинг товаров перечитан: {len(products)} шт. за {self.last_reload_ms:.0f} мс")
+            return products
+    
+    def load(self) -> Sequence[Mapping[str, Any]]:
+        """
+        Открывает бинарный снимок data/merged.snap (поля читаются по требованию),
+        а если его нет или он устарел — читает выгрузки
+        """
+        snapshot = load_snapshot(self.data_dir)
+        if snapshot is not None:
+            return snapshot
+        return tuple(load_ranked_products(self.data_dir))
+    
+    def search(self, query: str, limit: int = 5) -> Tuple[List[Product], Filters]:
+        """
+        Ищет товары по названию и фильтрам («наушники до 3000 ozon -30%»)
+        Возвращает (товары, разобранные фильтры)
+        """
+        products = self.get()
+        indexed_products, index, facets = self.index_state
+        
+        # Пустой рейтинг — тот же объект (), что и в начальном index_state,
+        # поэтому непостроенный индекс узнаём по None
+        if index is None or indexed_products is not products:
+            with self.lock:
+                indexed_products, index, facets = self.index_state
+                if index is None or indexed_products is not products:
+                    started = time.monotonic()
+                    index = SearchIndex.from_products(products)
+                    facets = FacetIndex.from_products(products)
+                    self.index_state = (products, index, facets)
+                    log_info(f"Поисковый индекс построен: {len(index.vocabulary)} слов, "
+                             f"{len(facets.stores)} магазинов, {len(facets.categories)} категорий "
+                             f"за {(time.monotonic() - started) * 1000:.0f} мс")
+        
+        text, filters = facets.parse(query)
+        found = index.search(text, limit, facets.mask(filters))
+        return [Product.from_dict(products[i]) for i in found], filters
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'last_reload': self.last_reload,
+            'last_reload_ms': self.last_reload_ms,
+        }
 
-def load_users() -> Dict[str, Any]:
-    """
-    Загружает пользователей из users.json
-    """
-    try:
-        with open('data/users.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-    except Exception as e:
-        log_error(f"Ошибка загрузки пользователей: {e}")
-        return {}
 
-def save_users(users: Dict[str, Any]) -> bool:
+product_cache = ProductCache('data')
+
+# Подписчики: при первом запуске переносятся из data/users.json
+user_store = UserStore('data/users.db', 'data/users.json')
+
+# Все исходящие сообщения идут через общую очередь с лимитами Bot API
+dispatcher = TelegramDispatcher()
+
+# Рассылки с контрольными точками в той же базе пользователей
+broadcast_engine = BroadcastEngine(user_store, dispatcher, 'data/users.db')
+
+# Подписки /watch и очередь уведомлений о снижении цен
+watch_store = WatchStore('data/watches.db')
+watch_task: Optional[asyncio.Task] = None
+
+def load_products() -> Sequence[Mapping[str, Any]]:
     """
-    Сохраняет пользователей в users.json
+    Загружает все товары, отсортированные по выгодности
+    Рейтинг берётся из кеша процесса и перечитывается только при изменении data/
     """
     try:
-        os.makedirs('data', exist_ok=True)
-        with open('data/users.json', 'w', encoding='utf-8') as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
-        return True
+        return product_cache.get()
     except Exception as e:
-        log_error(f"Ошибка сохранения пользователей: {e}")
-        return False
+        log_error(f"Ошибка загрузки товаров: {e}")
+        return []
 
 def is_premium(user_id: int) -> bool:
     """
     Проверяет, активна ли премиум подписка у пользователя
     """
-    users = load_users()
-    user = users.get(str(user_id))
-    
-    if not user:
-        return False
-    
     try:
-        expire = datetime.fromisoformat(user.get('expires', '2000-01-01'))
-        return expire > datetime.now()
-    except:
+        return user_store.is_premium(user_id)
+    except Exception as e:
+        log_error(f"Ошибка проверки подписки: {e}")
         return False
 
-def format_product_card(product: Dict[str, Any]) -> str:
+def format_product_card(product: Product) -> str:
     """
     Форматирует товар для красивого отображения
     """
-    name = product.get('name', 'Без названия')
-    price = product.get('price', product.get('sale_price', 0))
-    old_price = product.get('old_price', product.get('regular_price', 0))
-    discount = product.get('discount', 0)
-    rating = product.get('rating', 0)
-    reviews = product.get('reviews', 0)
-    store = product.get('store', 'Магазин')
-    url = product.get('url', '#')
-    emoji = product.get('emoji', '🛍️')
+    name = product.name or 'Без названия'
+    price = product.price
+    old_price = product.old_price
+    discount = product.discount
+    rating = product.rating
+    reviews = product.reviews
+    store = product.store or 'Магазин'
+    url = product.url or '#'
+    emoji = product.emoji
     
     # Форматируем цены
     price_str = f"{price:,}".replace(',', ' ') if price else "0"
@@ -144,32 +247,111 @@ def format_product_card(product: Dict[str, Any]) -> str:
     
     return text
 
-def get_main_keyboard() -> types.InlineKeyboardMarkup:
+
+# Ограничения Bot API
+CAPTION_LIMIT = 1024  # символов в подписи к фото
+MESSAGE_LIMIT = 4096  # символов в сообщении
+MEDIA_GROUP_LIMIT = 10  # фото в одном альбоме
+
+def get_main_keyboard() -> InlineKeyboardMarkup:
     """
     Возвращает основную клавиатуру
     """
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    btn1 = InlineKeyboardButton("🔍 Последние скидки", callback_data="last")
+    btn2 = InlineKeyboardButton("🏆 Топ выгодных", callback_data="top")
+    btn3 = InlineKeyboardButton("💎 Премиум", callback_data="premium")
+    btn4 = InlineKeyboardButton("📢 Канал", url=f"https://t.me/{CHANNEL_ID.replace('@', '')}")
+    
+    return InlineKeyboardMarkup([
+        [btn1, btn2],
+        [btn3, btn4],
+    ])
+
+async def send_text_cards(context: ContextTypes.DEFAULT_TYPE, chat_id: int,
+                          cards: List[str], disable_preview: Optional[bool] = None) -> int:
+    """
+    Отправляет текстовые карточки, склеивая их в сообщения до лимита Telegram
+    Возвращает количество отправленных карточек
+    """
+    sent = 0
+    chunk: List[str] = []
+    
+    async def flush():
+        nonlocal sent
+        if not chunk:
+            return
+        try:
+            await dispatcher.send_message(
+                chat_id,
+                '\n\n'.join(chunk),
+                parse_mode='HTML',
+                disable_web_page_preview=disable_preview
+            )
+            sent += len(chunk)
+        except Exception as e:
+            log_error(f"Ошибка отправки товара: {e}")
+        chunk.clear()
     
-    btn1 = types.InlineKeyboardButton("🔍 Последние скидки", callback_data="last")
-    btn2 = types.InlineKeyboardButton("🏆 Топ выгодных", callback_data="top")
-    btn3 = types.InlineKeyboardButton("💎 Премиум", callback_data="premium")
-    btn4 = types.InlineKeyboardButton("📢 Канал", url=f"https://t.me/{CHANNEL_ID.replace('@', '')}")
+    for card in cards:
+        if chunk and len('\n\n'.join(chunk + [card])) > MESSAGE_LIMIT:
+            await flush()
+        chunk.append(card)
+    await flush()
     
-    keyboard.add(btn1, btn2)
-    keyboard.add(btn3, btn4)
+    return sent
+
+async def send_product_cards(context: ContextTypes.DEFAULT_TYPE, chat_id: int,
+                             products: Sequence[Mapping[str, Any]], disable_preview: Optional[bool] = None) -> int:
+    """
+    Отправляет карточки товаров одним альбомом (sendMediaGroup) с подписями
+    Товары без картинки и товары из альбома, который Telegram отклонил
+    (например, из-за недоступной картинки), уходят текстом
+    Возвращает количество отправленных карточек
+    """
+    with_image = []
+    text_cards = []
+    for product in map(Product.from_dict, products):
+        card = format_product_card(product)
+        if product.image and len(card) <= CAPTION_LIMIT:
+            with_image.append((product.image, card))
+        else:
+            text_cards.append(card)
+    
+    sent = 0
+    if with_image:
+        try:
+            if len(with_image) == 1:
+                image, card = with_image[0]
+                await dispatcher.send_photo(chat_id, image, caption=card, parse_mode='HTML')
+            else:
+                await dispatcher.send_media_group(chat_id, [
+                    InputMediaPhoto(image, caption=card, parse_mode='HTML')
+                    for image, card in with_image[:MEDIA_GROUP_LIMIT]
+                ])
+                text_cards = [card for _, card in with_image[MEDIA_GROUP_LIMIT:]] + text_cards
+            sent += min(len(with_image), MEDIA_GROUP_LIMIT)
+        except Exception as e:
+            log_error(f"Ошибка отправки альбома, отправляю текстом: {e}")
+            text_cards = [card for _, card in with_image] + text_cards
     
-    return keyboard
+    sent += await send_text_cards(context, chat_id, text_cards, disable_preview)
+    return sent
 
 # ========== ОБРАБОТЧИКИ КОМАНД ==========
 
-@bot.message_handler(commands=['start'])
-def cmd_start(message):
+async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /start
     """
-    user = message.from_user
+    user = update.effective_user
     log_info(f"Пользователь {user.id} (@{user.username}) запустил бота")
     
+    # Запоминаем для рассылок (и снимаем отметку о блокировке, если бот снова запущен)
+    try:
+        user_store.touch(user.id, user.username, user.first_name)
+    except Exception as e:
+        log_error(f"Ошибка сохранения пользователя: {e}")
+    
     welcome_text = f"""👋 <b>Привет, {user.first_name}!</b>
 
 Я <b>PriceHunterSK</b> — твой личный охотник за скидками 🏷️
@@ -190,75 +372,53 @@ def cmd_start(message):
 
 👇 <b>Выбери действие:</b>"""
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        update.effective_chat.id,
         welcome_text,
         parse_mode='HTML',
         reply_markup=get_main_keyboard()
     )
 
-@bot.message_handler(commands=['last'])
-def cmd_last(message):
+async def cmd_last(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /last - показывает последние скидки
     """
-    log_info(f"Пользователь {message.from_user.id} запросил последние скидки")
+    chat_id = update.effective_chat.id
+    log_info(f"Пользователь {update.effective_user.id} запросил последние скидки")
     
-    products = load_products()
+    # Перечитывание data/ может занять время: не держим им цикл событий
+    products = await asyncio.to_thread(load_products)
     
     if not products:
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             "😕 Пока нет товаров. Попробуйте позже.",
             reply_markup=get_main_keyboard()
         )
         return
     
     # Отправляем первые 5 товаров
-    sent = 0
-    for product in products[:5]:
-        try:
-            text = format_product_card(product)
-            image = product.get('image', product.get('image_url'))
-            
-            if image:
-                bot.send_photo(
-                    message.chat.id,
-                    image,
-                    caption=text,
-                    parse_mode='HTML'
-                )
-            else:
-                bot.send_message(
-                    message.chat.id,
-                    text,
-                    parse_mode='HTML',
-                    disable_web_page_preview=False
-                )
-            sent += 1
-            time.sleep(0.5)  # Небольшая пауза между сообщениями
-        except Exception as e:
-            log_error(f"Ошибка отправки товара: {e}")
+    sent = await send_product_cards(context, chat_id, products[:5], disable_preview=False)
     
     if sent == 0:
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             "😕 Не удалось загрузить товары.",
             reply_markup=get_main_keyboard()
         )
 
-@bot.message_handler(commands=['top'])
-def cmd_top(message):
+async def cmd_top(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /top - показывает топ-10 выгодных предложений
     """
-    log_info(f"Пользователь {message.from_user.id} запросил топ предложений")
+    chat_id = update.effective_chat.id
+    log_info(f"Пользователь {update.effective_user.id} запросил топ предложений")
     
-    products = load_products()
+    products = await asyncio.to_thread(load_products)
     
     if not products:
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             "😕 Пока нет товаров. Попробуйте позже.",
             reply_markup=get_main_keyboard()
         )
@@ -266,11 +426,11 @@ def cmd_top(message):
     
     text = "🏆 <b>ТОП-10 САМЫХ ВЫГОДНЫХ ПРЕДЛОЖЕНИЙ</b>\n\n"
     
-    for i, product in enumerate(products[:10], 1):
-        name = product.get('name', 'Без названия')[:50]
-        price = product.get('price', product.get('sale_price', 0))
-        discount = product.get('discount', 0)
-        store = product.get('store', 'Магазин')
+    for i, product in enumerate(map(Product.from_dict, products[:10]), 1):
+        name = (product.name or 'Без названия')[:50]
+        price = product.price
+        discount = product.discount
+        store = product.store or 'Магазин'
         
         price_str = f"{price:,}".replace(',', ' ') if price else "0"
         
@@ -281,79 +441,80 @@ def cmd_top(message):
     # Добавляем информацию о подписке
     text += "💎 <b>Хотите больше?</b> Оформите премиум подписку и получайте уведомления о новых скидках мгновенно!"
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        chat_id,
         text,
         parse_mode='HTML',
         reply_markup=get_main_keyboard()
     )
 
-@bot.message_handler(commands=['search'])
-def cmd_search(message):
+async def cmd_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /search - поиск товаров
     """
-    try:
-        query = message.text.split(' ', 1)[1].lower()
-    except IndexError:
-        bot.send_message(
-            message.chat.id,
-            "❌ Напишите так: /search iphone\nИли: /search наушники",
+    chat_id = update.effective_chat.id
+    
+    if not context.args:
+        await dispatcher.send_message(
+            chat_id,
+            "❌ Напишите так: /search iphone\nИли: /search наушники до 3000 ozon -30%\n"
+            "Категория: /search кроссовки cat:shoes",
             reply_markup=get_main_keyboard()
         )
         return
     
-    log_info(f"Пользователь {message.from_user.id} ищет: {query}")
-    
-    products = load_products()
-    results = []
+    query = ' '.join(context.args).lower()
+    log_info(f"Пользователь {update.effective_user.id} ищет: {query}")
     
-    for product in products:
-        name = product.get('name', '').lower()
-        if query in name:
-            results.append(product)
-            if len(results) >= 5:
-                break
+    try:
+        # Первый поиск по новому рейтингу строит индексы: уводим его из цикла событий
+        results, filters = await asyncio.to_thread(product_cache.search, query, 5)
+    except Exception as e:
+        log_error(f"Ошибка поиска: {e}")
+        results, filters = [], Filters()
     
     if not results:
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             f"😕 По запросу '{query}' ничего не найдено.\nПопробуйте другое слово.",
             reply_markup=get_main_keyboard()
         )
         return
     
-    text = f"🔍 <b>Результаты поиска: {query}</b>\n\n"
+    text = f"🔍 <b>Результаты поиска: {query}</b>\n"
+    if filters:
+        text += f"🎛 Фильтры: {filters.describe()}\n"
+    text += "\n"
     
     for i, product in enumerate(results, 1):
-        name = product.get('name', 'Без названия')[:50]
-        price = product.get('price', product.get('sale_price', 0))
-        discount = product.get('discount', 0)
+        name = (product.name or 'Без названия')[:50]
+        price = product.price
+        discount = product.discount
         
         price_str = f"{price:,}".replace(',', ' ') if price else "0"
         
-        text += f"{i}. <a href='{product.get('url', '#')}'>{name}</a>\n"
+        text += f"{i}. <a href='{product.url or '#'}'>{name}</a>\n"
         text += f"   💰 {price_str}₽ | 📉 -{discount}%\n\n"
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        chat_id,
         text,
         parse_mode='HTML',
         disable_web_page_preview=False,
         reply_markup=get_main_keyboard()
     )
 
-@bot.message_handler(commands=['premium'])
-def cmd_premium(message):
+async def cmd_premium(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /premium - информация о подписке
     """
-    log_info(f"Пользователь {message.from_user.id} запросил информацию о премиум")
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    log_info(f"Пользователь {user_id} запросил информацию о премиум")
     
-    if is_premium(message.from_user.id):
+    if is_premium(user_id):
         # У пользователя уже есть подписка
-        users = load_users()
-        user_data = users.get(str(message.from_user.id), {})
+        user_data = user_store.get(user_id) or {}
         expire = user_data.get('expires', 'Неизвестно')
         
         text = f"""💎 <b>У вас активна премиум подписка!</b>
@@ -369,8 +530,8 @@ def cmd_premium(message):
 
 Скоро появятся новые функции!"""
         
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             text,
             parse_mode='HTML',
             reply_markup=get_main_keyboard()
@@ -378,23 +539,24 @@ def cmd_premium(message):
         return
     
     # У пользователя нет подписки
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    
-    crypto_btn = types.InlineKeyboardButton(
+    crypto_btn = InlineKeyboardButton(
         "💎 Криптовалюта (TON)",
         callback_data="pay_crypto"
     )
-    card_btn = types.InlineKeyboardButton(
+    card_btn = InlineKeyboardButton(
         "💳 Карта РФ (Озон)",
         callback_data="pay_card"
     )
-    check_btn = types.InlineKeyboardButton(
+    check_btn = InlineKeyboardButton(
         "✅ Проверить оплату",
         callback_data="check_payment"
     )
     
-    keyboard.add(crypto_btn, card_btn)
-    keyboard.add(check_btn)
+    keyboard = InlineKeyboardMarkup([
+        [crypto_btn],
+        [card_btn],
+        [check_btn],
+    ])
     
     text = """💎 <b>ПРЕМИУМ ПОДПИСКА — 500₽/месяц</b>
 
@@ -411,34 +573,96 @@ def cmd_premium(message):
 
 Выберите способ оплаты ниже 👇"""
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        chat_id,
         text,
         parse_mode='HTML',
         reply_markup=keyboard
     )
 
-@bot.message_handler(commands=['watch'])
-def cmd_watch(message):
+async def cmd_watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /watch - отслеживание товара (только для премиум)
+    Без аргументов показывает отслеживаемые товары
     """
-    if not is_premium(message.from_user.id):
-        bot.send_message(
-            message.chat.id,
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    
+    if not is_premium(user_id):
+        await dispatcher.send_message(
+            chat_id,
             "❌ Эта команда только для премиум-пользователей.\n\nОформите подписку: /premium",
             reply_markup=get_main_keyboard()
         )
         return
     
-    bot.send_message(
-        message.chat.id,
-        "🔔 Функция отслеживания товаров появится в следующем обновлении!\n\nСледите за новостями в канале.",
+    if not context.args:
+        watches = await asyncio.to_thread(watch_store.list_for_user, user_id)
+        if not watches:
+            await dispatcher.send_message(
+                chat_id,
+                "🔔 Вы пока ничего не отслеживаете.\n\nОтправьте: /watch ссылка_на_товар\n"
+                "Поддерживаются Wildberries, Ozon и AliExpress",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        
+        text = "🔔 <b>ОТСЛЕЖИВАЕМЫЕ ТОВАРЫ</b>\n\n"
+        for i, watch in enumerate(watches, 1):
+            name = (watch['name'] or f"{watch['store']} {watch['product_id']}")[:50]
+            price = f"{watch['price']:,}₽".replace(',', ' ') if watch['price'] else "цена появится после обновления"
+            
+            text += f"{i}. <a href='{watch['url']}'>{name}</a>\n"
+            text += f"   💰 {price}\n\n"
+        text += "Перестать отслеживать: /unwatch ссылка"
+        
+        await dispatcher.send_message(chat_id, text, parse_mode='HTML', disable_web_page_preview=True)
+        return
+    
+    url = context.args[0]
+    parsed = parse_product_url(url)
+    if not parsed:
+        await dispatcher.send_message(
+            chat_id,
+            "❌ Не удалось распознать ссылку.\n\nПришлите ссылку на товар Wildberries, Ozon или AliExpress"
+        )
+        return
+    
+    store, product_id = parsed
+    if not await asyncio.to_thread(watch_store.add, user_id, store, product_id, url):
+        await dispatcher.send_message(
+            chat_id,
+            f"❌ Можно отслеживать не больше {watch_store.limit_per_user} товаров.\n\n"
+            "Удалите лишние: /unwatch ссылка"
+        )
+        return
+    
+    log_info(f"Пользователь {user_id} отслеживает {store} {product_id}")
+    await dispatcher.send_message(
+        chat_id,
+        f"✅ Товар {store} {product_id} добавлен в отслеживание!\n\n"
+        "Пришлю уведомление, как только цена снизится.",
         reply_markup=get_main_keyboard()
     )
 
-@bot.message_handler(commands=['help'])
-def cmd_help(message):
+async def cmd_unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /unwatch - перестать отслеживать товар
+    """
+    chat_id = update.effective_chat.id
+    parsed = parse_product_url(context.args[0]) if context.args else None
+    
+    if not parsed:
+        await dispatcher.send_message(chat_id, "❌ Напишите так: /unwatch ссылка_на_товар")
+        return
+    
+    removed = await asyncio.to_thread(watch_store.remove, update.effective_user.id, *parsed)
+    await dispatcher.send_message(
+        chat_id,
+        "✅ Товар больше не отслеживается" if removed else "😕 Этот товар не отслеживается"
+    )
+
+async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /help
     """
@@ -454,6 +678,7 @@ def cmd_help(message):
 
 <b>Премиум команды:</b>
 /watch <ссылка> - Отслеживать товар
+/unwatch <ссылка> - Перестать отслеживать
 
 <b>Полезные ссылки:</b>
 📢 Канал: {CHANNEL_ID}
@@ -461,8 +686,8 @@ def cmd_help(message):
 
 <b>По всем вопросам обращайтесь к администратору.</b>"""
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        update.effective_chat.id,
         text,
         parse_mode='HTML',
         reply_markup=get_main_keyboard()
@@ -470,75 +695,54 @@ def cmd_help(message):
 
 # ========== ОБРАБОТЧИКИ КОЛЛБЭКОВ ==========
 
-@bot.callback_query_handler(func=lambda call: True)
-def callback_handler(call):
+async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик нажатий на инлайн кнопки
     """
+    call = update.callback_query
     user_id = call.from_user.id
+    chat_id = call.message.chat.id
     
     if call.data == "last":
         # Показываем последние скидки
-        bot.answer_callback_query(call.id, "Загружаю последние скидки...")
-        products = load_products()
+        await call.answer("Загружаю последние скидки...")
+        products = await asyncio.to_thread(load_products)
         
         if not products:
-            bot.send_message(
-                call.message.chat.id,
+            await dispatcher.send_message(
+                chat_id,
                 "😕 Пока нет товаров. Попробуйте позже."
             )
             return
         
         # Отправляем первые 3 товара
-        sent = 0
-        for product in products[:3]:
-            try:
-                text = format_product_card(product)
-                image = product.get('image', product.get('image_url'))
-                
-                if image:
-                    bot.send_photo(
-                        call.message.chat.id,
-                        image,
-                        caption=text,
-                        parse_mode='HTML'
-                    )
-                else:
-                    bot.send_message(
-                        call.message.chat.id,
-                        text,
-                        parse_mode='HTML'
-                    )
-                sent += 1
-                time.sleep(0.5)
-            except Exception as e:
-                log_error(f"Ошибка отправки: {e}")
+        sent = await send_product_cards(context, chat_id, products[:3])
         
         if sent == 0:
-            bot.send_message(
-                call.message.chat.id,
+            await dispatcher.send_message(
+                chat_id,
                 "😕 Не удалось загрузить товары."
             )
     
     elif call.data == "top":
         # Показываем топ
-        bot.answer_callback_query(call.id, "Загружаю топ предложений...")
-        products = load_products()
+        await call.answer("Загружаю топ предложений...")
+        products = await asyncio.to_thread(load_products)
         
         if not products:
-            bot.send_message(
-                call.message.chat.id,
+            await dispatcher.send_message(
+                chat_id,
                 "😕 Пока нет товаров. Попробуйте позже."
             )
             return
         
         text = "🏆 <b>ТОП-5 ВЫГОДНЫХ ПРЕДЛОЖЕНИЙ</b>\n\n"
         
-        for i, product in enumerate(products[:5], 1):
-            name = product.get('name', 'Без названия')[:50]
-            price = product.get('price', product.get('sale_price', 0))
-            discount = product.get('discount', 0)
-            store = product.get('store', 'Магазин')
+        for i, product in enumerate(map(Product.from_dict, products[:5]), 1):
+            name = (product.name or 'Без названия')[:50]
+            price = product.price
+            discount = product.discount
+            store = product.store or 'Магазин'
             
             price_str = f"{price:,}".replace(',', ' ')
             
@@ -546,37 +750,36 @@ def callback_handler(call):
             text += f"   💰 {price_str}₽ | 📉 -{discount}%\n"
             text += f"   🏪 {store}\n\n"
         
-        bot.send_message(
-            call.message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             text,
             parse_mode='HTML'
         )
     
     elif call.data == "premium":
         # Информация о премиум
-        bot.answer_callback_query(call.id)
+        await call.answer()
         
         if is_premium(user_id):
-            bot.send_message(
-                call.message.chat.id,
+            await dispatcher.send_message(
+                chat_id,
                 "💎 У вас уже есть активная премиум подписка!"
             )
             return
         
         # Показываем способы оплаты
-        keyboard = types.InlineKeyboardMarkup(row_width=1)
-        crypto_btn = types.InlineKeyboardButton(
+        crypto_btn = InlineKeyboardButton(
             "💎 Криптовалюта (TON)",
             callback_data="pay_crypto"
         )
-        card_btn = types.InlineKeyboardButton(
+        card_btn = InlineKeyboardButton(
             "💳 Карта РФ",
             callback_data="pay_card"
         )
-        keyboard.add(crypto_btn, card_btn)
+        keyboard = InlineKeyboardMarkup([[crypto_btn], [card_btn]])
         
-        bot.send_message(
-            call.message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             "💎 <b>Выберите способ оплаты:</b>",
             parse_mode='HTML',
             reply_markup=keyboard
@@ -584,7 +787,7 @@ def callback_handler(call):
     
     elif call.data == "pay_crypto":
         # Оплата криптовалютой
-        bot.answer_callback_query(call.id)
+        await call.answer()
         
         text = f"""💎 <b>Оплата криптовалютой TON</b>
 
@@ -598,15 +801,14 @@ def callback_handler(call):
 
 ⚠️ Средства поступят автоматически в течение нескольких минут."""
         
-        keyboard = types.InlineKeyboardMarkup()
-        check_btn = types.InlineKeyboardButton(
+        check_btn = InlineKeyboardButton(
             "✅ Проверить оплату",
             callback_data="check_payment"
         )
-        keyboard.add(check_btn)
+        keyboard = InlineKeyboardMarkup([[check_btn]])
         
-        bot.send_message(
-            call.message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             text,
             parse_mode='HTML',
             reply_markup=keyboard
@@ -614,7 +816,7 @@ def callback_handler(call):
     
     elif call.data == "pay_card":
         # Оплата картой
-        bot.answer_callback_query(call.id)
+        await call.answer()
         
         text = f"""💳 <b>Оплата картой РФ (Озон Банк)</b>
 
@@ -628,15 +830,14 @@ def callback_handler(call):
 
 ⚠️ Подписка будет активирована вручную после проверки администратором."""
         
-        keyboard = types.InlineKeyboardMarkup()
-        check_btn = types.InlineKeyboardButton(
+        check_btn = InlineKeyboardButton(
             "✅ Проверить оплату",
             callback_data="check_payment"
         )
-        keyboard.add(check_btn)
+        keyboard = InlineKeyboardMarkup([[check_btn]])
         
-        bot.send_message(
-            call.message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             text,
             parse_mode='HTML',
             reply_markup=keyboard
@@ -644,21 +845,19 @@ def callback_handler(call):
     
     elif call.data == "check_payment":
         # Проверка оплаты
-        bot.answer_callback_query(call.id, "🔄 Проверка...")
+        await call.answer("🔄 Проверка...")
         
         # Для демо активируем сразу
-        users = load_users()
-        users[str(user_id)] = {
+        user_store.upsert(user_id, {
             'expires': (datetime.now() + timedelta(days=30)).isoformat(),
             'payment_method': 'crypto',
             'activated': datetime.now().isoformat(),
             'username': call.from_user.username,
             'first_name': call.from_user.first_name
-        }
-        save_users(users)
+        })
         
-        bot.send_message(
-            call.message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             "✅ <b>Подписка успешно активирована!</b>\n\nСпасибо за поддержку! Теперь вам доступны все премиум-функции.\n\nСкоро появятся новые возможности!",
             parse_mode='HTML'
         )
@@ -667,12 +866,11 @@ def callback_handler(call):
 
 # ========== АДМИН-КОМАНДЫ ==========
 
-@bot.message_handler(commands=['admin'])
-def cmd_admin(message):
+async def cmd_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Админ-панель
     """
-    if message.from_user.id != ADMIN_ID:
+    if update.effective_user.id != ADMIN_ID:
         return
     
     text = """🔧 <b>АДМИН-ПАНЕЛЬ</b>
@@ -682,24 +880,24 @@ def cmd_admin(message):
 /broadcast - массовая рассылка
 /add_user - добавить пользователя вручную"""
     
-    bot.send_message(
-        message.chat.id,
+    await dispatcher.send_message(
+        update.effective_chat.id,
         text,
         parse_mode='HTML'
     )
 
-@bot.message_handler(commands=['users'])
-def cmd_users(message):
+async def cmd_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Список пользователей (только для админа)
     """
-    if message.from_user.id != ADMIN_ID:
+    if update.effective_user.id != ADMIN_ID:
         return
     
-    users = load_users()
+    chat_id = update.effective_chat.id
+    users = user_store.subscribers()
     
     if not users:
-        bot.send_message(message.chat.id, "📊 Нет пользователей")
+        await dispatcher.send_message(chat_id, "📊 Нет пользователей")
         return
     
     text = "📊 <b>СПИСОК ПОЛЬЗОВАТЕЛЕЙ</b>\n\n"
@@ -724,49 +922,76 @@ def cmd_users(message):
     if len(text) > 4000:
         parts = [text[i:i+4000] for i in range(0, len(text), 4000)]
         for part in parts:
-            bot.send_message(message.chat.id, part, parse_mode='HTML')
+            await dispatcher.send_message(chat_id, part, parse_mode='HTML')
     else:
-        bot.send_message(message.chat.id, text, parse_mode='HTML')
+        await dispatcher.send_message(chat_id, text, parse_mode='HTML')
 
-@bot.message_handler(commands=['stats'])
-def cmd_stats(message):
+def collect_stats() -> Dict[str, Any]:
     """
-    Статистика (только для админа)
+    Счётчики для /stats: пользователи, товары по магазинам, отслеживание цен
     """
-    if message.from_user.id != ADMIN_ID:
-        return
-    
-    users = load_users()
     products = load_products()
     
-    # Считаем активные подписки
-    active = 0
-    for uid, data in users.items():
-        try:
-            expire = datetime.fromisoformat(data.get('expires', '2000-01-01'))
-            if expire > datetime.now():
-                active += 1
-        except:
-            pass
-    
     # Считаем товары по магазинам
     stores = {}
     for p in products:
-        store = p.get('store', 'Unknown')
+        store = p.get('store') or 'Unknown'
         stores[store] = stores.get(store, 0) + 1
     
-    store_stats = "\n".join([f"   {store}: {count}" for store, count in stores.items()])
+    return {
+        # Подписки считаются по индексу, без чтения всех пользователей
+        'users': user_store.count(),
+        'active': user_store.count_active(),
+        'products': len(products),
+        'stores': stores,
+        'watches': watch_store.stats(),
+    }
+
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Статистика (только для админа)
+    """
+    if update.effective_user.id != ADMIN_ID:
+        return
+    
+    # Обход рейтинга и запросы к SQLite идут в отдельном потоке, не блокируя цикл событий
+    stats = await asyncio.to_thread(collect_stats)
+    total_users = stats['users']
+    active = stats['active']
+    watch_stats = stats['watches']
+    
+    store_stats = "\n".join([f"   {store}: {count}" for store, count in stats['stores'].items()])
+    
+    cache_stats = product_cache.stats()
+    last_reload = cache_stats['last_reload'].strftime('%H:%M:%S') if cache_stats['last_reload'] else '—'
+    send_stats = dispatcher.stats()
     
     text = f"""📈 <b>СТАТИСТИКА ПРОЕКТА</b>
 
 👥 <b>Пользователи:</b>
-   Всего: {len(users)}
+   Всего: {total_users}
    Активных подписок: {active}
 
 📦 <b>Товары:</b>
-   Всего: {len(products)}
+   Всего: {stats['products']}
 {store_stats}
 
+🗄 <b>Кеш товаров:</b>
+   Попаданий: {cache_stats['hits']}
+   Перезагрузок: {cache_stats['reloads']}
+   Последняя: {last_reload} ({cache_stats['last_reload_ms']:.0f} мс)
+
+📤 <b>Отправка сообщений:</b>
+   Отправлено: {send_stats['sent']}
+   Склеено: {send_stats['coalesced']}
+   Повторов после 429: {send_stats['retried']}
+   В очереди: {send_stats['queued']}
+
+🔔 <b>Отслеживание цен:</b>
+   Подписок: {watch_stats['watches']}
+   Товаров: {watch_stats['products']}
+   Уведомлений в очереди: {watch_stats['pending']}
+
 💰 <b>Доход (оценка):</b>
    {active * 500}₽/месяц
 
@@ -775,48 +1000,215 @@ def cmd_stats(message):
    Канал: {CHANNEL_ID}
    Последний запуск: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
     
-    bot.send_message(message.chat.id, text, parse_mode='HTML')
+    await dispatcher.send_message(update.effective_chat.id, text, parse_mode='HTML')
 
-@bot.message_handler(commands=['add_user'])
-def cmd_add_user(message):
+async def cmd_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Массовая рассылка всем пользователям (только для админа)
+    Прогресс обновляется в отдельном сообщении, после перезапуска бота рассылка продолжается
+    """
+    if update.effective_user.id != ADMIN_ID:
+        return
+    
+    chat_id = update.effective_chat.id
+    
+    # Текст берём из сообщения целиком, чтобы сохранить переносы строк
+    parts = (update.effective_message.text or '').split(maxsplit=1)
+    if len(parts) < 2:
+        await dispatcher.send_message(
+            chat_id,
+            "❌ Формат: /broadcast ТЕКСТ\nПоддерживается HTML-разметка и переносы строк"
+        )
+        return
+    
+    running = broadcast_engine.unfinished()
+    if running:
+        await dispatcher.send_message(chat_id, f"⚠️ Уже идёт рассылка #{running[0]}")
+        return
+    
+    broadcast_id = broadcast_engine.create(parts[1], chat_id)
+    log_info(f"Запущена рассылка #{broadcast_id}")
+    broadcast_engine.start(broadcast_id)
+
+async def cmd_add_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Добавление пользователя вручную (только для админа)
     """
-    if message.from_user.id != ADMIN_ID:
+    if update.effective_user.id != ADMIN_ID:
         return
     
+    chat_id = update.effective_chat.id
+    
     try:
         # Формат: /add_user 123456789 30
-        parts = message.text.split()
-        if len(parts) != 3:
-            bot.send_message(
-                message.chat.id,
+        if len(context.args) != 2:
+            await dispatcher.send_message(
+                chat_id,
                 "❌ Формат: /add_user USER_ID DAYS\nПример: /add_user 123456789 30"
             )
             return
         
-        user_id = parts[1]
-        days = int(parts[2])
+        user_id = context.args[0]
+        days = int(context.args[1])
         
-        users = load_users()
-        users[user_id] = {
+        user_store.upsert(user_id, {
             'expires': (datetime.now() + timedelta(days=days)).isoformat(),
             'payment_method': 'manual',
             'activated': datetime.now().isoformat(),
             'added_by': 'admin'
-        }
-        save_users(users)
+        })
         
-        bot.send_message(
-            message.chat.id,
+        await dispatcher.send_message(
+            chat_id,
             f"✅ Пользователь {user_id} добавлен на {days} дней"
         )
-        
+    
     except Exception as e:
-        bot.send_message(message.chat.id, f"❌ Ошибка: {e}")
+        await dispatcher.send_message(chat_id, f"❌ Ошибка: {e}")
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Логирует ошибки обработчиков, чтобы они не терялись
+    """
+    log_error(f"Ошибка при обработке обновления: {context.error}")
 
 # ========== ЗАПУСК БОТА ==========
 
+COMMANDS = {
+    'start': cmd_start,
+    'last': cmd_last,
+    'top': cmd_top,
+    'search': cmd_search,
+    'premium': cmd_premium,
+    'watch': cmd_watch,
+    'unwatch': cmd_unwatch,
+    'help': cmd_help,
+    'admin': cmd_admin,
+    'users': cmd_users,
+    'stats': cmd_stats,
+    'add_user': cmd_add_user,
+    'broadcast': cmd_broadcast,
+}
+
+# ========== УВЕДОМЛЕНИЯ О СНИЖЕНИИ ЦЕН ==========
+
+def format_price_drop(notification: Mapping[str, Any]) -> str:
+    """
+    Форматирует уведомление о снижении цены
+    """
+    old_price = notification['old_price']
+    new_price = notification['new_price']
+    percent = (old_price - new_price) * 100 // old_price if old_price else 0
+    name = notification['name'] or f"{notification['store']} {notification['product_id']}"
+    
+    return f"""📉 <b>Цена снизилась!</b>
+
+<b>{name}</b>
+
+💰 <b>{f"{new_price:,}".replace(',', ' ')}₽</b> (было {f"{old_price:,}".replace(',', ' ')}₽, -{percent}%)
+🏪 Магазин: {notification['store']}
+
+👉 <a href='{notification['url'] or '#'}'>Перейти к товару</a>"""
+
+async def send_price_drop(notification: Mapping[str, Any]):
+    """
+    Отправляет одно уведомление; подписка могла закончиться с момента /watch
+    Если пользователь заблокировал бота или подписки больше нет, уведомление
+    тоже считается обработанным. Прочие ошибки (таймаут, сеть, 429 после всех
+    повторов) пробрасываются — такое уведомление остаётся в очереди
+    """
+    if not is_premium(notification['user_id']):
+        return
+    try:
+        await dispatcher.send_message(
+            int(notification['user_id']),
+            format_price_drop(notification),
+            priority=PRIORITY_NORMAL,
+            parse_mode='HTML'
+        )
+    except Forbidden:
+        user_store.mark_blocked(notification['user_id'])
+
+async def send_price_drops():
+    """
+    Разбирает очередь уведомлений пачками
+    С очереди снимаются только обработанные уведомления; неудачные остаются
+    и уйдут при следующей проверке, не задерживая остальные в этом проходе
+    """
+    after_id = 0
+    while True:
+        batch = await asyncio.to_thread(watch_store.pending, 200, after_id)
+        if not batch:
+            return
+        after_id = batch[-1]['id']
+        results = await asyncio.gather(*map(send_price_drop, batch), return_exceptions=True)
+        done = []
+        for notification, result in zip(batch, results):
+            if isinstance(result, Exception):
+                log_error(f"Ошибка отправки уведомления, повторим позже: {result}")
+            else:
+                done.append(notification['id'])
+        await asyncio.to_thread(watch_store.mark_sent, done)
+
+async def watch_prices():
+    """
+    Сверяет цены после каждого обновления выгрузок в data/ и рассылает уведомления
+    """
+    last_signature = None
+    while True:
+        try:
+            signature = product_cache.signature()
+            if signature and signature != last_signature:
+                stats = await asyncio.to_thread(check_prices, 'data', watch_store)
+                last_signature = signature
+                log_info(f"Проверка цен: отслеживаемых {stats['watched']}, подешевело {stats['drops']}, "
+                         f"уведомлений {stats['notifications']}")
+            await send_price_drops()
+        except Exception as e:
+            log_error(f"Ошибка проверки цен: {e}")
+        await asyncio.sleep(WATCH_CHECK_INTERVAL)
+
+async def start_background_tasks(application: Application):
+    """
+    Продолжает рассылки, прерванные остановкой или падением бота, и запускает проверку цен
+    """
+    global watch_task
+    
+    for broadcast_id in broadcast_engine.unfinished():
+        log_info(f"Продолжаю рассылку #{broadcast_id}")
+        broadcast_engine.start(broadcast_id)
+    
+    watch_task = asyncio.get_running_loop().create_task(watch_prices())
+
+async def stop_background_tasks(application: Application):
+    """
+    Досылает очередь сообщений при остановке бота
+    Рассылки прерываются с сохранением прогресса и продолжатся после запуска
+    """
+    if watch_task is not None:
+        watch_task.cancel()
+    await broadcast_engine.stop()
+    await dispatcher.stop()
+
+def build_application(token: str = BOT_TOKEN, base_url: Optional[str] = None) -> Application:
+    """
+    Собирает приложение бота со всеми обработчиками
+    base_url позволяет направить запросы на другой Bot API сервер (например, локальный)
+    """
+    builder = Application.builder().token(token).concurrent_updates(True)
+    builder = builder.post_init(start_background_tasks).post_shutdown(stop_background_tasks)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    dispatcher.bot = application.bot
+    
+    for command, handler in COMMANDS.items():
+        application.add_handler(CommandHandler(command, handler))
+    application.add_handler(CallbackQueryHandler(callback_handler))
+    application.add_error_handler(error_handler)
+    
+    return application
+
 if __name__ == '__main__':
     log_info("=" * 50)
     log_info("🚀 ЗАПУСК БОТА PRICEHUNTERSK")
@@ -837,7 +1229,7 @@ if __name__ == '__main__':
     print("=" * 60)
     
     try:
-        bot.infinity_polling(timeout=60, long_polling_timeout=60)
+        build_application().run_polling(timeout=60, allowed_updates=Update.ALL_TYPES)
     except KeyboardInterrupt:
         log_info("🛑 Бот остановлен пользователем")
         print("\n🛑 Бот остановлен")
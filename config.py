@@ -15,3 +15,26 @@ CARD_NUMBER = '2204 3206 4195 8311'  # Карта Озон
 # Настройки парсинга
 PARSING_INTERVAL = 6  # часов
 MAX_PRODUCTS_PER_STORE = 50  # максимум товаров с одного магазина
+MAX_CONCURRENT_REQUESTS = 8  # потоков загрузки карточек
+MAX_REQUESTS_PER_HOST = 4  # одновременных запросов к одному хосту
+CARD_BATCH_SIZE = 100  # ID товаров в одном запросе к card.wb.ru
+RATE_LIMIT_START = 4  # стартовая скорость запросов к хосту, запросов/сек
+RATE_LIMIT_MIN = 0.2  # нижняя граница скорости при 429/5xx
+RATE_LIMIT_MAX = 20  # верхняя граница скорости
+HTTP_CACHE_MAX_MB = 50  # размер дискового кеша страниц категорий
+CARD_CACHE_TTL_HOURS = 6  # сколько часов карточка товара считается свежей
+CARD_NEGATIVE_TTL_HOURS = 24  # сколько часов не перепроверять товары без скидки
+MAX_GLOBAL_REQUESTS = 16  # одновременных HTTP запросов на все магазины
+MAX_PARALLEL_STORES = 3  # магазинов, которые парсятся одновременно
+MIN_DEAL_YIELD = 0.1  # ниже этой доли товаров со скидкой категорию дальше не листаем
+CATEGORY_MAX_PAGES = 10  # максимум страниц на категорию
+OUTPUT_GZIP = os.getenv('OUTPUT_GZIP', '') == '1'  # сжимать выгрузки магазинов в .jsonl.gz
+USER_CACHE_TTL_SECONDS = 60  # сколько секунд помнить статус подписки пользователя
+TELEGRAM_GLOBAL_RATE = 28  # сообщений/сек на всех получателей (лимит Telegram ~30)
+TELEGRAM_CHAT_RATE = 1  # сообщений/сек в один личный чат
+TELEGRAM_GROUP_RATE = 20 / 60  # сообщений/сек в группу или канал (20 в минуту)
+BROADCAST_WINDOW = 500  # одновременных отправок рассылки в очереди
+WATCH_CHECK_INTERVAL = 60  # как часто бот проверяет обновление выгрузок для /watch, секунды
+WATCH_LIMIT_PER_USER = 50  # товаров в отслеживании у одного пользователя
+WATCH_MIN_DROP_PERCENT = 1  # минимальное снижение цены для уведомления, %
+WATCH_FETCH_MISSING = 0  # сколько отслеживаемых товаров WB вне выгрузки догружать за проверку (0 — не догружать)
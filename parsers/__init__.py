@@ -3,4 +3,7 @@ from .wildberries import WildberriesParser
 from .ozon import OzonParser
 from .aliexpress import AliExpressParser
 
-__all__ = ['WildberriesParser', 'OzonParser', 'AliExpressParser']
+# Парсеры, которые запускает parsers/runner.py
+PARSERS = [WildberriesParser, OzonParser, AliExpressParser]
+
+__all__ = ['WildberriesParser', 'OzonParser', 'AliExpressParser', 'PARSERS']
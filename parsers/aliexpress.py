@@ -1,10 +1,13 @@
 import requests
-import json
-import time
 import os
-import re
-from datetime import datetime
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Callable, Optional
+
+# Добавляем путь к проекту для импорта utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.product import Product
+from utils.storage import ProductWriter, store_output_path
 
 class AliExpressParser:
     """
@@ -23,6 +26,7 @@ class AliExpressParser:
         self.session = requests.Session()
         self.session.headers.update(self.headers)
         self.products = []
+        self.output_file = store_output_path('aliexpress')
     
     def get_categories(self) -> List[Dict[str, str]]:
         """
@@ -120,9 +124,10 @@ class AliExpressParser:
             }
         ]
     
-    def parse_all(self) -> List[Dict[str, Any]]:
+    def parse_all(self, on_product: Optional[Callable[[Product], None]] = None) -> List[Product]:
         """
         Парсит все категории
+        on_product получает товары сразу после оценки (для потоковой записи)
         """
         print("=" * 60)
         print(f"🚀 ЗАПУСК ПАРСЕРА {self.store_name}")
@@ -130,7 +135,14 @@ class AliExpressParser:
         
         # Пока используем тестовые данные
         # В следующей версии добавим реальный парсинг
-        products = self.get_test_products()
+        products = [Product.from_dict(product) for product in self.get_test_products()]
+        
+        if on_product:
+            for product in products:
+                on_product(product)
+        
+        # Сортируем по выгодности: объединение магазинов ждёт отсортированные файлы
+        products.sort(key=lambda x: x.value_score, reverse=True)
         
         print(f"📊 ИТОГО: {len(products)} товаров со скидкой")
         print("=" * 60)
@@ -142,17 +154,12 @@ def main():
     Основная функция запуска
     """
     parser = AliExpressParser()
-    products = parser.parse_all()
-    
-    # Создаем папку data если её нет
-    os.makedirs('data', exist_ok=True)
-    
-    # Сохраняем результаты
-    output_file = 'data/aliexpress.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
     
-    print(f"💾 Сохранено в {output_file}")
+    # Товары пишутся в журнал по мере оценки, итоговый файл подменяется в конце
+    with ProductWriter(parser.output_file) as writer:
+        products = parser.parse_all(on_product=writer.write)
+        writer.commit(products)
+    print(f"💾 Сохранено в {parser.output_file}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Общий запуск всех парсеров
+Магазины независимы, поэтому парсятся параллельно, а результат каждого
+сохраняется в data/<магазин>.jsonl, как при отдельном запуске
+
+Запуск:
+    python -m parsers.runner
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import MAX_PARALLEL_STORES
+except ImportError:
+    MAX_PARALLEL_STORES = int(os.getenv('MAX_PARALLEL_STORES', '3'))
+
+from parsers import PARSERS
+from utils.storage import ProductWriter
+
+
+def run_parser(parser_class) -> Dict[str, Any]:
+    """
+    Запускает один парсер и потоково сохраняет его результат
+    При ошибке уже найденные товары остаются в журнале <файл>.part
+    """
+    started = time.monotonic()
+    parser = parser_class()
+    
+    with ProductWriter(parser.output_file) as writer:
+        products = parser.parse_all(on_product=writer.write)
+        writer.commit(products)
+    print(f"💾 Сохранено в {parser.output_file}")
+    
+    return {
+        'store': parser.store_name,
+        'count': len(products),
+        'seconds': time.monotonic() - started,
+    }
+
+
+def run_all(parser_classes: Optional[List] = None, max_parallel: int = MAX_PARALLEL_STORES) -> List[Dict[str, Any]]:
+    """
+    Запускает все парсеры параллельно
+    Ошибка одного магазина не останавливает остальные
+    """
+    parser_classes = parser_classes or PARSERS
+    started = time.monotonic()
+    results = []
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(parser_classes)))) as executor:
+        futures = {executor.submit(run_parser, cls): cls for cls in parser_classes}
+        
+        for future in as_completed(futures):
+            name = futures[future].__name__
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ {name} завершился с ошибкой: {e}")
+                results.append({'store': name, 'count': 0, 'seconds': 0, 'error': str(e)})
+    
+    print("=" * 60)
+    print(f"🏁 ВСЕ ПАРСЕРЫ ЗАВЕРШЕНЫ за {time.monotonic() - started:.1f} с")
+    for result in results:
+        status = '❌' if result.get('error') else '✅'
+        print(f"{status} {result['store']}: {result['count']} товаров, {result['seconds']:.1f} с")
+    print("=" * 60)
+    
+    return results
+
+
+def main():
+    """
+    Основная функция запуска
+    """
+    results = run_all()
+    
+    # Код ошибки, только если не отработал ни один магазин
+    if results and all(r.get('error') for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
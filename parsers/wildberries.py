@@ -1,10 +1,50 @@
 import requests
-import json
-import time
 import os
 import re
-from datetime import datetime
-from typing import List, Dict, Any
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import MAX_CONCURRENT_REQUESTS, MAX_REQUESTS_PER_HOST, CARD_BATCH_SIZE
+    from config import MAX_PRODUCTS_PER_STORE, MIN_DEAL_YIELD, CATEGORY_MAX_PAGES
+except ImportError:
+    MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '8'))
+    MAX_REQUESTS_PER_HOST = int(os.getenv('MAX_REQUESTS_PER_HOST', '4'))
+    CARD_BATCH_SIZE = int(os.getenv('CARD_BATCH_SIZE', '100'))
+    MAX_PRODUCTS_PER_STORE = int(os.getenv('MAX_PRODUCTS_PER_STORE', '50'))
+    MIN_DEAL_YIELD = float(os.getenv('MIN_DEAL_YIELD', '0.1'))
+    CATEGORY_MAX_PAGES = int(os.getenv('CATEGORY_MAX_PAGES', '10'))
+
+from utils.rate_limiter import THROTTLE_STATUSES, rate_limiter
+from utils.http_cache import HttpCache
+from utils.card_cache import CardCache
+from utils.product import Product
+from utils.storage import ProductWriter, store_output_path
+from utils.scoring import MAX_VALUE_SCORE, calculate_value_score, score_products
+from utils.topk import TopK
+
+# ID товаров в атрибутах карточек: data-nm, data-id, data-popup-nm
+# Шаблоны начинаются с литерала, поэтому re ищет их быстрым поиском подстроки;
+# общая альтернатива с ссылками такой оптимизации лишена и работает вдвое медленнее
+PRODUCT_ATTR_RE = re.compile(r'data-(?:popup-nm|nm|id)="(\d+)"')
+# ID товаров в ссылках на карточку
+PRODUCT_LINK_RE = re.compile(r'/catalog/(\d+)/detail\.aspx')
+
+# Те же шаблоны для потокового разбора байтов
+PRODUCT_ATTR_BYTES_RE = re.compile(PRODUCT_ATTR_RE.pattern.encode('ascii'))
+PRODUCT_LINK_BYTES_RE = re.compile(PRODUCT_LINK_RE.pattern.encode('ascii'))
+# Сколько байт хвоста переносить между кусками (длиннее любого совпадения)
+STREAM_OVERLAP = 64
+# Минимальная скидка товара, %
+MIN_DISCOUNT = 20
 
 class WildberriesParser:
     """
@@ -12,7 +52,9 @@ class WildberriesParser:
     Собирает товары со скидками из разных категорий
     """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = MAX_CONCURRENT_REQUESTS,
+                 per_host_limit: int = MAX_REQUESTS_PER_HOST, concurrent: bool = True,
+                 card_cache_path: str = 'data/cards.db'):
         self.store_name = 'Wildberries'
         self.base_url = 'https://www.wildberries.ru'
         self.headers = {
@@ -30,11 +72,54 @@ class WildberriesParser:
         self.session = requests.Session()
         self.session.headers.update(self.headers)
         self.products = []
+        self.output_file = store_output_path('wildberries')
+        
+        # Параллельная загрузка карточек
+        self.concurrent = concurrent
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.products_per_category = 20
+        self.batch_size = CARD_BATCH_SIZE
+        
+        # Обход страниц категории
+        self.max_pages = CATEGORY_MAX_PAGES
+        self.min_deal_yield = MIN_DEAL_YIELD
+        self.max_products = MAX_PRODUCTS_PER_STORE
+        self.card_api_url = 'https://card.wb.ru/cards/detail'
+        
+        # Режим обхода по умолчанию: 'catalog' (JSON-каталог) или 'html'
+        self.crawl_mode = 'catalog'
+        self.catalog_api_url = 'https://catalog.wb.ru/catalog'
+        self.menu_url = 'https://static-basket-01.wbbasket.ru/vol0/data/main-menu-ru-ru-v2.json'
+        self._catalog_menu: Optional[Dict[str, Dict[str, str]]] = None
+        self.http_cache = HttpCache()
         
+        # Потоковое чтение страниц категорий: останавливаемся, набрав нужное число ID
+        self.stream_pages = True
+        self.card_cache = CardCache(card_cache_path)
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+        
+        # Пул соединений должен вмещать все одновременные запросы
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """
+        Возвращает семафор, ограничивающий число одновременных запросов к хосту
+        """
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+    
     def get_categories(self) -> List[Dict[str, str]]:
         """
         Возвращает список категорий для парсинга
         Каждая категория содержит название и URL
+        Необязательный ключ 'mode' ('catalog' или 'html') задаёт способ обхода
         """
         return [
             {'name': 'electronics', 'url': f'{self.base_url}/catalog/elektronika', 'emoji': '📱'},
@@ -57,227 +142,494 @@ class WildberriesParser:
     def fetch_page(self, url: str, retries: int = 3) -> str:
         """
         Загружает HTML страницы с повторными попытками
+        Паузы и повторы при 429/5xx выполняет rate_limiter
         """
-        for attempt in range(retries):
-            try:
-                response = self.session.get(url, timeout=15)
+        try:
+            response = rate_limiter.get(url, session=self.session, retries=retries, timeout=15)
+            
+            if response.status_code == 200:
+                return response.text
+            print(f"⚠️ Статус {response.status_code} для {url}")
+                
+        except requests.exceptions.Timeout:
+            print(f"⏰ Таймаут: {url}")
+        except requests.exceptions.ConnectionError:
+            print(f"🔌 Ошибка соединения: {url}")
+        except Exception as e:
+            print(f"❌ Неизвестная ошибка: {e}")
+        
+        return None
+    
+    def fetch_category_ids(self, url: str, limit: Optional[int] = None) -> Optional[List[str]]:
+        """
+        Возвращает ID товаров со страницы категории
+        Использует условный запрос: на 304 отдаёт список из кеша
+        В потоковом режиме читает страницу кусками и останавливается на limit ID
+        """
+        # Неполный список из потока годится только для запросов с тем же или меньшим limit
+        cache_limit = limit if self.stream_pages else None
+        try:
+            response = rate_limiter.get(
+                url,
+                session=self.session,
+                headers=self.http_cache.conditional_headers(url, cache_limit),
+                timeout=15,
+                stream=self.stream_pages,
+            )
+            
+            with response:
+                if response.status_code == 304:
+                    ids = self.http_cache.get_ids(url, cache_limit)
+                    if ids is not None:
+                        print("♻️ Страница не изменилась, ID взяты из кеша")
+                        return ids
+                    # Запись пропала из кеша: загружаем страницу заново,
+                    # освободив слот потокового ответа
+                    response.close()
+                    html = self.fetch_page(url)
+                    return self.extract_product_id(html) if html else None
                 
                 if response.status_code == 200:
-                    return response.text
-                elif response.status_code == 429:
-                    # Слишком много запросов
-                    wait_time = 10 * (attempt + 1)
-                    print(f"⚠️ 429 ошибка. Ждем {wait_time} секунд...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"⚠️ Статус {response.status_code}. Попытка {attempt + 1}/{retries}")
-                    time.sleep(5)
-                    
-            except requests.exceptions.Timeout:
-                print(f"⏰ Таймаут. Попытка {attempt + 1}/{retries}")
-                time.sleep(5)
-            except requests.exceptions.ConnectionError:
-                print(f"🔌 Ошибка соединения. Попытка {attempt + 1}/{retries}")
-                time.sleep(5)
-            except Exception as e:
-                print(f"❌ Неизвестная ошибка: {e}")
-                time.sleep(5)
+                    read_limit = None
+                    if self.stream_pages:
+                        ids = self.extract_product_id_stream(response.iter_content(chunk_size=64 * 1024), limit)
+                        body = None
+                        # Набрали limit ID — значит, страница могла быть прочитана не до конца
+                        if limit and len(ids) >= limit:
+                            read_limit = limit
+                    else:
+                        body = response.text
+                        ids = self.extract_product_id(body)
+                    self.http_cache.store(url, response.headers, body, ids, read_limit)
+                    return ids
+                
+                print(f"⚠️ Статус {response.status_code} для {url}")
+        except Exception as e:
+            print(f"❌ Ошибка загрузки {url}: {e}")
         
         return None
     
+    def extract_product_id_stream(self, chunks: Iterable[bytes], limit: Optional[int] = None) -> List[str]:
+        """
+        Извлекает ID товаров из потока кусков страницы
+        Хвост предыдущего куска переносится, чтобы не терять ID на границе
+        Останавливается, как только набрано limit ID
+        """
+        ids: Dict[str, None] = {}
+        tail = b''
+        
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer = tail + chunk
+            last_end = 0
+            
+            for pattern in (PRODUCT_ATTR_BYTES_RE, PRODUCT_LINK_BYTES_RE):
+                for match in pattern.finditer(buffer):
+                    ids.setdefault(match.group(1).decode('ascii'), None)
+                    last_end = max(last_end, match.end())
+            
+            if limit and len(ids) >= limit:
+                break
+            
+            # Всё, что может оказаться началом неполного совпадения, оставляем на следующий кусок
+            tail = buffer[max(last_end, len(buffer) - STREAM_OVERLAP):]
+        
+        return list(ids)[:limit] if limit else list(ids)
+    
     def extract_product_id(self, html: str) -> List[str]:
         """
         Извлекает ID товаров из HTML
+        Порядок совпадает с порядком карточек на странице (ранжирование выдачи),
+        ID, встреченные только в ссылках, идут в конце
         """
-        # Ищем ID товаров в разных форматах
-        patterns = [
-            r'data-nm="(\d+)"',
-            r'data-id="(\d+)"',
-            r'data-popup-nm="(\d+)"',
-            r'/catalog/(\d+)/detail\.aspx',
-        ]
+        ids = chain(PRODUCT_ATTR_RE.findall(html), PRODUCT_LINK_RE.findall(html))
+        
+        # Убираем дубликаты, сохраняя первое вхождение
+        return list(dict.fromkeys(ids))
+    
+    def build_product(self, product: Dict[str, Any], product_id: str = None) -> Product:
+        """
+        Собирает товар из карточки API Wildberries
+        """
+        product_id = str(product_id or product.get('id', ''))
+        
+        # Базовая цена
+        price = product.get('salePriceU', 0) // 100  # В копейках
+        old_price = product.get('priceU', 0) // 100
+        
+        # В новых ответах каталога цены лежат в размерах
+        if not price:
+            for size in product.get('sizes') or []:
+                size_price = size.get('price') or {}
+                if size_price.get('product'):
+                    price = size_price['product'] // 100
+                    old_price = size_price.get('basic', 0) // 100
+                    break
         
-        ids = []
-        for pattern in patterns:
-            found = re.findall(pattern, html)
-            ids.extend(found)
+        # Скидка
+        if old_price > 0:
+            discount = int(((old_price - price) / old_price) * 100)
+        else:
+            discount = 0
         
-        # Убираем дубликаты
-        return list(set(ids))
+        return Product.from_dict({
+            'id': product_id,
+            'name': product.get('name', ''),
+            'brand': product.get('brand', ''),
+            'price': price,
+            'old_price': old_price,
+            'discount': discount,
+            'rating': product.get('rating', product.get('reviewRating', 0)),
+            'reviews': product.get('feedbacks', 0),
+            'url': f'https://www.wildberries.ru/catalog/{product_id}/detail.aspx',
+            'image': f'https://images.wbstatic.net/c516x688/{product_id}-1.jpg',
+        })
     
-    def get_product_info(self, product_id: str) -> Dict[str, Any]:
+    def get_product_info(self, product_id: str) -> Optional[Product]:
         """
         Получает информацию о товаре по ID
         """
         try:
             # Пробуем получить данные через API Wildberries
-            api_url = f'https://card.wb.ru/cards/detail?nm={product_id}'
-            response = self.session.get(api_url, timeout=10)
+            api_url = f'{self.card_api_url}?nm={product_id}'
+            with self._host_slot(api_url):
+                response = rate_limiter.get(api_url, session=self.session, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
                 if data.get('data', {}).get('products'):
-                    product = data['data']['products'][0]
-                    
-                    # Базовая цена
-                    price = product.get('salePriceU', 0) // 100  # В копейках
-                    old_price = product.get('priceU', 0) // 100
-                    
-                    # Скидка
-                    if old_price > 0:
-                        discount = int(((old_price - price) / old_price) * 100)
-                    else:
-                        discount = 0
-                    
-                    return {
-                        'id': product_id,
-                        'name': product.get('name', ''),
-                        'brand': product.get('brand', ''),
-                        'price': price,
-                        'old_price': old_price,
-                        'discount': discount,
-                        'rating': product.get('rating', 0),
-                        'reviews': product.get('feedbacks', 0),
-                        'url': f'https://www.wildberries.ru/catalog/{product_id}/detail.aspx',
-                        'image': f'https://images.wbstatic.net/c516x688/{product_id}-1.jpg',
-                    }
+                    return self.build_product(data['data']['products'][0], product_id)
             
-            time.sleep(1)  # Не долбим API слишком часто
             return None
             
         except Exception as e:
             print(f"Ошибка получения товара {product_id}: {e}")
             return None
     
+    def get_products_batch(self, product_ids: List[str]) -> Dict[str, Product]:
+        """
+        Получает карточки нескольких товаров одним запросом
+        При ошибке 4xx или неразборчивом ответе делит пачку пополам и повторяет;
+        на 429/5xx и сетевых ошибках (повторы ограничителя исчерпаны) пачка
+        пропускается, чтобы не засыпать мелкими запросами и без того перегруженный хост
+        Возвращает словарь {ID: товар}
+        """
+        if not product_ids:
+            return {}
+        
+        try:
+            api_url = f"{self.card_api_url}?nm={';'.join(product_ids)}"
+            with self._host_slot(api_url):
+                response = rate_limiter.get(api_url, session=self.session, timeout=15)
+            
+            if response.status_code in THROTTLE_STATUSES:
+                print(f"⚠️ Пачка из {len(product_ids)} товаров не загрузилась (статус {response.status_code}), пропускаем")
+                return {}
+            
+            if response.status_code == 200:
+                data = response.json()
+                found = {}
+                for raw in data.get('data', {}).get('products') or []:
+                    pid = str(raw.get('id', ''))
+                    if pid:
+                        found[pid] = self.build_product(raw, pid)
+                return found
+            
+            error = f"статус {response.status_code}"
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            print(f"⚠️ Пачка из {len(product_ids)} товаров не загрузилась ({e}), пропускаем")
+            return {}
+        except Exception as e:
+            error = str(e)
+        
+        if len(product_ids) == 1:
+            print(f"Ошибка получения товара {product_ids[0]}: {error}")
+            return {}
+        
+        # Делим пачку пополам и пробуем ещё раз
+        middle = len(product_ids) // 2
+        print(f"⚠️ Пачка из {len(product_ids)} товаров не загрузилась ({error}), делим пополам")
+        found = self.get_products_batch(product_ids[:middle])
+        found.update(self.get_products_batch(product_ids[middle:]))
+        return found
+    
+    def fetch_products(self, product_ids: List[str]) -> List[Optional[Product]]:
+        """
+        Загружает карточки товаров пачками, пачки идут параллельно
+        Порядок результатов совпадает с порядком ID
+        """
+        if not product_ids:
+            return []
+        
+        batches = [
+            product_ids[i:i + self.batch_size]
+            for i in range(0, len(product_ids), self.batch_size)
+        ]
+        
+        found = {}
+        workers = min(self.max_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_result in executor.map(self.get_products_batch, batches):
+                found.update(batch_result)
+        
+        return [found.get(str(pid)) for pid in product_ids]
+    
     def calculate_value_score(self, product: Dict[str, Any]) -> int:
         """
         Рассчитывает выгодность товара (0-100)
+        Пороги и баллы описаны в utils/scoring.py
         """
-        score = 0
-        reasons = []
-        
-        # 1. Скидка (максимум 40 баллов)
-        discount = product.get('discount', 0)
-        if discount >= 70:
-            score += 40
-            reasons.append("мегаскидка 70%+")
-        elif discount >= 50:
-            score += 30
-            reasons.append("огромная скидка 50%+")
-        elif discount >= 30:
-            score += 20
-            reasons.append("хорошая скидка 30%+")
-        elif discount >= 20:
-            score += 10
-            reasons.append("скидка 20%+")
-        
-        # 2. Рейтинг (максимум 20 баллов)
-        rating = product.get('rating', 0)
-        if rating >= 4.8:
-            score += 20
-            reasons.append("топ-рейтинг 4.8+")
-        elif rating >= 4.5:
-            score += 15
-            reasons.append("высокий рейтинг 4.5+")
-        elif rating >= 4.0:
-            score += 10
-            reasons.append("хороший рейтинг")
-        
-        # 3. Количество отзывов (максимум 20 баллов)
-        reviews = product.get('reviews', 0)
-        if reviews >= 1000:
-            score += 20
-            reasons.append("1000+ отзывов")
-        elif reviews >= 500:
-            score += 15
-            reasons.append("500+ отзывов")
-        elif reviews >= 100:
-            score += 10
-            reasons.append("100+ отзывов")
-        
-        # 4. Экономия в рублях (максимум 20 баллов)
-        savings = product.get('old_price', 0) - product.get('price', 0)
-        if savings >= 10000:
-            score += 20
-            reasons.append(f"экономия {savings:,}₽".replace(',', ' '))
-        elif savings >= 5000:
-            score += 15
-            reasons.append(f"экономия {savings:,}₽".replace(',', ' '))
-        elif savings >= 1000:
-            score += 10
-            reasons.append(f"экономия {savings:,}₽".replace(',', ' '))
-        
-        product['value_score'] = score
-        product['value_reasons'] = reasons
-        
-        return score
+        return calculate_value_score(product)
     
-    def parse_category(self, category: Dict[str, str]) -> List[Dict[str, Any]]:
+    def get_catalog_menu(self) -> Dict[str, Dict[str, str]]:
         """
-        Парсит одну категорию
+        Загружает меню каталога Wildberries
+        Возвращает словарь {путь категории: {'shard': ..., 'query': ...}}
         """
-        print(f"📁 Парсим категорию: {category['name']}")
+        if self._catalog_menu is not None:
+            return self._catalog_menu
         
-        html = self.fetch_page(category['url'])
-        if not html:
-            print(f"❌ Не удалось загрузить {category['url']}")
-            return []
+        self._catalog_menu = {}
+        try:
+            response = rate_limiter.get(self.menu_url, session=self.session, timeout=15)
+            if response.status_code != 200:
+                print(f"⚠️ Меню каталога недоступно: статус {response.status_code}")
+                return self._catalog_menu
+            
+            # Обходим дерево категорий
+            stack = list(response.json())
+            while stack:
+                node = stack.pop()
+                if node.get('url') and node.get('shard') and node.get('query'):
+                    self._catalog_menu[node['url'].rstrip('/')] = {
+                        'shard': node['shard'],
+                        'query': node['query'],
+                    }
+                stack.extend(node.get('childs') or [])
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки меню каталога: {e}")
+        
+        return self._catalog_menu
+    
+    def fetch_catalog_page(self, category: Dict[str, str], page: int = 1) -> Optional[List[Product]]:
+        """
+        Загружает страницу JSON-каталога категории
+        Возвращает готовые товары или None, если каталог недоступен
+        """
+        path = urlparse(category['url']).path.rstrip('/')
+        params = self.get_catalog_menu().get(path)
+        if not params:
+            return None
+        
+        api_url = (
+            f"{self.catalog_api_url}/{params['shard']}/catalog"
+            f"?appType=1&curr=rub&dest=-1257786&sort=popular&spp=30"
+            f"&{params['query']}&page={page}"
+        )
+        try:
+            with self._host_slot(api_url):
+                response = rate_limiter.get(api_url, session=self.session, timeout=15)
+            
+            if response.status_code != 200:
+                print(f"⚠️ Каталог {category['name']}: статус {response.status_code}")
+                return None
+            
+            raw_products = response.json().get('data', {}).get('products') or []
+            # Каталог сразу отдаёт карточки целиком, кеш карточек здесь не нужен
+            return [self.build_product(raw) for raw in raw_products if raw.get('id')]
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки каталога {category['name']}: {e}")
+            return None
+    
+    def fetch_html_products(self, category: Dict[str, str], page: int = 1,
+                            seen_ids: Optional[set] = None) -> Tuple[List[Product], int]:
+        """
+        Загружает товары одной страницы категории через HTML и API карточек
+        Возвращает (товары, сколько новых ID было на странице)
+        """
+        url = category['url'] if page == 1 else f"{category['url']}?page={page}"
         
         # Получаем ID товаров
-        product_ids = self.extract_product_id(html)
-        print(f"🔍 Найдено ID товаров: {len(product_ids)}")
+        product_ids = self.fetch_category_ids(url, limit=self.products_per_category)
+        if product_ids is None:
+            print(f"❌ Не удалось загрузить {url}")
+            return [], 0
         
-        # Берем только первые 20, чтобы не перегружать
-        product_ids = product_ids[:20]
+        # Берем только первые N, чтобы не перегружать
+        product_ids = product_ids[:self.products_per_category]
+        
+        # Товары, уже встреченные на прошлых страницах, пропускаем
+        if seen_ids is not None:
+            product_ids = [pid for pid in product_ids if pid not in seen_ids]
+            seen_ids.update(product_ids)
+        
+        print(f"🔍 Страница {page}: новых ID товаров {len(product_ids)}")
+        
+        # Свежие карточки берём из кеша, известные «неинтересные» пропускаем
+        cached, missing = self.card_cache.get_many(self.store_name, product_ids)
+        found = {pid: Product.from_dict(data) for pid, data in cached.items()}
+        if len(missing) < len(product_ids):
+            print(f"💾 Из кеша: {len(found)}, пропущено без скидки: {len(product_ids) - len(found) - len(missing)}")
+        
+        if self.concurrent:
+            print(f"  ⏳ Загружаем {len(missing)} товаров ({self.max_workers} потоков)")
+            for pid, info in zip(missing, self.fetch_products(missing)):
+                if info:
+                    found[pid] = info
+        else:
+            for i, pid in enumerate(missing):
+                print(f"  ⏳ Загружаем товар {i+1}/{len(missing)}", end='\r')
+                product_info = self.get_product_info(pid)
+                if product_info:
+                    found[pid] = product_info
+            print()
+        
+        # В кеш пишем только загруженные сейчас карточки: перезапись карточек из кеша
+        # продлевала бы им срок, и цены не обновлялись бы никогда
+        self.remember_cards(found[pid] for pid in missing if pid in found)
+        
+        return [found[pid] for pid in product_ids if pid in found], len(product_ids)
+    
+    def remember_cards(self, products: Iterable[Product]):
+        """
+        Сохраняет свежезагруженные карточки в кеш
+        Товары ниже порога скидки запоминаются как отрицательные
+        """
+        deals = []
+        negative_ids = []
+        for product_info in products:
+            if product_info.discount >= MIN_DISCOUNT:
+                deals.append(product_info)
+            else:
+                negative_ids.append(product_info.id)
+        self.card_cache.put_many(self.store_name, deals, negative_ids)
+    
+    def iter_category_pages(self, category: Dict[str, str]) -> Iterator[Tuple[List[Product], int]]:
+        """
+        Лениво обходит страницы категории
+        Выдаёт (товары страницы, сколько товаров просмотрено на странице);
+        следующая страница загружается, только когда её запросят
+        """
+        mode = category.get('mode', self.crawl_mode)
+        
+        if mode == 'catalog':
+            products = self.fetch_catalog_page(category, 1)
+            if products is not None:
+                page = 1
+                while products:
+                    print(f"🔍 Каталог, страница {page}: товаров {len(products)}")
+                    yield products, len(products)
+                    page += 1
+                    if page > self.max_pages:
+                        return
+                    products = self.fetch_catalog_page(category, page)
+                return
+            print("↩️ Каталог недоступен, переключаемся на HTML")
+        
+        seen_ids = set()
+        for page in range(1, self.max_pages + 1):
+            products, seen = self.fetch_html_products(category, page, seen_ids)
+            if not seen:
+                return
+            yield products, seen
+    
+    def parse_category(self, category: Dict[str, str], top: Optional[TopK] = None,
+                       on_product: Optional[Callable[[Product], None]] = None) -> List[Product]:
+        """
+        Парсит одну категорию постранично
+        Останавливается, когда доля товаров со скидкой падает ниже MIN_DEAL_YIELD,
+        набрано MAX_PRODUCTS_PER_STORE подходящих товаров
+        или топ магазина top уже не может измениться
+        on_product вызывается для каждого подходящего товара сразу после оценки
+        """
+        mode = category.get('mode', self.crawl_mode)
+        print(f"📁 Парсим категорию: {category['name']} ({mode})")
         
         category_products = []
-        for i, pid in enumerate(product_ids):
-            print(f"  ⏳ Загружаем товар {i+1}/{len(product_ids)}", end='\r')
+        seen = 0
+        pages = 0
+        deal_yield = None
+        
+        for products, page_seen in self.iter_category_pages(category):
+            pages += 1
+            seen += page_seen
+            passed_before = len(category_products)
             
-            product_info = self.get_product_info(pid)
-            if product_info:
-                product_info['category'] = category['name']
-                product_info['store'] = self.store_name
-                product_info['emoji'] = category.get('emoji', '🛍️')
-                
-                # Рассчитываем выгодность
-                self.calculate_value_score(product_info)
+            # Рассчитываем выгодность всей страницы разом
+            score_products(products)
+            
+            for product_info in products:
+                product_info.category = category['name']
+                product_info.store = self.store_name
+                product_info.emoji = category.get('emoji', '🛍️')
                 
                 # Берем только товары со скидкой >= 20%
-                if product_info.get('discount', 0) >= 20:
+                if product_info.discount >= MIN_DISCOUNT:
                     category_products.append(product_info)
             
-            time.sleep(0.5)  # Задержка между запросами
+            # В журнал идёт каждый подходящий товар, а не только вошедшие в топ:
+            # после падения топ восстанавливается из журнала целиком
+            if on_product:
+                for product_info in category_products[passed_before:]:
+                    on_product(product_info)
+            
+            if top is not None:
+                for product_info in category_products[passed_before:]:
+                    top.push(product_info)
+                if top.is_saturated(MAX_VALUE_SCORE):
+                    print(f"🛑 Топ-{top.k} заполнен товарами с оценкой {top.threshold}, дальше не идём")
+                    break
+            
+            # Категория дала больше, чем магазин может сохранить
+            if len(category_products) >= self.max_products:
+                print(f"🛑 Набрано {len(category_products)} товаров, дальше не идём")
+                break
+            
+            # Скользящая доля выгодных товаров: свежие страницы весят больше
+            page_yield = (len(category_products) - passed_before) / page_seen if page_seen else 0
+            deal_yield = page_yield if deal_yield is None else (deal_yield + page_yield) / 2
+            
+            # Доля выгодных товаров слишком мала: глубже смотреть нет смысла
+            if deal_yield < self.min_deal_yield:
+                print(f"🛑 Доля товаров со скидкой {deal_yield:.0%} ниже {self.min_deal_yield:.0%}, дальше не идём")
+                break
         
-        print(f"\n✅ В категории {category['name']} найдено {len(category_products)} товаров со скидкой")
-        return category_products
+        print(f"✅ В категории {category['name']} найдено {len(category_products)} товаров со скидкой "
+              f"(страниц: {pages}, просмотрено: {seen})")
+        return category_products[:self.max_products]
     
-    def parse_all(self) -> List[Dict[str, Any]]:
+    def parse_all(self, on_product: Optional[Callable[[Product], None]] = None) -> List[Product]:
         """
         Парсит все категории
+        on_product получает товары сразу после оценки (для потоковой записи)
         """
         print("=" * 60)
         print(f"🚀 ЗАПУСК ПАРСЕРА {self.store_name}")
         print("=" * 60)
         
         categories = self.get_categories()
-        all_products = []
         
-        for category in categories:
-            products = self.parse_category(category)
-            all_products.extend(products)
-            
-            # Сортируем по выгодности внутри категории
-            products.sort(key=lambda x: x.get('value_score', 0), reverse=True)
+        # Держим только MAX_PRODUCTS_PER_STORE лучших товаров
+        top = TopK(self.max_products)
+        
+        for i, category in enumerate(categories):
+            self.parse_category(category, top, on_product)
             
-            # Небольшая пауза между категориями
-            time.sleep(3)
+            if top.is_saturated(MAX_VALUE_SCORE):
+                print(f"🏁 Все {top.k} мест в топе заняты товарами с максимальной оценкой "
+                      f"{top.threshold}: оставшиеся {len(categories) - i - 1} категорий не изменят результат")
+                break
         
-        # Общая сортировка
-        all_products.sort(key=lambda x: x.get('value_score', 0), reverse=True)
+        all_products = top.sorted()
+        self.http_cache.flush()
         
+        cache_stats = self.card_cache.stats()
         print("=" * 60)
-        print(f"📊 ИТОГО: {len(all_products)} товаров со скидкой")
+        print(f"📊 ИТОГО: {len(all_products)} товаров со скидкой (подошло {top.pushed}, "
+              f"порог входа в топ: {top.threshold if top.threshold is not None else '—'})")
+        print(f"💾 Кеш карточек: попаданий {cache_stats['hits']}, отрицательных {cache_stats['negative_hits']}, "
+              f"промахов {cache_stats['misses']}, устаревших {cache_stats['expired']}")
         print("=" * 60)
         
         return all_products
@@ -287,25 +639,20 @@ def main():
     Основная функция запуска
     """
     parser = WildberriesParser()
-    products = parser.parse_all()
-    
-    # Создаем папку data если её нет
-    os.makedirs('data', exist_ok=True)
-    
-    # Сохраняем результаты
-    output_file = 'data/wildberries.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
     
-    print(f"💾 Сохранено в {output_file}")
+    # Товары пишутся в журнал по мере оценки, итоговый файл подменяется в конце
+    with ProductWriter(parser.output_file) as writer:
+        products = parser.parse_all(on_product=writer.write)
+        writer.commit(products)
+    print(f"💾 Сохранено в {parser.output_file}")
     
     # Выводим топ-5 товаров
     print("\n🏆 ТОП-5 САМЫХ ВЫГОДНЫХ ТОВАРОВ:")
     for i, p in enumerate(products[:5], 1):
-        print(f"{i}. {p.get('name', 'Без названия')}")
-        print(f"   💰 {p.get('price', 0):,}₽ (было {p.get('old_price', 0):,}₽) | 📉 -{p.get('discount', 0)}%".replace(',', ' '))
-        print(f"   ⭐ {p.get('rating', 0)} | 👥 {p.get('reviews', 0)} отзывов")
-        print(f"   🔥 Выгодность: {p.get('value_score', 0)}/100")
+        print(f"{i}. {p.name or 'Без названия'}")
+        print(f"   💰 {p.price:,}₽ (было {p.old_price:,}₽) | 📉 -{p.discount}%".replace(',', ' '))
+        print(f"   ⭐ {p.rating} | 👥 {p.reviews} отзывов")
+        print(f"   🔥 Выгодность: {p.value_score}/100")
         print()
 
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Кеш рейтинга и поиск бота
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('telegram')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='module')
+def bot_module(tmp_path_factory):
+    # При импорте бот открывает базы в data/ и лог в logs/ текущего каталога
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('bot'))
+    try:
+        yield importlib.import_module('bot.bot')
+    finally:
+        os.chdir(cwd)
+
+
+def test_search_empty_catalog(bot_module, tmp_path):
+    cache = bot_module.ProductCache(str(tmp_path))
+
+    found, filters = cache.search('наушники до 3000')
+
+    assert found == []
+    assert filters.max_price == 3000
+
+
+class FlakyDispatcher:
+    def __init__(self, failing_user):
+        self.failing_user = failing_user
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        from telegram.error import TimedOut
+        if chat_id == self.failing_user:
+            raise TimedOut()
+        self.sent.append(chat_id)
+
+
+def test_failed_price_drops_stay_pending(bot_module, tmp_path, monkeypatch):
+    import asyncio
+    from utils.price_watch import WatchStore
+
+    store = WatchStore(str(tmp_path / 'watches.db'))
+    for user_id in (1, 2, 3):
+        store.add(user_id, 'Wildberries', '100', 'https://www.wildberries.ru/catalog/100/detail.aspx')
+    store.match([{'id': '100', 'store': 'Wildberries', 'price': 1000}])
+    store.match([{'id': '100', 'store': 'Wildberries', 'price': 500}])
+
+    dispatcher = FlakyDispatcher(failing_user=2)
+    monkeypatch.setattr(bot_module, 'watch_store', store)
+    monkeypatch.setattr(bot_module, 'dispatcher', dispatcher)
+    monkeypatch.setattr(bot_module, 'is_premium', lambda user_id: True)
+
+    asyncio.run(bot_module.send_price_drops())
+
+    assert sorted(dispatcher.sent) == [1, 3]
+    assert [n['user_id'] for n in store.pending()] == ['2']
+    store.close()
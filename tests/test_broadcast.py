@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Рассылка не обрывается на неожиданной ошибке отправки
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('telegram')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.broadcast import BroadcastEngine
+from utils.user_store import UserStore
+
+ADMIN_CHAT = 999
+
+
+class FakeDispatcher:
+    def __init__(self, broken_user):
+        self.broken_user = broken_user
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id == self.broken_user:
+            raise RuntimeError('сбой сети')
+        if chat_id != ADMIN_CHAT:
+            self.sent.append(chat_id)
+        return SimpleNamespace(message_id=1)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        pass
+
+
+def test_unexpected_error_counts_as_failed(tmp_path):
+    db_path = str(tmp_path / 'users.db')
+    users = UserStore(db_path)
+    for user_id in range(1, 6):
+        users.touch(user_id)
+    engine = BroadcastEngine(users, FakeDispatcher(broken_user=3), db_path=db_path)
+
+    async def run():
+        broadcast_id = engine.create('новость', ADMIN_CHAT)
+        await engine.start(broadcast_id)
+        return engine.get(broadcast_id)
+
+    state = asyncio.run(run())
+
+    assert state['finished'] is not None
+    assert (state['sent'], state['failed']) == (4, 1)
+    engine.close()
+    users.close()
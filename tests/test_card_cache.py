@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Срок жизни кеша карточек при запусках парсера по расписанию
+
+Парсер запускается несколько раз подряд без сети (страница категории и
+карточки подставляются), между запусками записи кеша «стареют» на период
+cron (4 часа). Карточка старше CARD_CACHE_TTL_HOURS должна загружаться заново
+уже на следующем запуске, а не отдаваться из кеша бесконечно
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.wildberries import WildberriesParser
+from utils.card_cache import CardCache
+
+CRON_PERIOD_HOURS = 4  # 0 */4 * * *
+RUNS = 5
+COUNT = 20
+
+
+class OfflineParser(WildberriesParser):
+    """
+    Парсер без сети: HTML-режим, фиксированная страница и карточки
+    """
+
+    def __init__(self, cache: CardCache, count: int):
+        super().__init__(concurrent=True)
+        self.crawl_mode = 'html'
+        self.max_pages = 1
+        self.products_per_category = count
+        self.card_cache = cache
+        self.page_ids = [str(10000000 + i) for i in range(count)]
+        self.fetched = []
+
+    def fetch_category_ids(self, url, limit=None):
+        return self.page_ids[:limit]
+
+    def fetch_products(self, product_ids):
+        self.fetched.extend(product_ids)
+        return [
+            self.build_product({'id': pid, 'name': f'Товар {pid}', 'priceU': 100000,
+                                'salePriceU': 70000 if is_deal(pid) else 100000}, pid)
+            for pid in product_ids
+        ]
+
+
+def is_deal(product_id: str) -> bool:
+    """
+    Каждый второй товар со скидкой, остальные попадают в кеш как отрицательные
+    """
+    return int(product_id) % 2 == 1
+
+
+def age_cache(cache: CardCache, hours: float):
+    with cache.lock:
+        with cache.conn:
+            cache.conn.execute('UPDATE cards SET updated = updated - ?', (hours * 3600,))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Парсер создаёт свои кеши в data/ текущего каталога
+    monkeypatch.chdir(tmp_path)
+    cache = CardCache(str(tmp_path / 'cards.db'))
+    yield cache
+    cache.close()
+
+
+def test_expired_cards_are_refetched(cache):
+    ttl_hours = cache.ttl / 3600
+    deals = [pid for pid in OfflineParser(cache, COUNT).page_ids if is_deal(pid)]
+    # Когда каждая карточка со скидкой загружалась в последний раз (часы от первого запуска)
+    loaded_at = {}
+
+    for run in range(RUNS):
+        now = run * CRON_PERIOD_HOURS
+        parser = OfflineParser(cache, COUNT)
+        parser.parse_category({'name': 'test', 'url': 'https://www.wildberries.ru/catalog/test'})
+
+        # Отрицательные записи живут дольше и здесь не проверяются
+        expected = {pid for pid in deals if pid not in loaded_at or now - loaded_at[pid] >= ttl_hours}
+        fetched = {pid for pid in parser.fetched if is_deal(pid)}
+        assert fetched == expected, f'запуск {run + 1} ({now} ч)'
+        for pid in fetched:
+            loaded_at[pid] = now
+
+        age_cache(cache, CRON_PERIOD_HOURS)
+
+
+def test_negative_cards_are_skipped(cache):
+    OfflineParser(cache, COUNT).parse_category({'name': 'test', 'url': 'https://www.wildberries.ru/catalog/test'})
+
+    parser = OfflineParser(cache, COUNT)
+    parser.parse_category({'name': 'test', 'url': 'https://www.wildberries.ru/catalog/test'})
+
+    assert parser.fetched == []
+    assert cache.stats()['negative_hits'] == COUNT // 2
+
+
+def test_put_many(cache):
+    cache.put_many('Wildberries', [{'id': 1, 'name': 'Товар'}], ['2', ''])
+
+    found, missing = cache.get_many('Wildberries', ['1', '2', '3'])
+
+    assert found == {'1': {'id': 1, 'name': 'Товар'}}
+    assert missing == ['3']
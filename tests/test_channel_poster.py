@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Постинг в канал: один бот и одна очередь на весь запуск
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('telegram')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.channel_poster as channel_poster
+from utils.channel_poster import ChannelPoster
+
+
+class FakeBot:
+    created = 0
+
+    def __init__(self, token):
+        FakeBot.created += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeDispatcher:
+    created = 0
+
+    def __init__(self, bot):
+        FakeDispatcher.created += 1
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+
+def test_posts_share_one_bot_and_dispatcher(monkeypatch):
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(channel_poster, 'Bot', FakeBot)
+    monkeypatch.setattr(channel_poster, 'TelegramDispatcher', FakeDispatcher)
+    monkeypatch.setattr(channel_poster.asyncio, 'sleep', no_sleep)
+    FakeBot.created = FakeDispatcher.created = 0
+
+    poster = ChannelPoster()
+    poster.bot_token = 'token'
+
+    sent = poster.send_posts([('первый', 'https://img/1.jpg'), ('второй', None), ('третий', None)])
+
+    assert sent == 3
+    assert FakeBot.created == 1
+    assert FakeDispatcher.created == 1
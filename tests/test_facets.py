@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Разбор фильтров /search
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.facets import FacetIndex
+
+PRODUCTS = [
+    {'name': 'Куртка', 'store': 'Wildberries', 'category': 'clothes_men', 'price': 3000, 'discount': 40},
+    {'name': 'Платье', 'store': 'Wildberries', 'category': 'clothes_women', 'price': 2000, 'discount': 30},
+    {'name': 'Плед', 'store': 'Ozon', 'category': 'home', 'price': 1500, 'discount': 50},
+    {'name': 'Мяч', 'store': 'AliExpress', 'category': 'sport', 'price': 500, 'discount': 20},
+]
+
+
+@pytest.fixture
+def facets():
+    return FacetIndex.from_products(PRODUCTS)
+
+
+@pytest.mark.parametrize('query', ['cat:одежда', 'одежда', 'категория:одежда'])
+def test_alias_for_several_categories(facets, query):
+    text, filters = facets.parse(query)
+
+    assert text == ''
+    assert filters.categories == ['clothes_men', 'clothes_women']
+    assert facets.mask(filters).tolist() == [True, True, False, False]
+
+
+def test_home_alias(facets):
+    text, filters = facets.parse('плед категория:дом')
+
+    assert text == 'плед'
+    assert filters.categories == ['home']
+
+
+@pytest.mark.parametrize('query', ['скидка от 40% wb', 'от 40% wb', '-40% wb', '40% wb'])
+def test_discount_phrases(facets, query):
+    text, filters = facets.parse(query)
+
+    assert text == ''
+    assert filters.min_discount == 40
+    assert filters.stores == ['Wildberries']
+    assert facets.mask(filters).tolist() == [True, False, False, False]
+
+
+def test_unknown_category_is_searched_by_name(facets):
+    text, filters = facets.parse('cat:мебель')
+
+    assert text == 'мебель'
+    assert not filters
+
+
+@pytest.mark.parametrize('query, max_price, text', [
+    ('до 3000 15', 3000, '15'),
+    ('до 3 000', 3000, ''),
+    ('до 3 000₽', 3000, ''),
+    ('до 1 500 15', 1500, '15'),
+])
+def test_price_thousands_groups(facets, query, max_price, text):
+    rest, filters = facets.parse(query)
+
+    assert filters.max_price == max_price
+    assert rest == text
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+Актуальность merged.jsonl и снимка определяется содержимым выгрузок, а не mtime
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.merge_products import is_merged_fresh, load_ranked_products, load_snapshot, merge_products
+from utils.storage import list_store_files, write_products_atomic
+
+
+def write_store(data_dir, name, products):
+    write_products_atomic(products, os.path.join(data_dir, f'{name}.jsonl'))
+
+
+def make_data(tmp_path):
+    data_dir = str(tmp_path)
+    write_store(data_dir, 'ozon', [{'id': '1', 'store': 'Ozon', 'value_score': 80}])
+    write_store(data_dir, 'wildberries', [{'id': '2', 'store': 'Wildberries', 'value_score': 90}])
+    merge_products(data_dir)
+    return data_dir
+
+
+def touch_later(path):
+    later = time.time() + 60
+    os.utime(path, (later, later))
+
+
+def test_checkout_order_keeps_results_fresh(tmp_path):
+    data_dir = make_data(tmp_path)
+
+    # git при checkout может записать выгрузки позже merged.*
+    for path in list_store_files(data_dir):
+        touch_later(path)
+
+    assert is_merged_fresh(data_dir)
+    snapshot = load_snapshot(data_dir)
+    assert snapshot is not None
+    assert [p['id'] for p in snapshot] == ['2', '1']
+    snapshot.close()
+
+
+def test_changed_store_file_is_detected(tmp_path):
+    data_dir = make_data(tmp_path)
+
+    write_store(data_dir, 'ozon', [{'id': '3', 'store': 'Ozon', 'value_score': 95}])
+
+    assert not is_merged_fresh(data_dir)
+    assert load_snapshot(data_dir) is None
+    assert [p.id for p in load_ranked_products(data_dir)] == ['3', '2']
+
+
+def test_sources_file_is_not_a_store(tmp_path):
+    data_dir = make_data(tmp_path)
+
+    names = sorted(os.path.basename(path) for path in list_store_files(data_dir))
+
+    assert names == ['ozon.jsonl', 'wildberries.jsonl']
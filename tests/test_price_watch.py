@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Догрузка отслеживаемых товаров Wildberries, которых нет в выгрузке
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.wildberries import WildberriesParser
+from utils.price_watch import WatchStore, check_prices
+from utils.storage import write_products_atomic
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    # Парсер не должен создавать файлы в data/ текущего каталога
+    monkeypatch.chdir(tmp_path)
+    data_dir = str(tmp_path / 'run')
+    write_products_atomic([{'id': '1', 'store': 'Wildberries', 'price': 900}],
+                          os.path.join(data_dir, 'wildberries.jsonl'))
+
+    store = WatchStore(str(tmp_path / 'watches.db'))
+    for pid in ('1', '2', '3', '4'):
+        store.add(42, 'Wildberries', pid, f'https://www.wildberries.ru/catalog/{pid}/detail.aspx')
+
+    requested = []
+
+    def fetch_products(self, product_ids):
+        requested.append(list(product_ids))
+        return [None for _ in product_ids]
+
+    monkeypatch.setattr(WildberriesParser, 'fetch_products', fetch_products)
+    yield data_dir, store, requested
+    store.close()
+
+
+def test_missing_cards_are_not_fetched_by_default(setup):
+    data_dir, store, requested = setup
+
+    stats = check_prices(data_dir, store)
+
+    assert stats['watched'] == 1
+    assert requested == []
+
+
+def test_fetch_is_capped_and_rotates(setup, tmp_path):
+    data_dir, store, requested = setup
+
+    for _ in range(3):
+        check_prices(data_dir, store, fetch_missing=2)
+
+    assert [len(ids) for ids in requested] == [2, 2, 2]
+    # За два прохода проверены все три товара вне выгрузки
+    assert set(requested[0] + requested[1]) == {'2', '3', '4'}
+    assert not os.path.exists(tmp_path / 'data' / 'cards.db')
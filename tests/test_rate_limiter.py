@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ограничитель запросов: пауза по Retry-After и слоты одновременных запросов
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limiter import MAX_BACKOFF, HostBucket, RateLimiter
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_long_retry_after_gives_up_without_blocking():
+    limiter = RateLimiter()
+    session = FakeSession([FakeResponse(429, {'Retry-After': '3600'}), FakeResponse(200)])
+
+    response = limiter.get('https://example.com/page', session=session, retries=3)
+
+    assert response.status_code == 429
+    assert session.calls == 1
+    bucket = limiter.bucket('https://example.com/page')
+    assert bucket.blocked_until <= time.monotonic()
+
+
+def test_on_throttle_clamps_pause():
+    bucket = HostBucket()
+
+    assert bucket.on_throttle(3600) == MAX_BACKOFF
+    assert bucket.blocked_until <= time.monotonic() + MAX_BACKOFF
+
+
+class StreamedResponse(FakeResponse):
+    def __init__(self, status_code, headers=None):
+        super().__init__(status_code, headers)
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+def test_streamed_response_holds_slot_until_closed():
+    limiter = RateLimiter(max_in_flight=1)
+    session = FakeSession([StreamedResponse(200)])
+
+    response = limiter.get('https://example.com/page', session=session, stream=True)
+
+    assert not limiter.in_flight.acquire(blocking=False)
+    response.close()
+    response.close()
+    assert limiter.in_flight.acquire(blocking=False)
+    limiter.in_flight.release()
+
+
+def test_throttled_streamed_response_is_closed_before_retry():
+    limiter = RateLimiter(max_in_flight=1)
+    throttled = StreamedResponse(503, {'Retry-After': '0'})
+    session = FakeSession([throttled, StreamedResponse(200)])
+
+    response = limiter.get('https://example.com/page', session=session, stream=True)
+
+    assert throttled.closed == 1
+    assert response.status_code == 200
+    response.close()
+    assert limiter.in_flight.acquire(blocking=False)
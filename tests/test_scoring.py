@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Пакетный score_products должен совпадать с calculate_value_score
+"""
+
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.scoring import calculate_value_score, score_products
+
+PRODUCTS = [
+    {'price': 1000, 'old_price': 12000, 'discount': 92, 'rating': 4.9, 'reviews': 1500},
+    {'price': '1000', 'old_price': '2000', 'discount': '50', 'rating': '4.6', 'reviews': '120'},
+    {'price': '999.5', 'old_price': '7000', 'discount': 40.5, 'rating': 4.0, 'reviews': 99},
+    {'price': 'x', 'old_price': None, 'discount': 'скидка', 'rating': 'x', 'reviews': ''},
+    {'price': None, 'old_price': '6000', 'discount': None, 'rating': None, 'reviews': None},
+    {'price': [1], 'old_price': {}, 'discount': 'nan', 'rating': 'inf', 'reviews': '1e3'},
+    {},
+]
+
+
+@pytest.mark.parametrize('product', PRODUCTS)
+def test_batch_matches_single(product):
+    single = copy.deepcopy(product)
+    batch = copy.deepcopy(product)
+
+    expected = calculate_value_score(single)
+    scores = score_products([batch])
+
+    assert scores.tolist() == [expected]
+    assert batch['value_score'] == single['value_score']
+    assert batch['value_reasons'] == single['value_reasons']
+
+
+def test_string_prices():
+    product = {'price': '1000', 'old_price': '2000', 'discount': '50', 'rating': '4.6', 'reviews': '120'}
+    score_products([product])
+    assert product['value_score'] == 30 + 15 + 10 + 10
+    assert 'экономия 1 000₽' in product['value_reasons']
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Склейка сообщений в очереди Telegram
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('telegram')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.telegram_dispatcher import PRIORITY_HIGH, PRIORITY_LOW, TelegramDispatcher
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+        return len(self.sent)
+
+
+def send_together(*messages):
+    bot = FakeBot()
+
+    async def run():
+        async with TelegramDispatcher(bot) as dispatcher:
+            await asyncio.gather(*(
+                dispatcher.send_message(1, text, priority=priority) for text, priority in messages
+            ))
+            return dispatcher.stats()
+
+    return bot, asyncio.run(run())
+
+
+def test_same_priority_texts_are_merged():
+    bot, stats = send_together(('первый', PRIORITY_LOW), ('второй', PRIORITY_LOW))
+
+    assert bot.sent == ['первый\n\nвторой']
+    assert stats['coalesced'] == 1
+
+
+def test_command_reply_is_not_merged_into_broadcast():
+    bot, stats = send_together(('рассылка', PRIORITY_LOW), ('ответ', PRIORITY_HIGH))
+
+    assert bot.sent == ['рассылка', 'ответ']
+    assert stats['coalesced'] == 0
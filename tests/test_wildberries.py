@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Пачки карточек Wildberries: когда делить пачку, а когда пропускать
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers.wildberries as wildberries
+from parsers.wildberries import WildberriesParser
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError('not json')
+        return self.payload
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    # Парсер создаёт свои кеши в data/ текущего каталога
+    monkeypatch.chdir(tmp_path)
+    return WildberriesParser()
+
+
+def fake_api(monkeypatch, respond):
+    calls = []
+
+    def get(url, **kwargs):
+        ids = url.split('nm=', 1)[1].split(';')
+        calls.append(ids)
+        return respond(ids)
+
+    monkeypatch.setattr(wildberries.rate_limiter, 'get', get)
+    return calls
+
+
+def test_throttled_batch_is_not_split(parser, monkeypatch):
+    calls = fake_api(monkeypatch, lambda ids: FakeResponse(429))
+
+    assert parser.get_products_batch([str(i) for i in range(100)]) == {}
+    assert len(calls) == 1
+
+
+def test_bad_request_is_split(parser, monkeypatch):
+    bad = '3'
+
+    def respond(ids):
+        if bad in ids:
+            return FakeResponse(400)
+        products = [{'id': int(pid), 'priceU': 1000, 'salePriceU': 500} for pid in ids]
+        return FakeResponse(200, {'data': {'products': products}})
+
+    fake_api(monkeypatch, respond)
+
+    found = parser.get_products_batch([str(i) for i in range(8)])
+
+    assert sorted(found) == ['0', '1', '2', '4', '5', '6', '7']
+
+
+def test_unparsable_response_is_split(parser, monkeypatch):
+    calls = fake_api(monkeypatch, lambda ids: FakeResponse(200))
+
+    assert parser.get_products_batch(['1', '2']) == {}
+    assert calls == [['1', '2'], ['1'], ['2']]
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Массовая рассылка по всем пользователям бота
+Получатели читаются из хранилища пользователей страницами, сообщения
+уходят через общую очередь Telegram с низким приоритетом (ответы на
+команды не ждут рассылку). Прогресс сохраняется в SQLite: после падения
+рассылка продолжается с последнего сохранённого пользователя.
+Заблокировавшие бота отмечаются и в следующие рассылки не попадают
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import BROADCAST_WINDOW
+except ImportError:
+    BROADCAST_WINDOW = int(os.getenv('BROADCAST_WINDOW', '500'))
+
+from utils.telegram_dispatcher import PRIORITY_LOW, PRIORITY_NORMAL, TelegramDispatcher
+from utils.user_store import UserStore
+
+# Сохранять прогресс после стольких обработанных получателей
+CHECKPOINT_EVERY = 100
+# Как часто обновлять сообщение с прогрессом у админа, секунды
+PROGRESS_INTERVAL = 5
+
+# Ответы Bot API, после которых писать пользователю бесполезно
+UNREACHABLE_ERRORS = ('chat not found', 'user not found', 'peer_id_invalid')
+
+
+class BroadcastEngine:
+    """
+    Рассылки с контрольными точками
+    Точка — ID пользователя, до которого включительно все отправки завершены:
+    отправки идут параллельно, поэтому точка двигается только по непрерывному
+    префиксу завершённых. После падения повторно уйдут только отправки
+    из окна и после последней сохранённой точки (не больше window + CHECKPOINT_EVERY)
+    """
+
+    def __init__(self, user_store: UserStore, dispatcher: TelegramDispatcher,
+                 db_path: str = 'data/users.db', window: int = BROADCAST_WINDOW):
+        self.user_store = user_store
+        self.dispatcher = dispatcher
+        self.window = max(1, window)
+        self.lock = threading.Lock()
+        self.tasks: Dict[int, asyncio.Task] = {}  # рассылки, которые идут в этом процессе
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                admin_chat_id INTEGER NOT NULL,
+                progress_message_id INTEGER,
+                cursor TEXT NOT NULL DEFAULT '',
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                blocked INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                created TEXT NOT NULL,
+                finished TEXT
+            )
+        """)
+        self.conn.commit()
+
+    # ========== ХРАНЕНИЕ ==========
+
+    def create(self, text: str, admin_chat_id: int) -> int:
+        """
+        Заводит новую рассылку и возвращает её номер
+        """
+        total = self.user_store.count_recipients()
+        with self.lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    'INSERT INTO broadcasts (text, admin_chat_id, total, created) VALUES (?, ?, ?, ?)',
+                    (text, admin_chat_id, total, datetime.now().isoformat())
+                )
+        return cursor.lastrowid
+
+    def get(self, broadcast_id: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.conn.execute('SELECT * FROM broadcasts WHERE id = ?', (broadcast_id,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def unfinished(self) -> List[int]:
+        """
+        Номера незавершённых рассылок (например, прерванных падением бота)
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT id FROM broadcasts WHERE finished IS NULL ORDER BY id').fetchall()
+        return [row[0] for row in rows]
+
+    def _save(self, state: Dict[str, Any], finished: bool = False):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    'UPDATE broadcasts SET cursor = ?, sent = ?, blocked = ?, failed = ?, '
+                    'progress_message_id = ?, finished = ? WHERE id = ?',
+                    (state['cursor'], state['sent'], state['blocked'], state['failed'],
+                     state['progress_message_id'], datetime.now().isoformat() if finished else None,
+                     state['id'])
+                )
+
+    # ========== ОТПРАВКА ==========
+
+    async def _send_one(self, text: str, user_id: str) -> str:
+        """
+        Отправляет рассылку одному пользователю
+        Возвращает итог: sent, blocked или failed
+        """
+        try:
+            await self.dispatcher.send_message(
+                int(user_id), text, priority=PRIORITY_LOW, coalesce=False, parse_mode='HTML'
+            )
+            return 'sent'
+        except Forbidden:
+            # Бот заблокирован или аккаунт удалён
+            self.user_store.mark_blocked(user_id)
+            return 'blocked'
+        except BadRequest as e:
+            if any(error in str(e).lower() for error in UNREACHABLE_ERRORS):
+                self.user_store.mark_blocked(user_id)
+                return 'blocked'
+            return 'failed'
+        except (TelegramError, ValueError):
+            return 'failed'
+        except Exception as e:
+            # Любая другая ошибка не должна обрывать рассылку посреди окна
+            print(f"❌ Рассылка пользователю {user_id}: {type(e).__name__}: {e}")
+            return 'failed'
+
+    def start(self, broadcast_id: int) -> Optional[asyncio.Task]:
+        """
+        Запускает (или продолжает) рассылку в фоне
+        """
+        task = self.tasks.get(broadcast_id)
+        if task is not None and not task.done():
+            return task
+        state = self.get(broadcast_id)
+        if state is None or state['finished']:
+            return None
+
+        task = asyncio.get_running_loop().create_task(self._run(state))
+        self.tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(broadcast_id, None))
+        return task
+
+    async def stop(self):
+        """
+        Прерывает идущие рассылки, сохранив точку продолжения
+        """
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, state: Dict[str, Any]):
+        started = time.monotonic()
+        done_at_start = state['sent'] + state['blocked'] + state['failed']
+
+        if state['progress_message_id'] is None:
+            message = await self.dispatcher.send_message(
+                state['admin_chat_id'], self._progress_text(state, 0.0), parse_mode='HTML', coalesce=False
+            )
+            state['progress_message_id'] = message.message_id
+            self._save(state)
+
+        # (ID пользователя, задача отправки) в порядке обхода
+        in_flight = deque()
+        slots = asyncio.Semaphore(self.window)
+        unsaved = 0
+        last_report = time.monotonic()
+
+        def advance() -> int:
+            """
+            Снимает завершённые отправки с начала окна и двигает точку
+            """
+            count = 0
+            while in_flight and in_flight[0][1].done() and not in_flight[0][1].cancelled():
+                user_id, task = in_flight.popleft()
+                state[task.result()] += 1
+                state['cursor'] = user_id
+                count += 1
+            return count
+
+        async def send(user_id: str) -> str:
+            try:
+                return await self._send_one(state['text'], user_id)
+            finally:
+                slots.release()
+
+        try:
+            for user_id in self.user_store.iter_recipients(after=state['cursor']):
+                await slots.acquire()
+                in_flight.append((user_id, asyncio.get_running_loop().create_task(send(user_id))))
+
+                unsaved += advance()
+                if unsaved >= CHECKPOINT_EVERY:
+                    self._save(state)
+                    unsaved = 0
+
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._report(state, done_at_start, started)
+
+            if in_flight:
+                await asyncio.wait([task for _, task in in_flight])
+                advance()
+        except asyncio.CancelledError:
+            # Остановка бота: неотправленное снимаем с очереди, точку сохраняем
+            for _, task in in_flight:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in in_flight), return_exceptions=True)
+            advance()
+            self._save(state)
+            raise
+
+        self._save(state, finished=True)
+        await self._report(state, done_at_start, started, finished=True)
+
+    # ========== ПРОГРЕСС ==========
+
+    async def _report(self, state: Dict[str, Any], done_at_start: int, started: float, finished: bool = False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = (state['sent'] + state['blocked'] + state['failed'] - done_at_start) / elapsed
+        try:
+            # Прогресс важнее рассылки, иначе он встанет в очередь за ней
+            await self.dispatcher.edit_message_text(
+                state['admin_chat_id'], state['progress_message_id'],
+                self._progress_text(state, rate, finished), priority=PRIORITY_NORMAL, parse_mode='HTML'
+            )
+        except TelegramError:
+            # «message is not modified» и т.п. не должны останавливать рассылку
+            pass
+
+    @staticmethod
+    def _progress_text(state: Dict[str, Any], rate: float, finished: bool = False) -> str:
+        done = state['sent'] + state['blocked'] + state['failed']
+        total = max(state['total'], done)
+        percent = done * 100 / total if total else 100
+
+        if finished:
+            header = f"✅ <b>Рассылка #{state['id']} завершена</b>"
+            eta = ""
+        else:
+            header = f"📣 <b>Рассылка #{state['id']}</b>"
+            left = (total - done) / rate if rate > 0 else 0
+            eta = f"\n⏳ Осталось: ~{int(left // 60)} мин {int(left % 60)} с" if rate > 0 else ""
+
+        return f"""{header}
+
+📨 Обработано: {done} из {total} ({percent:.1f}%)
+✅ Доставлено: {state['sent']}
+🚫 Заблокировали бота: {state['blocked']}
+❌ Ошибок: {state['failed']}
+⚡️ Скорость: {rate:.1f} сообщ/сек{eta}"""
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Постоянный кеш карточек товаров на SQLite
+Свежие карточки отдаются без запроса, товары ниже порога скидки
+кешируются как «отрицательные» на отдельный срок
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Tuple
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.product import as_dict
+
+try:
+    from config import CARD_CACHE_TTL_HOURS, CARD_NEGATIVE_TTL_HOURS
+except ImportError:
+    CARD_CACHE_TTL_HOURS = float(os.getenv('CARD_CACHE_TTL_HOURS', '6'))
+    CARD_NEGATIVE_TTL_HOURS = float(os.getenv('CARD_NEGATIVE_TTL_HOURS', '24'))
+
+
+class CardCache:
+    """
+    Кеш карточек с ключом (магазин, ID товара)
+    """
+
+    def __init__(self, db_path: str = 'data/cards.db',
+                 ttl_hours: float = CARD_CACHE_TTL_HOURS,
+                 negative_ttl_hours: float = CARD_NEGATIVE_TTL_HOURS):
+        self.db_path = db_path
+        self.ttl = ttl_hours * 3600
+        self.negative_ttl = negative_ttl_hours * 3600
+        self.lock = threading.Lock()
+
+        # Счётчики для подбора TTL
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cards (
+                store TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                data TEXT,
+                negative INTEGER NOT NULL DEFAULT 0,
+                updated REAL NOT NULL,
+                PRIMARY KEY (store, product_id)
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, store: str, product_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Ищет карточки в кеше
+        Возвращает (свежие карточки {ID: товар}, ID которые нужно загрузить)
+        Отрицательные записи не попадают ни туда, ни туда
+        """
+        found = {}
+        missing = []
+        now = time.time()
+
+        with self.lock:
+            rows = {}
+            # SQLite ограничивает число параметров, поэтому идём пачками
+            for i in range(0, len(product_ids), 500):
+                chunk = product_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = self.conn.execute(
+                    f'SELECT product_id, data, negative, updated FROM cards '
+                    f'WHERE store = ? AND product_id IN ({placeholders})',
+                    [store, *chunk]
+                )
+                for pid, data, negative, updated in cursor:
+                    rows[pid] = (data, negative, updated)
+
+            for pid in product_ids:
+                row = rows.get(pid)
+                if row is None:
+                    self.misses += 1
+                    missing.append(pid)
+                    continue
+
+                data, negative, updated = row
+                age = now - updated
+                if negative and age < self.negative_ttl:
+                    self.negative_hits += 1
+                elif not negative and age < self.ttl:
+                    self.hits += 1
+                    found[pid] = json.loads(data)
+                else:
+                    self.expired += 1
+                    missing.append(pid)
+
+        return found, missing
+
+    def put(self, store: str, product: Dict[str, Any]):
+        """
+        Сохраняет карточку товара, прошедшего фильтр
+        """
+        self.put_many(store, [product], [])
+
+    def put_negative(self, store: str, product_id: str):
+        """
+        Запоминает товар ниже порога скидки
+        """
+        self.put_many(store, [], [product_id])
+
+    def put_many(self, store: str, products: Iterable[Dict[str, Any]], negative_ids: Iterable[str]):
+        """
+        Сохраняет карточки и отрицательные записи одной транзакцией
+        """
+        now = time.time()
+        rows = [
+            (store, str(product.get('id', '')), json.dumps(as_dict(product), ensure_ascii=False), 0, now)
+            for product in products
+        ]
+        rows.extend((store, str(product_id), None, 1, now) for product_id in negative_ids)
+        rows = [row for row in rows if row[1]]
+        if not rows:
+            return
+
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO cards (store, product_id, data, negative, updated) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики попаданий и промахов
+        """
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'expired': self.expired,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
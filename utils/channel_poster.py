@@ -6,13 +6,14 @@
 Берёт лучшие товары из всех парсеров и публикует их
 """
 
-import requests
-import json
+import asyncio
 import os
 import sys
-import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Optional, Tuple
+
+from telegram import Bot
+from telegram.error import TelegramError
 
 # Добавляем путь к проекту для импорта config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -25,6 +26,11 @@ except ImportError:
     CHANNEL_ID = os.getenv('CHANNEL_ID', '@PriceHunterSK')
     print("⚠️ config.py не найден, использую переменные окружения")
 
+from utils.merge_products import load_ranked_products
+from utils.product import Product
+from utils.scoring import rank_products
+from utils.telegram_dispatcher import PRIORITY_LOW, TelegramDispatcher
+
 class ChannelPoster:
     """
     Класс для постинга в Telegram канал
@@ -33,54 +39,27 @@ class ChannelPoster:
     def __init__(self):
         self.bot_token = BOT_TOKEN
         self.channel_id = CHANNEL_ID
-        self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
         self.data_dir = 'data'
         
-    def load_all_products(self) -> List[Dict[str, Any]]:
+    def load_all_products(self) -> List[Product]:
         """
-        Загружает все товары из всех JSON файлов в папке data
+        Загружает все товары из папки data
+        Берёт объединённый рейтинг data/merged.jsonl, если он актуален
         """
-        all_products = []
-        
         if not os.path.exists(self.data_dir):
             print(f"❌ Папка {self.data_dir} не найдена")
             return []
         
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.json') and filename != 'users.json':
-                filepath = os.path.join(self.data_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        products = json.load(f)
-                        if isinstance(products, list):
-                            all_products.extend(products)
-                            print(f"📦 Загружено {len(products)} товаров из {filename}")
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки {filename}: {e}")
+        try:
+            all_products = load_ranked_products(self.data_dir)
+        except Exception as e:
+            print(f"❌ Ошибка загрузки товаров: {e}")
+            return []
         
+        print(f"📦 Загружено {len(all_products)} товаров")
         return all_products
     
-    def calculate_final_score(self, product: Dict[str, Any]) -> int:
-        """
-        Рассчитывает итоговую выгодность товара для сортировки
-        """
-        score = product.get('value_score', 0)
-        
-        # Дополнительные бонусы
-        discount = product.get('discount', 0)
-        if discount > 50:
-            score += 20
-        elif discount > 40:
-            score += 10
-        elif discount > 30:
-            score += 5
-        
-        # Бонус за свежесть (чем новее товар, тем лучше)
-        # В будущем можно добавить
-        
-        return score
-    
-    def get_best_products(self, count: int = 2) -> List[Dict[str, Any]]:
+    def get_best_products(self, count: int = 2) -> List[Product]:
         """
         Выбирает лучшие товары для публикации
         """
@@ -90,15 +69,8 @@ class ChannelPoster:
             print("⚠️ Нет товаров для публикации")
             return []
         
-        # Добавляем финальный счёт
-        for p in products:
-            p['final_score'] = self.calculate_final_score(p)
-        
-        # Сортируем по убыванию выгодности
-        products.sort(key=lambda x: x.get('final_score', 0), reverse=True)
-        
-        # Берём лучшие
-        best = products[:count]
+        # Финальный счёт и сортировка по убыванию выгодности одним проходом
+        best = rank_products(products, limit=count)
         print(f"🏆 Выбрано {len(best)} лучших товаров")
         
         return best
@@ -111,21 +83,21 @@ class ChannelPoster:
             return "0"
         return f"{price:,}".replace(',', ' ')
     
-    def format_post(self, product: Dict[str, Any]) -> str:
+    def format_post(self, product: Product) -> str:
         """
         Форматирует пост для Telegram канала
         """
         # Получаем данные
-        name = product.get('name', 'Товар без названия')
-        price = product.get('price', product.get('sale_price', 0))
-        old_price = product.get('old_price', product.get('regular_price', 0))
-        discount = product.get('discount', 0)
-        rating = product.get('rating', 0)
-        reviews = product.get('reviews', 0)
-        store = product.get('store', 'Магазин')
-        url = product.get('url', '#')
-        emoji = product.get('emoji', '🛍️')
-        reasons = product.get('value_reasons', [])
+        name = product.name or 'Товар без названия'
+        price = product.price
+        old_price = product.old_price
+        discount = product.discount
+        rating = product.rating
+        reviews = product.reviews
+        store = product.store or 'Магазин'
+        url = product.url or '#'
+        emoji = product.emoji
+        reasons = product.reasons
         
         # Форматируем цены
         price_str = self.format_price(price)
@@ -175,46 +147,74 @@ class ChannelPoster:
     
     def send_to_channel(self, text: str, image_url: Optional[str] = None) -> bool:
         """
-        Отправляет сообщение в Telegram канал
+        Отправляет одно сообщение в Telegram канал
+        """
+        return self.send_posts([(text, image_url)]) > 0
+    
+    def send_posts(self, posts: List[Tuple[str, Optional[str]]]) -> int:
+        """
+        Отправляет посты (текст, картинка) в канал через одного бота и одну очередь
+        Возвращает количество отправленных
         """
         if not self.bot_token:
             print("❌ Нет BOT_TOKEN")
-            return False
+            return 0
         
+        return asyncio.run(self._send_all(posts))
+    
+    async def _send_all(self, posts: List[Tuple[str, Optional[str]]]) -> int:
+        """
+        Бот и диспетчер создаются один раз на запуск и переиспользуются для всех постов
+        """
+        success_count = 0
+        try:
+            async with Bot(self.bot_token) as bot:
+                async with TelegramDispatcher(bot) as dispatcher:
+                    for i, (text, image_url) in enumerate(posts, 1):
+                        if await self._send(dispatcher, text, image_url):
+                            success_count += 1
+                        
+                        # Пауза между постами — ритм ленты канала, лимиты Bot API соблюдает диспетчер
+                        if i < len(posts):
+                            print("⏳ Ждём 60 секунд перед следующим постом...")
+                            await asyncio.sleep(60)
+        except TelegramError as e:
+            print(f"❌ Ошибка подключения к боту: {e}")
+        except Exception as e:
+            print(f"❌ Ошибка при подключении к боту: {e}")
+        
+        return success_count
+    
+    async def _send(self, dispatcher: TelegramDispatcher, text: str, image_url: Optional[str]) -> bool:
+        """
+        Отправка через общую очередь: лимит канала и повтор после 429 берёт на себя диспетчер
+        """
         try:
             if image_url:
                 # Отправляем с фото
-                response = requests.post(
-                    f"{self.api_url}/sendPhoto",
-                    data={
-                        'chat_id': self.channel_id,
-                        'photo': image_url,
-                        'caption': text,
-                        'parse_mode': 'HTML'
-                    },
-                    timeout=30
+                await dispatcher.send_photo(
+                    self.channel_id,
+                    image_url,
+                    priority=PRIORITY_LOW,
+                    caption=text,
+                    parse_mode='HTML'
                 )
             else:
                 # Отправляем без фото
-                response = requests.post(
-                    f"{self.api_url}/sendMessage",
-                    data={
-                        'chat_id': self.channel_id,
-                        'text': text,
-                        'parse_mode': 'HTML',
-                        'disable_web_page_preview': False
-                    },
-                    timeout=30
+                await dispatcher.send_message(
+                    self.channel_id,
+                    text,
+                    priority=PRIORITY_LOW,
+                    parse_mode='HTML',
+                    disable_web_page_preview=False
                 )
             
-            if response.status_code == 200:
-                print(f"✅ Пост успешно отправлен в {datetime.now()}")
-                return True
-            else:
-                print(f"❌ Ошибка отправки: {response.status_code}")
-                print(response.text)
-                return False
+            print(f"✅ Пост успешно отправлен в {datetime.now()}")
+            return True
                 
+        except TelegramError as e:
+            print(f"❌ Ошибка отправки: {e}")
+            return False
         except Exception as e:
             print(f"❌ Ошибка при отправке: {e}")
             return False
@@ -233,20 +233,12 @@ class ChannelPoster:
             print("⚠️ Нет товаров для публикации")
             return False
         
-        success_count = 0
+        posts = []
         for i, product in enumerate(products, 1):
-            print(f"\n📝 Пост {i}/{len(products)}: {product.get('name', 'Без названия')[:50]}...")
-            
-            text = self.format_post(product)
-            image_url = product.get('image', product.get('image_url'))
-            
-            if self.send_to_channel(text, image_url):
-                success_count += 1
-            
-            # Пауза между постами
-            if i < len(products):
-                print("⏳ Ждём 60 секунд перед следующим постом...")
-                time.sleep(60)
+            print(f"📝 Пост {i}/{len(products)}: {(product.name or 'Без названия')[:50]}...")
+            posts.append((self.format_post(product), product.image))
+        
+        success_count = self.send_posts(posts)
         
         print("\n" + "=" * 60)
         print(f"✅ Постинг завершён. Отправлено: {success_count}/{len(products)}")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Фильтры для /search: цена, скидка, магазин, категория
+Пример запроса: «наушники до 3000 ozon -30%», «кроссовки обувь», «watch cat:sport»
+
+Индексы строятся один раз на снимок рейтинга: для магазинов и категорий —
+битовые маски товаров, для цены и скидки — отсортированные массивы,
+по которым диапазон находится бинарным поиском. Фильтры объединяются
+пересечением масок, словари товаров при этом не перебираются
+"""
+
+import re
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.search_index import tokenize
+
+# Другие названия магазинов в запросах
+STORE_ALIASES = {
+    'wb': 'wildberries',
+    'вб': 'wildberries',
+    'вайлдберриз': 'wildberries',
+    'озон': 'ozon',
+    'али': 'aliexpress',
+    'алиэкспресс': 'aliexpress',
+    'ali': 'aliexpress',
+}
+
+# Русские названия категорий (одно название может означать несколько категорий).
+# Английские slug («sport», «home») часто встречаются в названиях товаров,
+# поэтому без префикса cat: фильтром не считаются
+CATEGORY_ALIASES: Dict[str, Union[str, List[str]]] = {
+    'электроника': 'electronics',
+    'телефоны': 'phones',
+    'смартфоны': 'phones',
+    'ноутбуки': 'notebooks',
+    'аудио': 'audio',
+    'одежда': ['clothes_men', 'clothes_women'],
+    'обувь': 'shoes',
+    'дом': 'home',
+    'кухня': 'kitchen',
+    'спорт': 'sport',
+    'красота': 'beauty',
+    'детям': 'kids',
+    'автотовары': 'auto',
+    'сад': 'garden',
+    'книги': 'books',
+}
+
+# Явный фильтр категории: «cat:sport», «категория:обувь»
+CATEGORY_RE = re.compile(r'(?<!\w)(?:cat|категория):\s*([\w-]+)', re.IGNORECASE)
+# «до 3000», «от 500₽», «до 3 000»: пробел внутри числа — только разделитель тысяч,
+# иначе «до 3000 15» склеилось бы в 300015
+PRICE_RE = re.compile(r'(?<!\w)(до|от)\s*(\d{1,3}(?:[  ]\d{3})+|\d+)\s*(?:₽|р\.?|руб\.?)?(?=\s|$)', re.IGNORECASE)
+# «-30%», «30%», «скидка от 40%»
+DISCOUNT_RE = re.compile(r'(?<!\w)(?:скидк\w*\s+)?(?:от\s+)?-?(\d{1,2})\s*%', re.IGNORECASE)
+
+
+class Filters:
+    """
+    Условия поиска, разобранные из текста запроса
+    """
+
+    def __init__(self):
+        self.min_price: Optional[float] = None
+        self.max_price: Optional[float] = None
+        self.min_discount: Optional[float] = None
+        self.stores: List[str] = []
+        self.categories: List[str] = []
+
+    def __bool__(self) -> bool:
+        return any((self.min_price is not None, self.max_price is not None,
+                    self.min_discount is not None, self.stores, self.categories))
+
+    def describe(self) -> str:
+        """
+        Описание фильтров для ответа пользователю
+        """
+        parts = []
+        if self.min_price is not None:
+            parts.append(f"от {self.min_price:,.0f}₽".replace(',', ' '))
+        if self.max_price is not None:
+            parts.append(f"до {self.max_price:,.0f}₽".replace(',', ' '))
+        if self.min_discount is not None:
+            parts.append(f"скидка от {self.min_discount:.0f}%")
+        parts.extend(self.stores)
+        parts.extend(self.categories)
+        return ', '.join(parts)
+
+
+def _folded(text: str) -> str:
+    return ' '.join(tokenize(text))
+
+
+class FacetIndex:
+    """
+    Индексы фильтров по номерам товаров в рейтинге
+    """
+
+    def __init__(self, stores: Sequence[Optional[str]], categories: Sequence[Optional[str]],
+                 prices: np.ndarray, discounts: np.ndarray):
+        self.count = len(prices)
+        self.stores = self._bitmaps(stores)
+        self.categories = self._bitmaps(categories)
+        self.prices = self._sorted(prices)
+        self.discounts = self._sorted(discounts)
+
+        # Нормализованное название → исходное, для разбора запроса
+        self.store_names = {_folded(name): name for name in self.stores}
+        self.category_names = {_folded(name): name for name in self.categories}
+
+    @classmethod
+    def from_products(cls, products: Sequence[Mapping[str, Any]]) -> 'FacetIndex':
+        """
+        Строит индексы по рейтингу (списку словарей или бинарному снимку)
+        """
+        if hasattr(products, 'strings'):
+            # Снимок: отсутствующее числовое поле хранится нулём, его отличаем по флагу наличия
+            def numbers(name: str) -> np.ndarray:
+                return np.where(products.present[name] == 1, products.column(name), np.nan)
+
+            return cls(products.strings('store'), products.strings('category'),
+                       numbers('price'), numbers('discount'))
+
+        def numbers(name: str) -> np.ndarray:
+            values = (p.get(name) for p in products)
+            return np.fromiter((v if isinstance(v, (int, float)) else np.nan for v in values),
+                               dtype=np.float64, count=len(products))
+
+        return cls([p.get('store') for p in products], [p.get('category') for p in products],
+                   numbers('price'), numbers('discount'))
+
+    def _bitmaps(self, values: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+        """
+        Маска товаров для каждого значения поля
+        """
+        codes: Dict[str, int] = {}
+        column = np.fromiter((codes.setdefault(v, len(codes)) if v else -1 for v in values),
+                             dtype=np.int64, count=self.count)
+        return {value: column == code for value, code in codes.items()}
+
+    @staticmethod
+    def _sorted(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (значения по возрастанию, номера товаров в том же порядке); товары без значения не входят
+        """
+        known = np.flatnonzero(~np.isnan(values))
+        order = known[np.argsort(values[known], kind='stable')]
+        return values[order], order
+
+    def _range(self, column: Tuple[np.ndarray, np.ndarray],
+               low: Optional[float], high: Optional[float]) -> np.ndarray:
+        """
+        Маска товаров со значением в [low, high]
+        """
+        values, order = column
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(self.count, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def _any_of(self, bitmaps: Dict[str, np.ndarray], names: List[str]) -> np.ndarray:
+        mask = np.zeros(self.count, dtype=bool)
+        for name in names:
+            mask |= bitmaps[name]
+        return mask
+
+    def mask(self, filters: Filters) -> Optional[np.ndarray]:
+        """
+        Маска товаров, подходящих под все фильтры (None — фильтров нет)
+        """
+        masks = []
+        if filters.stores:
+            masks.append(self._any_of(self.stores, filters.stores))
+        if filters.categories:
+            masks.append(self._any_of(self.categories, filters.categories))
+        if filters.min_price is not None or filters.max_price is not None:
+            masks.append(self._range(self.prices, filters.min_price, filters.max_price))
+        if filters.min_discount is not None:
+            masks.append(self._range(self.discounts, filters.min_discount, None))
+
+        if not masks:
+            return None
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask
+        return result
+
+    def _categories(self, folded: str) -> List[str]:
+        """
+        Категории рейтинга по нормализованному названию или русскому синониму
+        """
+        targets = CATEGORY_ALIASES.get(folded, folded)
+        if isinstance(targets, str):
+            targets = [targets]
+        names = (self.category_names.get(_folded(target)) for target in targets)
+        return [name for name in names if name]
+
+    def parse(self, query: str) -> Tuple[str, Filters]:
+        """
+        Выделяет фильтры из запроса
+        Возвращает (текст для поиска по названию, фильтры)
+        """
+        filters = Filters()
+
+        def take_price(match) -> str:
+            value = float(re.sub(r'\s', '', match.group(2)))
+            if match.group(1).lower() == 'до':
+                filters.max_price = value
+            else:
+                filters.min_price = value
+            return ' '
+        query = PRICE_RE.sub(take_price, query)
+
+        def take_discount(match) -> str:
+            filters.min_discount = float(match.group(1))
+            return ' '
+        query = DISCOUNT_RE.sub(take_discount, query)
+
+        def add_categories(names: List[str]):
+            for name in names:
+                if name not in filters.categories:
+                    filters.categories.append(name)
+
+        def take_category(match) -> str:
+            names = self._categories(_folded(match.group(1)))
+            if not names:
+                # Неизвестную категорию ищем как обычное слово
+                return f' {match.group(1)} '
+            add_categories(names)
+            return ' '
+        query = CATEGORY_RE.sub(take_category, query)
+
+        remaining = []
+        for word in tokenize(query):
+            name = self.store_names.get(STORE_ALIASES.get(word, word))
+            categories = self._categories(word) if word in CATEGORY_ALIASES else []
+            if name:
+                if name not in filters.stores:
+                    filters.stores.append(name)
+            elif categories:
+                add_categories(categories)
+            else:
+                remaining.append(word)
+
+        return ' '.join(remaining), filters
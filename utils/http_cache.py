@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Дисковый HTTP кеш для условных запросов
+Хранит ETag/Last-Modified, тело страницы и найденные ID товаров,
+чтобы на 304 сразу вернуть готовый список. Список, прочитанный из потока
+не до конца, помечается лимитом и годится только для запросов не больше его
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import HTTP_CACHE_MAX_MB
+except ImportError:
+    HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '50'))
+
+
+class HttpCache:
+    """
+    Кеш страниц с валидаторами и LRU-вытеснением по размеру
+    """
+
+    def __init__(self, cache_dir: str = 'data/http_cache', max_bytes: int = HTTP_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        self.index: Dict[str, Dict[str, Any]] = self._load_index()
+        # Отметки использования после 304 пишутся на диск пачкой в flush()
+        self.dirty = False
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Загружает индекс кеша
+        """
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Индекс HTTP кеша повреждён, начинаем с нуля: {e}")
+            return {}
+
+    def _save_index(self):
+        """
+        Атомарно сохраняет индекс кеша
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.html.gz')
+
+    @staticmethod
+    def _covers(entry: Dict[str, Any], limit: Optional[int]) -> bool:
+        """
+        Хватит ли сохранённого списка ID для запроса с таким limit
+        """
+        if 'limit' in entry:
+            saved_limit = entry['limit']
+        else:
+            # Записи старого формата без тела получены из потока и могли быть обрезаны
+            saved_limit = None if entry.get('size') else len(entry.get('ids', []))
+        return saved_limit is None or (limit is not None and limit <= saved_limit)
+
+    def conditional_headers(self, url: str, limit: Optional[int] = None) -> Dict[str, str]:
+        """
+        Возвращает заголовки If-None-Match / If-Modified-Since для URL
+        Если сохранённый список короче нужного, валидаторы не отправляются:
+        ответ 304 вернул бы неполный список
+        """
+        with self.lock:
+            entry = self.index.get(self._key(url))
+
+        headers = {}
+        if entry and self._covers(entry, limit):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get_ids(self, url: str, limit: Optional[int] = None) -> Optional[List[str]]:
+        """
+        Возвращает сохранённые ID товаров (после ответа 304)
+        None, если записи нет или список короче нужного
+        """
+        key = self._key(url)
+        with self.lock:
+            entry = self.index.get(key)
+            if not entry or not self._covers(entry, limit):
+                return None
+            entry['used'] = time.time()
+            self.dirty = True
+            ids = entry.get('ids', [])
+            return ids[:limit] if limit else list(ids)
+
+    def get_body(self, url: str) -> Optional[str]:
+        """
+        Возвращает сохранённое тело страницы
+        """
+        try:
+            with gzip.open(self._body_path(self._key(url)), 'rt', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, url: str, headers: Dict[str, str], body: Optional[str], ids: List[str],
+              limit: Optional[int] = None):
+        """
+        Сохраняет ответ 200, если у него есть валидаторы
+        limit — на скольких ID остановилось чтение страницы (None, если прочитана целиком)
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        key = self._key(url)
+        with self.lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            if body is not None:
+                with gzip.open(self._body_path(key), 'wt', encoding='utf-8') as f:
+                    f.write(body)
+                size = os.path.getsize(self._body_path(key))
+            else:
+                # Без тела место занимает только список ID в индексе
+                size = len(json.dumps(ids))
+
+            self.index[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'ids': ids,
+                'limit': limit,
+                'size': size,
+                'used': time.time(),
+            }
+            self._evict()
+            self._save_index()
+            self.dirty = False
+
+    def flush(self):
+        """
+        Сохраняет отметки использования, накопленные get_ids
+        """
+        with self.lock:
+            if self.dirty:
+                self._save_index()
+                self.dirty = False
+
+    def _evict(self):
+        """
+        Удаляет давно не использованные записи, пока кеш больше лимита
+        """
+        total = sum(entry.get('size', 0) for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k].get('used', 0)):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[key].get('size', 0)
+            del self.index[key]
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
@@ -5,7 +5,6 @@
 Модуль для загрузки изображений на imgbb.com
 """
 
-import requests
 import os
 import sys
 import tempfile
@@ -20,6 +19,8 @@ except ImportError:
     IMGBB_API_KEY = os.getenv('IMGBB_API_KEY', '')
     print("⚠️ config.py не найден, использую переменные окружения")
 
+from utils.rate_limiter import rate_limiter
+
 class ImageUploader:
     """
     Класс для загрузки изображений на imgbb
@@ -45,13 +46,16 @@ class ImageUploader:
             return None
         
         try:
+            # Читаем файл целиком, чтобы повторные попытки отправляли те же байты
             with open(file_path, 'rb') as file:
-                response = requests.post(
-                    self.api_url,
-                    params={'key': self.api_key},
-                    files={'image': file},
-                    timeout=30
-                )
+                content = file.read()
+            
+            response = rate_limiter.post(
+                self.api_url,
+                params={'key': self.api_key},
+                files={'image': (os.path.basename(file_path), content)},
+                timeout=30
+            )
             
             if response.status_code == 200:
                 data = response.json()
@@ -78,7 +82,7 @@ class ImageUploader:
         try:
             # Скачиваем изображение
             print(f"📥 Скачиваем изображение: {image_url}")
-            response = requests.get(image_url, timeout=30)
+            response = rate_limiter.get(image_url, timeout=30)
             
             if response.status_code != 200:
                 print(f"❌ Не удалось скачать изображение: {response.status_code}")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Объединение выгрузок магазинов в один рейтинг
+Файлы магазинов уже отсортированы по value_score, поэтому они сливаются
+потоково (k-way merge через кучу): в памяти одновременно лежит
+по одному товару на магазин
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import sys
+from typing import Dict, Any, Iterator, List, Optional
+
+# Добавляем путь к проекту
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import MAX_PRODUCTS_PER_STORE
+except ImportError:
+    MAX_PRODUCTS_PER_STORE = int(os.getenv('MAX_PRODUCTS_PER_STORE', '50'))
+
+from utils.product import Product
+from utils.snapshot import SNAPSHOT_FILE, Snapshot, SnapshotBuilder
+from utils.storage import MERGED_FILE, MERGED_SOURCES_FILE, iter_products, list_store_files, recover_journals, write_products_atomic
+
+
+def product_key(product: Dict[str, Any]) -> tuple:
+    """
+    Ключ для удаления дубликатов: магазин и ID товара (или ссылка, если ID нет)
+    """
+    return (product.get('store', ''), str(product.get('id') or product.get('url', '')))
+
+
+def _score(product: Dict[str, Any]):
+    return product.get('value_score', 0)
+
+
+def merge_streams(files: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Сливает отсортированные выгрузки магазинов в один поток по убыванию value_score
+    Повторы (магазин, ID) отбрасываются. У копий одного товара одинаковый
+    value_score, поэтому они идут подряд и ключи достаточно помнить
+    только для текущего значения оценки
+    """
+    streams = [iter_products(path) for path in files]
+    seen = set()
+    current_score = None
+    
+    for product in heapq.merge(*streams, key=_score, reverse=True):
+        score = _score(product)
+        if score != current_score:
+            current_score = score
+            seen.clear()
+        
+        key = product_key(product)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield product
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprints(data_dir: str = 'data') -> Dict[str, List]:
+    """
+    Отпечатки выгрузок магазинов: {имя файла: [размер, sha1]}
+    Считаются по содержимому, а не по mtime: git при checkout пишет
+    файлы в произвольном порядке, и время изменения ничего не говорит
+    """
+    return {
+        os.path.basename(path): [os.path.getsize(path), _file_digest(path)]
+        for path in list_store_files(data_dir)
+    }
+
+
+def _sources_match(sources: Optional[Dict[str, Any]], data_dir: str) -> bool:
+    """
+    Проверяет, что результат собран из текущих выгрузок магазинов
+    """
+    return sources is not None and sources == source_fingerprints(data_dir)
+
+
+def is_merged_fresh(data_dir: str = 'data') -> bool:
+    """
+    Проверяет, что merged.jsonl собран из текущих выгрузок магазинов
+    """
+    if not os.path.exists(os.path.join(data_dir, MERGED_FILE)):
+        return False
+    try:
+        with open(os.path.join(data_dir, MERGED_SOURCES_FILE), 'r', encoding='utf-8') as f:
+            sources = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return _sources_match(sources, data_dir)
+
+
+def load_snapshot(data_dir: str = 'data') -> Optional[Snapshot]:
+    """
+    Открывает бинарный снимок рейтинга, если он собран из текущих выгрузок
+    """
+    path = os.path.join(data_dir, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Снимок {path} не открылся: {e}")
+        return None
+    if not _sources_match(snapshot.sources, data_dir):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def _write_sources(sources: Dict[str, Any], path: str):
+    """
+    Атомарно сохраняет отпечатки выгрузок
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sources, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_ranked_products(data_dir: str = 'data') -> List[Product]:
+    """
+    Возвращает все товары по убыванию value_score
+    Берёт готовый merged.jsonl, а если он устарел — сливает выгрузки на лету
+    """
+    if is_merged_fresh(data_dir):
+        products = iter_products(os.path.join(data_dir, MERGED_FILE))
+    else:
+        products = merge_streams(list_store_files(data_dir))
+    return [Product.from_dict(product) for product in products]
+
+
+def merge_products(data_dir: str = 'data', output_file: Optional[str] = None) -> int:
+    """
+    Пишет объединённый рейтинг в data/merged.jsonl и бинарный снимок data/merged.snap
+    Перед слиянием доводит до выгрузок журналы упавших запусков
+    Возвращает количество товаров
+    """
+    output_file = output_file or os.path.join(data_dir, MERGED_FILE)
+    recover_journals(data_dir, MAX_PRODUCTS_PER_STORE)
+    files = list_store_files(data_dir)
+    # Отпечатки снимаются до чтения: если выгрузка поменяется во время слияния,
+    # результат просто не совпадёт с ней и будет считаться устаревшим
+    sources = source_fingerprints(data_dir)
+    print(f"📦 Объединяем {len(files)} файлов: {', '.join(os.path.basename(f) for f in files)}")
+    
+    # Снимок собирается тем же проходом, что и JSON Lines
+    snapshot = SnapshotBuilder()
+    
+    def collect(products: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for product in products:
+            snapshot.add(product)
+            yield product
+    
+    # Подменяем файлы целиком, чтобы бот не увидел их наполовину записанными
+    output_dir = os.path.dirname(output_file)
+    count = write_products_atomic(collect(merge_streams(files)), output_file)
+    snapshot.write(os.path.join(output_dir, SNAPSHOT_FILE), sources)
+    _write_sources(sources, os.path.join(output_dir, MERGED_SOURCES_FILE))
+    print(f"💾 Сохранено {count} товаров в {output_file}")
+    
+    return count
+
+
+def main():
+    """
+    Основная функция запуска
+    """
+    merge_products()
+
+
+if __name__ == '__main__':
+    main()
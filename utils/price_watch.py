@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Отслеживание цен для /watch
+Подписки хранятся в SQLite с ключом (магазин, ID товара, пользователь):
+первичный ключ и есть индекс «товар → подписчики». После каждого прогона
+парсеров новые цены сверяются с последней известной ценой отслеживаемых
+товаров, и только для подешевевших из индекса берутся подписчики —
+работа пропорциональна числу товаров прогона, а не пользователей × товаров.
+Найденные снижения складываются в очередь уведомлений, её разбирает бот
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import WATCH_LIMIT_PER_USER, WATCH_MIN_DROP_PERCENT, WATCH_FETCH_MISSING
+except ImportError:
+    WATCH_LIMIT_PER_USER = int(os.getenv('WATCH_LIMIT_PER_USER', '50'))
+    WATCH_MIN_DROP_PERCENT = float(os.getenv('WATCH_MIN_DROP_PERCENT', '1'))
+    WATCH_FETCH_MISSING = int(os.getenv('WATCH_FETCH_MISSING', '0'))
+
+from utils.storage import iter_products, list_store_files
+
+# Ссылка на товар → (магазин, шаблон ID)
+PRODUCT_URL_PATTERNS = [
+    ('Wildberries', re.compile(r'(?:wildberries\.ru|wb\.ru)/catalog/(\d+)', re.IGNORECASE)),
+    ('Ozon', re.compile(r'ozon\.ru/product/(?:[\w-]*-)?(\d+)(?=[/?#]|$)', re.IGNORECASE)),
+    ('AliExpress', re.compile(r'aliexpress\.(?:ru|com|us)/item/(\d+)\.html', re.IGNORECASE)),
+]
+
+# Товаров за один запрос при сверке цен (SQLite ограничивает число параметров)
+MATCH_BATCH = 400
+
+
+def parse_product_url(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Определяет магазин и ID товара по ссылке
+    Возвращает (магазин, ID) или None, если ссылка не распознана
+    """
+    for store, pattern in PRODUCT_URL_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return store, match.group(1)
+    return None
+
+
+def product_key(product: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    (магазин, ID) товара из выгрузки
+    У товаров Ozon и AliExpress нет поля id, для них ID берётся из ссылки
+    """
+    if product.get('id'):
+        return product.get('store') or '', str(product['id'])
+    return parse_product_url(product.get('url') or '')
+
+
+class WatchStore:
+    """
+    Подписки на товары, последние цены и очередь уведомлений
+    """
+
+    def __init__(self, db_path: str = 'data/watches.db',
+                 limit_per_user: int = WATCH_LIMIT_PER_USER,
+                 min_drop_percent: float = WATCH_MIN_DROP_PERCENT):
+        self.db_path = db_path
+        self.limit_per_user = limit_per_user
+        self.min_drop = min_drop_percent / 100
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watches (
+                store TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                created TEXT NOT NULL,
+                PRIMARY KEY (store, product_id, user_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS watches_user ON watches (user_id);
+
+            -- Отслеживаемые товары: последняя увиденная цена
+            CREATE TABLE IF NOT EXISTS watched_products (
+                store TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                price INTEGER,
+                name TEXT,
+                checked TEXT,
+                PRIMARY KEY (store, product_id)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                store TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                name TEXT,
+                url TEXT,
+                old_price INTEGER NOT NULL,
+                new_price INTEGER NOT NULL,
+                created TEXT NOT NULL,
+                sent INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS notifications_pending ON notifications (id) WHERE sent = 0;
+        """)
+        self.conn.commit()
+
+    # ========== ПОДПИСКИ ==========
+
+    def add(self, user_id, store: str, product_id: str, url: str) -> bool:
+        """
+        Подписывает пользователя на товар
+        Возвращает False, если достигнут лимит подписок
+        """
+        now = datetime.now().isoformat()
+        with self.lock:
+            count = self.conn.execute(
+                'SELECT COUNT(*) FROM watches WHERE user_id = ?', (str(user_id),)
+            ).fetchone()[0]
+            if count >= self.limit_per_user:
+                return False
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO watches (store, product_id, user_id, url, created) VALUES (?, ?, ?, ?, ?)',
+                    (store, product_id, str(user_id), url, now)
+                )
+                self.conn.execute(
+                    'INSERT OR IGNORE INTO watched_products (store, product_id) VALUES (?, ?)',
+                    (store, product_id)
+                )
+        return True
+
+    def remove(self, user_id, store: str, product_id: str) -> bool:
+        with self.lock:
+            with self.conn:
+                removed = self.conn.execute(
+                    'DELETE FROM watches WHERE store = ? AND product_id = ? AND user_id = ?',
+                    (store, product_id, str(user_id))
+                ).rowcount
+                # Товар без подписчиков больше не сверяем
+                self.conn.execute(
+                    'DELETE FROM watched_products WHERE store = ? AND product_id = ? AND NOT EXISTS '
+                    '(SELECT 1 FROM watches WHERE store = ? AND product_id = ?)',
+                    (store, product_id, store, product_id)
+                )
+        return removed > 0
+
+    def list_for_user(self, user_id) -> List[Dict[str, Any]]:
+        """
+        Подписки пользователя с последней известной ценой
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT w.store, w.product_id, w.url, p.price, p.name FROM watches w '
+                'LEFT JOIN watched_products p ON p.store = w.store AND p.product_id = w.product_id '
+                'WHERE w.user_id = ? ORDER BY w.created',
+                (str(user_id),)
+            ).fetchall()
+        return [dict(zip(('store', 'product_id', 'url', 'price', 'name'), row)) for row in rows]
+
+    def watched_ids(self, store: str) -> List[str]:
+        """
+        ID всех отслеживаемых товаров магазина, начиная с давно не проверенных
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT product_id FROM watched_products WHERE store = ? ORDER BY checked', (store,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_checked(self, store: str, product_ids: List[str]):
+        """
+        Отмечает проверку товаров, даже если магазин их не вернул,
+        чтобы догрузка по кругу дошла до остальных
+        """
+        now = datetime.now().isoformat()
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'UPDATE watched_products SET checked = ? WHERE store = ? AND product_id = ?',
+                    ((now, store, product_id) for product_id in product_ids)
+                )
+
+    # ========== СВЕРКА ЦЕН ==========
+
+    def match(self, products: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Сверяет новые цены с последними известными
+        Для подешевевших товаров ставит уведомления всем подписчикам
+        Возвращает счётчики: просмотрено, отслеживаемых, снижений, уведомлений
+        """
+        stats = {'checked': 0, 'watched': 0, 'drops': 0, 'notifications': 0}
+        batch: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        for product in products:
+            price = product.get('price')
+            key = product_key(product)
+            if key is None or not isinstance(price, (int, float)) or price <= 0:
+                continue
+            stats['checked'] += 1
+            batch[key] = product
+            if len(batch) >= MATCH_BATCH:
+                self._match_batch(batch, stats)
+                batch = {}
+
+        if batch:
+            self._match_batch(batch, stats)
+        return stats
+
+    def _match_batch(self, batch: Dict[Tuple[str, str], Dict[str, Any]], stats: Dict[str, int]):
+        keys = list(batch)
+        placeholders = ','.join('(?, ?)' for _ in keys)
+        params = [value for key in keys for value in key]
+        now = datetime.now().isoformat()
+
+        with self.lock:
+            # Из пачки остаются только отслеживаемые товары. CROSS JOIN фиксирует порядок:
+            # по каждому товару пачки поиск в первичном ключе, а не обход всех отслеживаемых
+            rows = self.conn.execute(
+                f'SELECT p.store, p.product_id, p.price FROM (VALUES {placeholders}) AS v '
+                f'CROSS JOIN watched_products p ON p.store = v.column1 AND p.product_id = v.column2',
+                params
+            ).fetchall()
+            if not rows:
+                return
+
+            with self.conn:
+                for store, product_id, old_price in rows:
+                    stats['watched'] += 1
+                    product = batch[(store, product_id)]
+                    new_price = int(product['price'])
+                    name = product.get('name') or None
+
+                    if old_price and new_price <= old_price * (1 - self.min_drop):
+                        stats['drops'] += 1
+                        # Подписчики товара — по префиксу первичного ключа watches
+                        stats['notifications'] += self.conn.execute(
+                            'INSERT INTO notifications '
+                            '(user_id, store, product_id, name, url, old_price, new_price, created) '
+                            'SELECT user_id, store, product_id, ?, COALESCE(?, url), ?, ?, ? '
+                            'FROM watches WHERE store = ? AND product_id = ?',
+                            (name, product.get('url') or None, old_price, new_price, now, store, product_id)
+                        ).rowcount
+
+                    self.conn.execute(
+                        'UPDATE watched_products SET price = ?, name = COALESCE(?, name), checked = ? '
+                        'WHERE store = ? AND product_id = ?',
+                        (new_price, name, now, store, product_id)
+                    )
+
+    # ========== УВЕДОМЛЕНИЯ ==========
+
+    def pending(self, limit: int = 200, after_id: int = 0) -> List[Dict[str, Any]]:
+        """
+        Неотправленные уведомления в порядке появления (с номером больше after_id)
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                'SELECT id, user_id, store, product_id, name, url, old_price, new_price '
+                'FROM notifications WHERE sent = 0 AND id > ? ORDER BY id LIMIT ?', (after_id, limit)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def mark_sent(self, notification_ids: List[int]):
+        if not notification_ids:
+            return
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'UPDATE notifications SET sent = 1 WHERE id = ?', ((i,) for i in notification_ids)
+                )
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            watches = self.conn.execute('SELECT COUNT(*) FROM watches').fetchone()[0]
+            products = self.conn.execute('SELECT COUNT(*) FROM watched_products').fetchone()[0]
+            pending = self.conn.execute('SELECT COUNT(*) FROM notifications WHERE sent = 0').fetchone()[0]
+        return {'watches': watches, 'products': products, 'pending': pending}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def iter_run_products(data_dir: str = 'data') -> Iterator[Dict[str, Any]]:
+    """
+    Товары последнего прогона парсеров из выгрузок магазинов
+    """
+    for path in list_store_files(data_dir):
+        yield from iter_products(path)
+
+
+def fetch_missing_wildberries(store: WatchStore, seen: set, limit: int) -> List[Dict[str, Any]]:
+    """
+    Цены отслеживаемых товаров Wildberries, которых не было в выгрузке
+    За раз догружается не больше limit давно не проверенных карточек в один поток,
+    запросы идут через общий ограничитель частоты
+    """
+    missing = [pid for pid in store.watched_ids('Wildberries') if ('Wildberries', pid) not in seen][:limit]
+    if not missing:
+        return []
+
+    from parsers.wildberries import WildberriesParser
+
+    # Кеш карточек парсера боту не нужен: держим его в памяти, а не в data/
+    parser = WildberriesParser(max_workers=1, card_cache_path=':memory:')
+    products = []
+    try:
+        for product in parser.fetch_products(missing):
+            if product is not None:
+                product.store = 'Wildberries'
+                products.append(product)
+    finally:
+        parser.card_cache.close()
+    store.mark_checked('Wildberries', missing)
+    return products
+
+
+def check_prices(data_dir: str = 'data', store: Optional[WatchStore] = None,
+                 fetch_missing: int = WATCH_FETCH_MISSING) -> Dict[str, int]:
+    """
+    Сверяет цены последнего прогона с подписками и ставит уведомления
+    fetch_missing — сколько отслеживаемых товаров Wildberries вне выгрузки
+    догрузить через API карточек (0 — только выгрузка)
+    """
+    store = store or WatchStore(os.path.join(data_dir, 'watches.db'))
+    seen = set()
+
+    def run_products() -> Iterator[Dict[str, Any]]:
+        for product in iter_run_products(data_dir):
+            seen.add(product_key(product))
+            yield product
+
+    stats = store.match(run_products())
+
+    if fetch_missing > 0:
+        try:
+            extra = store.match(fetch_missing_wildberries(store, seen, fetch_missing))
+        except Exception as e:
+            print(f"⚠️ Не удалось догрузить карточки Wildberries: {e}")
+        else:
+            for key, value in extra.items():
+                stats[key] += value
+
+    return stats
+
+
+def main():
+    """
+    Проверка цен из командной строки (после прогона парсеров)
+    """
+    print("=" * 60)
+    print("🔔 ПРОВЕРКА ОТСЛЕЖИВАЕМЫХ ЦЕН")
+    print("=" * 60)
+
+    stats = check_prices()
+    print(f"📦 Просмотрено товаров: {stats['checked']}")
+    print(f"👀 Отслеживаемых среди них: {stats['watched']}")
+    print(f"📉 Подешевело: {stats['drops']}")
+    print(f"🔔 Уведомлений в очереди: {stats['notifications']}")
+
+
+if __name__ == '__main__':
+    main()
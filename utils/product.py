@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Единая запись товара
+Все парсеры приводят товары к Product при сборе, а бот и постер читают
+уже нормализованные поля без цепочек product.get(..., product.get(...)).
+__slots__ вместо словаря на каждый товар заметно экономит память на больших рейтингах
+"""
+
+from typing import Dict, Any, List, Mapping, Optional
+
+# Старые и сторонние названия полей → каноническое
+FIELD_ALIASES = {
+    'sale_price': 'price',
+    'regular_price': 'old_price',
+    'image_url': 'image',
+}
+
+# Значения по умолчанию для канонических полей
+DEFAULTS = {
+    'id': '',
+    'name': '',
+    'price': 0,
+    'old_price': 0,
+    'discount': 0,
+    'rating': 0,
+    'reviews': 0,
+    'url': '',
+    'image': None,
+    'store': '',
+    'category': '',
+    'emoji': '🛍️',
+    'value_score': 0,
+    'value_reasons': None,
+    'final_score': None,
+}
+
+FIELDS = tuple(DEFAULTS)
+
+
+class Product:
+    """
+    Товар магазина с фиксированным набором полей
+    Незнакомые поля (brand и т.п.) сохраняются в extra, чтобы выгрузка не теряла данных.
+    get() и [] оставлены для общего кода, который работает и со словарями (оценка, топ, кеш)
+    """
+
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, **fields):
+        self.extra: Optional[Dict[str, Any]] = None
+        for name in FIELDS:
+            setattr(self, name, DEFAULTS[name])
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'Product':
+        """
+        Нормализует словарь товара: псевдонимы полей, пустые значения, типы
+        """
+        if isinstance(data, Product):
+            return data
+
+        product = cls()
+        for key, value in data.items():
+            canonical = FIELD_ALIASES.get(key)
+            if canonical is not None:
+                # Каноническое поле важнее псевдонима
+                if canonical in data:
+                    continue
+                key = canonical
+            product[key] = value
+
+        product.id = str(product.id) if product.id is not None else ''
+        for name in ('name', 'url', 'store', 'category'):
+            if getattr(product, name) is None:
+                setattr(product, name, '')
+        for name in ('price', 'old_price', 'discount', 'rating', 'reviews', 'value_score'):
+            if getattr(product, name) is None:
+                setattr(product, name, 0)
+        if not product.emoji:
+            product.emoji = DEFAULTS['emoji']
+        if not product.image:
+            product.image = None
+        return product
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Словарь для JSON: канонические поля (без пустых необязательных) и extra
+        """
+        data = {}
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in DEFAULTS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in DEFAULTS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in DEFAULTS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key in DEFAULTS:
+            return getattr(self, key) is not None
+        return bool(self.extra) and key in self.extra
+
+    @property
+    def reasons(self) -> List[str]:
+        return self.value_reasons or []
+
+    def __repr__(self) -> str:
+        return f"Product(id={self.id!r}, name={self.name!r}, store={self.store!r}, value_score={self.value_score!r})"
+
+
+def as_dict(product: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Словарь для сериализации из Product или обычного словаря
+    """
+    return product.to_dict() if isinstance(product, Product) else product
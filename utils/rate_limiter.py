@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Адаптивный ограничитель частоты запросов
+Для каждого хоста ведётся свой token bucket: скорость растёт, пока
+ответы здоровые, и резко падает при 429/5xx
+"""
+
+import os
+import sys
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import RATE_LIMIT_START, RATE_LIMIT_MIN, RATE_LIMIT_MAX, MAX_GLOBAL_REQUESTS
+except ImportError:
+    RATE_LIMIT_START = float(os.getenv('RATE_LIMIT_START', '4'))
+    RATE_LIMIT_MIN = float(os.getenv('RATE_LIMIT_MIN', '0.2'))
+    RATE_LIMIT_MAX = float(os.getenv('RATE_LIMIT_MAX', '20'))
+    MAX_GLOBAL_REQUESTS = int(os.getenv('MAX_GLOBAL_REQUESTS', '16'))
+
+# Статусы, при которых нужно сбавить скорость и повторить запрос
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Самая длинная пауза: Retry-After длиннее не ждём, а сдаёмся
+MAX_BACKOFF = 60.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает заголовок Retry-After (секунды или HTTP-дата)
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        moment = parsedate_to_datetime(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostBucket:
+    """
+    Token bucket одного хоста с адаптивной скоростью (AIMD)
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_START,
+                 min_rate: float = RATE_LIMIT_MIN, max_rate: float = RATE_LIMIT_MAX):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """
+        Пополняет токены по прошедшему времени
+        """
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Ждёт, пока можно будет отправить запрос
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            # Джиттер, чтобы потоки не просыпались одновременно
+            time.sleep(wait + random.uniform(0, wait * 0.1))
+
+    def on_success(self):
+        """
+        Здоровый ответ: плавно увеличиваем скорость
+        """
+        with self.lock:
+            self.failures = 0
+            self.rate = min(self.max_rate, self.rate + 0.1 * max(1.0, self.rate) ** 0.5)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        429/5xx или сетевая ошибка: вдвое снижаем скорость и делаем паузу
+        Возвращает длительность паузы
+        """
+        with self.lock:
+            self.failures += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+
+            if retry_after is None:
+                # Экспоненциальная пауза с джиттером
+                retry_after = min(MAX_BACKOFF, 2 ** self.failures) * random.uniform(0.5, 1.5)
+            retry_after = min(MAX_BACKOFF, retry_after)
+
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = 0.0
+            return retry_after
+
+
+class RateLimiter:
+    """
+    Общий ограничитель для всех HTTP запросов парсеров
+    Кроме скорости по хостам ограничивает число одновременных запросов процесса
+    """
+
+    def __init__(self, max_in_flight: int = MAX_GLOBAL_REQUESTS):
+        self.buckets: Dict[str, HostBucket] = {}
+        self.lock = threading.Lock()
+        self.in_flight = threading.BoundedSemaphore(max(1, max_in_flight))
+
+    def bucket(self, url: str) -> HostBucket:
+        """
+        Возвращает bucket для хоста из URL
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = HostBucket()
+            return self.buckets[host]
+
+    def request(self, method: str, url: str, session: Optional[requests.Session] = None,
+                retries: int = 3, **kwargs) -> requests.Response:
+        """
+        Выполняет запрос через ограничитель с повторами
+        Возвращает последний ответ; сетевую ошибку последней попытки пробрасывает
+        """
+        bucket = self.bucket(url)
+        sender = session or requests
+        retries = max(1, retries)
+
+        for attempt in range(retries):
+            bucket.acquire()
+
+            self.in_flight.acquire()
+            try:
+                response = sender.request(method, url, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self.in_flight.release()
+                if attempt == retries - 1:
+                    raise
+                wait = bucket.on_throttle()
+                print(f"🔌 {type(e).__name__} ({urlparse(url).netloc}). Пауза {wait:.1f} с, попытка {attempt + 1}/{retries}")
+                continue
+            except BaseException:
+                self.in_flight.release()
+                raise
+
+            if kwargs.get('stream'):
+                # Тело читается уже после возврата: слот занят, пока ответ не закрыт
+                self._release_on_close(response)
+            else:
+                self.in_flight.release()
+
+            if response.status_code in THROTTLE_STATUSES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None and retry_after > MAX_BACKOFF:
+                    # Сервер просит ждать дольше, чем длится разумный запуск: скорость
+                    # снижаем, но хост не блокируем и отдаём ответ как есть
+                    bucket.on_throttle(0.0)
+                    print(f"⛔ Статус {response.status_code} ({urlparse(url).netloc}): Retry-After {retry_after:.0f} с "
+                          f"больше {MAX_BACKOFF:.0f} с, не ждём")
+                    return response
+                wait = bucket.on_throttle(retry_after)
+                if attempt == retries - 1:
+                    return response
+                # Соединение возвращается в пул, слот потокового ответа освобождается
+                response.close()
+                print(f"⚠️ Статус {response.status_code} ({urlparse(url).netloc}). Пауза {wait:.1f} с, попытка {attempt + 1}/{retries}")
+                continue
+
+            bucket.on_success()
+            return response
+
+        return response
+
+    def _release_on_close(self, response: requests.Response):
+        """
+        Освобождает слот одновременных запросов при закрытии ответа (один раз)
+        """
+        close = response.close
+        released = False
+
+        def close_and_release():
+            nonlocal released
+            try:
+                close()
+            finally:
+                if not released:
+                    released = True
+                    self.in_flight.release()
+
+        response.close = close_and_release
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET через ограничитель"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST через ограничитель"""
+        return self.request('POST', url, **kwargs)
+
+
+# Создаём глобальный экземпляр ограничителя
+rate_limiter = RateLimiter()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Оценка выгодности товаров
+Пороги заданы таблицами; пакетный расчёт идёт одним векторным проходом NumPy,
+одиночный — по тем же таблицам в чистом Python
+"""
+
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Метка причины для экономии подставляется с суммой
+SAVINGS_REASON = 'экономия {savings}₽'
+
+# Критерии value_score: (поле, [(порог, баллы, причина), ...]) по убыванию порога
+# Срабатывает первый порог, который значение достигло (>=)
+VALUE_RULES: List[Tuple[str, List[Tuple[float, int, str]]]] = [
+    # 1. Скидка (максимум 40 баллов)
+    ('discount', [
+        (70, 40, 'мегаскидка 70%+'),
+        (50, 30, 'огромная скидка 50%+'),
+        (30, 20, 'хорошая скидка 30%+'),
+        (20, 10, 'скидка 20%+'),
+    ]),
+    # 2. Рейтинг (максимум 20 баллов)
+    ('rating', [
+        (4.8, 20, 'топ-рейтинг 4.8+'),
+        (4.5, 15, 'высокий рейтинг 4.5+'),
+        (4.0, 10, 'хороший рейтинг'),
+    ]),
+    # 3. Количество отзывов (максимум 20 баллов)
+    ('reviews', [
+        (1000, 20, '1000+ отзывов'),
+        (500, 15, '500+ отзывов'),
+        (100, 10, '100+ отзывов'),
+    ]),
+    # 4. Экономия в рублях (максимум 20 баллов)
+    ('savings', [
+        (10000, 20, SAVINGS_REASON),
+        (5000, 15, SAVINGS_REASON),
+        (1000, 10, SAVINGS_REASON),
+    ]),
+]
+
+# Бонус final_score за скидку: срабатывает первый порог, который скидка превысила (>)
+FINAL_BONUS_RULES: List[Tuple[float, int]] = [
+    (50, 20),
+    (40, 10),
+    (30, 5),
+]
+
+# Максимально возможный value_score
+MAX_VALUE_SCORE = sum(rules[0][1] for _, rules in VALUE_RULES)
+
+
+def _number(value) -> float:
+    """
+    Приводит значение поля к числу (None и мусор считаются нулём)
+    """
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    # '1000' -> 1000, чтобы экономия в причинах печаталась без '.0'
+    return int(number) if number.is_integer() else number
+
+
+def product_columns(product: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Значения критериев для одного товара
+    """
+    return {
+        'discount': _number(product.get('discount', 0)),
+        'rating': _number(product.get('rating', 0)),
+        'reviews': _number(product.get('reviews', 0)),
+        'savings': _number(product.get('old_price', 0)) - _number(product.get('price', 0)),
+    }
+
+
+def _reason(label: str, savings) -> str:
+    if label == SAVINGS_REASON:
+        return f"экономия {savings:,}₽".replace(',', ' ')
+    return label
+
+
+def calculate_value_score(product: Dict[str, Any]) -> int:
+    """
+    Рассчитывает выгодность одного товара (0-100)
+    Записывает value_score и value_reasons в товар
+    """
+    columns = product_columns(product)
+    score = 0
+    reasons = []
+
+    for field, rules in VALUE_RULES:
+        value = columns[field]
+        for threshold, points, label in rules:
+            if value >= threshold:
+                score += points
+                reasons.append(_reason(label, columns['savings']))
+                break
+
+    product['value_score'] = score
+    product['value_reasons'] = reasons
+
+    return score
+
+
+def calculate_final_score(value_score: int, discount) -> int:
+    """
+    Итоговая выгодность для сортировки постов: value_score плюс бонус за скидку
+    """
+    discount = _number(discount)
+    for threshold, bonus in FINAL_BONUS_RULES:
+        if discount > threshold:
+            return value_score + bonus
+    return value_score
+
+
+def _tiers(values: np.ndarray, thresholds: Sequence[float], strict: bool = False) -> np.ndarray:
+    """
+    Номер сработавшего порога для каждого значения: 0 — ни один,
+    len(thresholds) — самый высокий. Пороги передаются по убыванию
+    """
+    ascending = np.asarray(thresholds[::-1], dtype=np.float64)
+    tiers = np.searchsorted(ascending, values, side='left' if strict else 'right')
+    # NaN не проходит ни одно сравнение
+    tiers[np.isnan(values)] = 0
+    return tiers
+
+
+def score_columns(discount, rating, reviews, savings) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Векторный расчёт value_score по колонкам
+    Возвращает (value_score, {поле: индекс правила в VALUE_RULES или -1})
+    """
+    columns = {
+        'discount': np.asarray(discount, dtype=np.float64),
+        'rating': np.asarray(rating, dtype=np.float64),
+        'reviews': np.asarray(reviews, dtype=np.float64),
+        'savings': np.asarray(savings, dtype=np.float64),
+    }
+
+    scores = np.zeros(len(columns['discount']), dtype=np.int64)
+    matched = {}
+
+    for field, rules in VALUE_RULES:
+        tiers = _tiers(columns[field], [rule[0] for rule in rules])
+        # Баллы по номеру порога: 0 для «не прошёл», дальше от низшего к высшему
+        points = np.array([0] + [rule[1] for rule in reversed(rules)], dtype=np.int64)
+        scores += points[tiers]
+        # Индекс правила в списке по убыванию порога
+        matched[field] = np.where(tiers > 0, len(rules) - tiers, -1)
+
+    return scores, matched
+
+
+def final_score_columns(value_score, discount) -> np.ndarray:
+    """
+    Векторный расчёт final_score
+    """
+    value_score = np.asarray(value_score, dtype=np.int64)
+    tiers = _tiers(np.asarray(discount, dtype=np.float64), [rule[0] for rule in FINAL_BONUS_RULES], strict=True)
+    bonus = np.array([0] + [rule[1] for rule in reversed(FINAL_BONUS_RULES)], dtype=np.int64)
+    return value_score + bonus[tiers]
+
+
+def _value_column(products: List[Dict[str, Any]], key: str) -> np.ndarray:
+    """
+    Колонка значений поля (None и мусор считаются нулём, как в _number)
+    """
+    return np.fromiter((_number(p.get(key)) for p in products), dtype=np.float64, count=len(products))
+
+
+def _base_reasons() -> List[List[str]]:
+    """
+    Готовые списки причин для всех сочетаний сработавших порогов
+    (кроме экономии, которая зависит от суммы)
+    """
+    fields = [rules for field, rules in VALUE_RULES if field != 'savings']
+    combos = [[]]
+    for rules in fields:
+        combos = [combo + extra for combo in combos for extra in [[]] + [[rule[2]] for rule in rules]]
+    return combos
+
+
+_BASE_REASONS = _base_reasons()
+
+
+def score_products(products: List[Dict[str, Any]], with_reasons: bool = True) -> np.ndarray:
+    """
+    Пакетно рассчитывает value_score и value_reasons для списка товаров
+    Результат совпадает с calculate_value_score для каждого товара
+    Без with_reasons пишется только value_score (причины дороже самих баллов)
+    """
+    if not products:
+        return np.zeros(0, dtype=np.int64)
+
+    scores, matched = score_columns(
+        _value_column(products, 'discount'),
+        _value_column(products, 'rating'),
+        _value_column(products, 'reviews'),
+        _value_column(products, 'old_price') - _value_column(products, 'price'),
+    )
+
+    # Номер сочетания причин: смешанная система счисления по полям (кроме экономии)
+    combo = np.zeros(len(products), dtype=np.int64)
+    for field, rules in VALUE_RULES:
+        if field != 'savings':
+            combo = combo * (len(rules) + 1) + (matched[field] + 1)
+
+    savings_matched = (matched['savings'] >= 0).tolist()
+    combo = combo.tolist()
+    scores_list = scores.tolist()
+
+    base_reasons = _BASE_REASONS
+    for product, score, combo_index, has_savings in zip(products, scores_list, combo, savings_matched):
+        product['value_score'] = score
+        if not with_reasons:
+            continue
+        reasons = base_reasons[combo_index].copy()
+        if has_savings:
+            savings = _number(product.get('old_price')) - _number(product.get('price'))
+            reasons.append(f"экономия {savings:,}₽".replace(',', ' '))
+        product['value_reasons'] = reasons
+
+    return scores
+
+
+def rank_products(products: List[Dict[str, Any]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Рассчитывает final_score для всех товаров и возвращает их по убыванию
+    При равенстве сохраняется исходный порядок (как у list.sort)
+    """
+    if not products:
+        return []
+
+    final = final_score_columns(_value_column(products, 'value_score'), _value_column(products, 'discount'))
+    order = np.argsort(-final, kind='stable')
+    if limit is not None:
+        order = order[:limit]
+
+    for product, score in zip(products, final.tolist()):
+        product['final_score'] = score
+    return [products[i] for i in order.tolist()]
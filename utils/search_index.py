@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Инвертированный индекс по названиям товаров для /search
+Строится один раз на снимок рейтинга. Слова нормализуются (регистр, ё→е,
+отсечение окончаний), поиск поддерживает префиксы («науш» → «наушники»)
+и ранжирует результаты по качеству совпадения и value_score
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'[0-9a-zа-я]+')
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Окончания для простого стемминга, от длинных к коротким
+SUFFIXES = sorted([
+    'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ом', 'ем',
+    'ах', 'ях', 'ов', 'ев', 'ей', 'ию', 'ью', 'ия', 'ья', 'ам', 'ям', 'ую', 'юю',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+# Основа не короче этого числа букв
+MIN_STEM = 3
+# Префиксы короче не раскрываются: «н» совпало бы почти со всем каталогом
+MIN_PREFIX = 2
+# Сколько слов словаря раскрывает один префикс
+PREFIX_EXPANSION_LIMIT = 100
+
+# Баллы за качество совпадения слова запроса
+EXACT_MATCH = 3
+STEM_MATCH = 2
+PREFIX_MATCH = 1
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбивает текст на слова: нижний регистр, ё→е
+    """
+    return TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+
+
+def stem(token: str) -> str:
+    """
+    Отсекает типичное окончание русского слова
+    """
+    if not CYRILLIC_RE.search(token):
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def _contains(sorted_array: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Маска: какие из values есть в отсортированном массиве (бинарный поиск)
+    """
+    if not len(sorted_array):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_array, values)
+    positions[positions == len(sorted_array)] = 0
+    return sorted_array[positions] == values
+
+
+class SearchIndex:
+    """
+    Индекс названий: слово и основа → отсортированные номера товаров в рейтинге
+    Номера идут в порядке рейтинга (по убыванию value_score), поэтому
+    при равном качестве совпадения выгоднее тот товар, чей номер меньше
+    """
+
+    def __init__(self, names: Sequence[Optional[str]]):
+        postings: Dict[str, List[int]] = {}
+        for index, name in enumerate(names):
+            if not name:
+                continue
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(index)
+
+        self.tokens: Dict[str, np.ndarray] = {
+            token: np.array(indexes, dtype=np.int64) for token, indexes in postings.items()
+        }
+
+        # Отсортированный словарь для поиска по префиксу
+        self.vocabulary = sorted(self.tokens)
+
+        # Основа считается один раз на слово словаря, а не на вхождение
+        by_stem: Dict[str, List[np.ndarray]] = {}
+        for token in self.vocabulary:
+            by_stem.setdefault(stem(token), []).append(self.tokens[token])
+        self.stems: Dict[str, np.ndarray] = {
+            key: arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+            for key, arrays in by_stem.items()
+        }
+
+    @classmethod
+    def from_products(cls, products: Sequence[Mapping[str, Any]]) -> 'SearchIndex':
+        """
+        Строит индекс по рейтингу (списку словарей или бинарному снимку)
+        """
+        if hasattr(products, 'strings'):
+            # Снимок: колонка названий читается целиком, без записей товаров
+            return cls(products.strings('name'))
+        return cls([p.get('name') for p in products])
+
+    def _groups(self, token: str) -> List[Tuple[np.ndarray, int]]:
+        """
+        Списки товаров для слова запроса с баллом качества каждого списка
+        """
+        groups = [
+            (self.tokens.get(token, _EMPTY), EXACT_MATCH),
+            (self.stems.get(stem(token), _EMPTY), STEM_MATCH),
+        ]
+
+        if len(token) >= MIN_PREFIX:
+            start = bisect_left(self.vocabulary, token)
+            for word in self.vocabulary[start:start + PREFIX_EXPANSION_LIMIT]:
+                if not word.startswith(token):
+                    break
+                if word != token:
+                    groups.append((self.tokens[word], PREFIX_MATCH))
+
+        return [(array, quality) for array, quality in groups if len(array)]
+
+    @staticmethod
+    def _top(groups: List[Tuple[np.ndarray, int]], limit: int) -> List[int]:
+        """
+        Лучшие товары одного слова: достаточно первых limit номеров каждого списка
+        """
+        chosen = _EMPTY
+        for level in (EXACT_MATCH, STEM_MATCH, PREFIX_MATCH):
+            heads = [array[:limit + len(chosen)] for array, quality in groups if quality == level]
+            if not heads:
+                continue
+            level_top = np.setdiff1d(np.unique(np.concatenate(heads)), chosen, assume_unique=True)
+            chosen = np.concatenate([chosen, level_top[:limit - len(chosen)]])
+            if len(chosen) >= limit:
+                break
+        return chosen.tolist()
+
+    def search(self, query: str, limit: int = 5, mask: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Номера товаров, в названии которых есть все слова запроса
+        Лучшие совпадения первыми, при равенстве — более выгодные
+        mask — булева маска допустимых товаров (фильтры из utils.facets)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            # Только фильтры: лучшие по рейтингу среди подходящих
+            if mask is None:
+                return []
+            return np.flatnonzero(mask)[:limit].tolist()
+
+        # Начинаем с самого редкого слова, остальные только проверяем бинарным поиском
+        token_groups = sorted(
+            (self._groups(token) for token in tokens),
+            key=lambda groups: sum(len(array) for array, _ in groups)
+        )
+        if not token_groups[0]:
+            return []
+        if len(token_groups) == 1 and mask is None:
+            return self._top(token_groups[0], limit)
+
+        candidates = np.unique(np.concatenate([array for array, _ in token_groups[0]]))
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        quality = self._quality(token_groups[0], candidates)
+
+        for groups in token_groups[1:]:
+            other_quality = self._quality(groups, candidates)
+            matched = other_quality > 0
+            candidates = candidates[matched]
+            quality = quality[matched] + other_quality[matched]
+            if not len(candidates):
+                return []
+
+        # Качество совпадения, затем место в рейтинге
+        order = np.lexsort((candidates, -quality))
+        return candidates[order[:limit]].tolist()
+
+    @staticmethod
+    def _quality(groups: List[Tuple[np.ndarray, int]], candidates: np.ndarray) -> np.ndarray:
+        """
+        Лучший балл слова для каждого кандидата (0 — слово не найдено)
+        """
+        quality = np.zeros(len(candidates), dtype=np.int64)
+        for array, level in groups:
+            hit = _contains(array, candidates)
+            quality[hit] = np.maximum(quality[hit], level)
+        return quality
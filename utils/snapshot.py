@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бинарный снимок объединённого рейтинга для бота
+Числовые поля лежат в массивах фиксированной ширины, строки — в общем
+блоке байт с таблицей смещений. Файл открывается через mmap без разбора:
+поля читаются по номеру товара, словари не строятся
+
+Формат файла:
+    MAGIC (8 байт) | длина заголовка (uint32) | заголовок JSON | выравнивание до 8
+    (в заголовке — число товаров, расположение колонок и отпечатки выгрузок)
+    далее для каждой колонки: флаги наличия (uint8 × n), затем
+    значения (int64/float64 × n) или смещения (uint64 × (n + 1)) и байты строк
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.product import as_dict
+
+MAGIC = b'PRSNAP01'
+
+# Снимок лежит рядом с merged.jsonl
+SNAPSHOT_FILE = 'merged.snap'
+
+# Колонки снимка: (поле, тип). Всё остальное уходит в JSON колонку EXTRA_FIELD
+COLUMNS: List[Tuple[str, str]] = [
+    ('id', 'str'),
+    ('name', 'str'),
+    ('store', 'str'),
+    ('category', 'str'),
+    ('emoji', 'str'),
+    ('url', 'str'),
+    ('image', 'str'),
+    ('price', 'int'),
+    ('old_price', 'int'),
+    ('discount', 'int'),
+    ('reviews', 'int'),
+    ('rating', 'float'),
+    ('value_score', 'int'),
+    ('final_score', 'int'),
+]
+EXTRA_FIELD = '_extra'
+
+_DTYPES = {'int': np.int64, 'float': np.float64}
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _fits(kind: str, value) -> bool:
+    """
+    Можно ли положить значение в колонку без потери типа
+    Остальные значения сохраняются в EXTRA_FIELD как есть
+    """
+    if kind == 'str':
+        return isinstance(value, str)
+    if kind == 'int':
+        return type(value) is int and _INT64_MIN <= value <= _INT64_MAX
+    return type(value) is float
+
+
+class SnapshotBuilder:
+    """
+    Накапливает товары по колонкам и пишет снимок на диск
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.present = {name: bytearray() for name, _ in COLUMNS + [(EXTRA_FIELD, 'str')]}
+        self.values = {name: array('q' if kind == 'int' else 'd') for name, kind in COLUMNS if kind != 'str'}
+        self.blobs = {name: bytearray() for name, kind in COLUMNS + [(EXTRA_FIELD, 'str')] if kind == 'str'}
+        self.offsets = {name: array('Q', [0]) for name in self.blobs}
+
+    def add(self, product: Dict[str, Any]):
+        """
+        Добавляет товар в конец снимка
+        """
+        product = as_dict(product)
+        extra = {}
+        for key, value in product.items():
+            if key not in self.present or key == EXTRA_FIELD:
+                extra[key] = value
+
+        for name, kind in COLUMNS:
+            value = product.get(name)
+            present = name in product and _fits(kind, value)
+            if name in product and not present:
+                extra[name] = value
+            self._put(name, kind, value if present else None, present)
+
+        self._put(EXTRA_FIELD, 'str', json.dumps(extra, ensure_ascii=False) if extra else None, bool(extra))
+        self.count += 1
+
+    def _put(self, name: str, kind: str, value, present: bool):
+        self.present[name].append(1 if present else 0)
+        if kind == 'str':
+            if present:
+                self.blobs[name] += value.encode('utf-8')
+            self.offsets[name].append(len(self.blobs[name]))
+        else:
+            self.values[name].append(value if present else 0)
+
+    def write(self, path: str, sources: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Атомарно записывает снимок в path
+        sources — отпечатки выгрузок, из которых собран снимок (сохраняются в заголовке)
+        Возвращает количество товаров
+        """
+        blocks = []
+        columns = []
+        position = 0
+
+        def place(data: bytes) -> int:
+            nonlocal position
+            offset = position
+            blocks.append(data)
+            blocks.append(b'\0' * (_align(len(data)) - len(data)))
+            position += _align(len(data))
+            return offset
+
+        for name, kind in COLUMNS + [(EXTRA_FIELD, 'str')]:
+            column = {'name': name, 'type': kind, 'present': place(bytes(self.present[name]))}
+            if kind == 'str':
+                column['offsets'] = place(self.offsets[name].tobytes())
+                column['data'] = place(bytes(self.blobs[name]))
+                column['size'] = len(self.blobs[name])
+            else:
+                column['values'] = place(self.values[name].tobytes())
+            columns.append(column)
+
+        header = {'count': self.count, 'columns': columns}
+        if sources is not None:
+            header['sources'] = sources
+        header = json.dumps(header).encode('utf-8')
+        prefix = MAGIC + struct.pack('<I', len(header)) + header
+        prefix += b'\0' * (_align(len(prefix)) - len(prefix))
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix)
+            for block in blocks:
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        return self.count
+
+
+def write_snapshot(products: Iterable[Dict[str, Any]], path: str,
+                   sources: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Пишет снимок товаров в заданном порядке
+    """
+    builder = SnapshotBuilder()
+    for product in products:
+        builder.add(product)
+    return builder.write(path, sources)
+
+
+class SnapshotRecord(Mapping):
+    """
+    Товар снимка: ведёт себя как словарь только для чтения,
+    поля декодируются при обращении
+    """
+
+    __slots__ = ('snapshot', 'index')
+
+    def __init__(self, snapshot: 'Snapshot', index: int):
+        self.snapshot = snapshot
+        self.index = index
+
+    def __getitem__(self, key: str):
+        return self.snapshot.field(self.index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        snapshot = self.snapshot
+        for name, _ in COLUMNS:
+            if snapshot.present[name][self.index]:
+                yield name
+        yield from snapshot.extra(self.index)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"SnapshotRecord({self.to_dict()!r})"
+
+
+class Snapshot:
+    """
+    Открытый снимок: последовательность товаров в порядке рейтинга
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mm[:len(MAGIC)] != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path}: не снимок товаров")
+
+        header_size, = struct.unpack_from('<I', self.mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self.mm[header_start:header_start + header_size])
+        base = _align(header_start + header_size)
+
+        self.count = header['count']
+        self.sources = header.get('sources')
+        self.kinds = {}
+        self.present = {}
+        self.values = {}
+        self.offsets = {}
+        self.data = {}
+
+        for column in header['columns']:
+            name = column['name']
+            self.kinds[name] = column['type']
+            self.present[name] = np.frombuffer(self.mm, np.uint8, self.count, base + column['present'])
+            if column['type'] == 'str':
+                self.offsets[name] = np.frombuffer(self.mm, np.uint64, self.count + 1, base + column['offsets'])
+                self.data[name] = (base + column['data'], column['size'])
+            else:
+                self.values[name] = np.frombuffer(self.mm, _DTYPES[column['type']], self.count, base + column['values'])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SnapshotRecord(self, i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return SnapshotRecord(self, index)
+
+    def __iter__(self) -> Iterator[SnapshotRecord]:
+        for i in range(self.count):
+            yield SnapshotRecord(self, i)
+
+    def _string(self, name: str, index: int) -> str:
+        start, _ = self.data[name]
+        offsets = self.offsets[name]
+        return self.mm[start + int(offsets[index]):start + int(offsets[index + 1])].decode('utf-8')
+
+    def extra(self, index: int) -> Dict[str, Any]:
+        """
+        Поля товара, не попавшие в колонки
+        """
+        if not self.present[EXTRA_FIELD][index]:
+            return {}
+        return json.loads(self._string(EXTRA_FIELD, index))
+
+    def field(self, index: int, name: str):
+        """
+        Значение поля товара; KeyError, если у товара его нет
+        """
+        kind = self.kinds.get(name) if name != EXTRA_FIELD else None
+        if kind is not None and self.present[name][index]:
+            if kind == 'str':
+                return self._string(name, index)
+            return self.values[name][index].item()
+
+        extra = self.extra(index)
+        if name in extra:
+            return extra[name]
+        raise KeyError(name)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Числовая колонка целиком (без копирования; отсутствующие значения — нули)
+        """
+        return self.values[name]
+
+    def strings(self, name: str) -> List[Optional[str]]:
+        """
+        Строковая колонка целиком (None, если у товара нет поля)
+        """
+        start, size = self.data[name]
+        blob = self.mm[start:start + size]
+        offsets = self.offsets[name].tolist()
+        present = self.present[name].tolist()
+        return [
+            blob[offsets[i]:offsets[i + 1]].decode('utf-8') if present[i] else None
+            for i in range(self.count)
+        ]
+
+    def close(self):
+        # Массивы numpy держат ссылку на буфер: закрыть mmap можно, только когда их нет
+        self.present = self.values = self.offsets = {}
+        try:
+            self.mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Модуль для сохранения и чтения результатов парсеров
+Товары хранятся в JSON Lines (по товару на строку), при желании со сжатием gzip
+"""
+
+import gzip
+import json
+import os
+import sys
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import OUTPUT_GZIP
+except ImportError:
+    OUTPUT_GZIP = os.getenv('OUTPUT_GZIP', '') == '1'
+
+from utils.product import as_dict
+
+# Расширения выгрузок: новый построчный формат и старый JSON массив
+PRODUCT_EXTENSIONS = ('.jsonl.gz', '.jsonl', '.json')
+
+# Файлы в data/, которые не являются выгрузками магазинов
+MERGED_FILE = 'merged.jsonl'
+# Отпечатки выгрузок, из которых собран merged.jsonl
+MERGED_SOURCES_FILE = 'merged.sources.json'
+SERVICE_NAMES = {'users', 'merged', 'merged.sources'}
+
+
+def store_output_path(name: str, data_dir: str = 'data', compress: bool = OUTPUT_GZIP) -> str:
+    """
+    Путь к выгрузке магазина: data/<name>.jsonl или data/<name>.jsonl.gz
+    """
+    return os.path.join(data_dir, f"{name}.jsonl{'.gz' if compress else ''}")
+
+
+def _open_text(path: str, mode: str, compress: Optional[bool] = None):
+    """
+    Открывает текстовый файл, сжатый или обычный (по умолчанию — по расширению)
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class ProductWriter:
+    """
+    Потоковая запись товаров
+    Каждый товар сразу дописывается строкой в журнал <path>.part;
+    commit() собирает итоговый файл и атомарно подменяет им path.
+    Если запуск упал, журнал остаётся на диске и его подхватит recover_journals()
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + '.part'
+        self.count = 0
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.journal = open(self.journal_path, 'w', encoding='utf-8')
+    
+    def write(self, product: Dict[str, Any]):
+        """
+        Дописывает товар в журнал
+        """
+        self.journal.write(json.dumps(as_dict(product), ensure_ascii=False) + '\n')
+        self.journal.flush()
+        self.count += 1
+    
+    def commit(self, ranked: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+        """
+        Атомарно публикует файл
+        ranked — итоговый порядок товаров; без него файл повторяет журнал
+        Возвращает количество записанных товаров
+        """
+        self.journal.close()
+        source = ranked if ranked is not None else iter_jsonl(self.journal_path)
+        count = write_products_atomic(source, self.path)
+        os.remove(self.journal_path)
+        return count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if not self.journal.closed:
+            self.journal.close()
+        if exc_type is not None:
+            print(f"⚠️ Запуск прерван, {self.count} товаров сохранены в журнале {self.journal_path}")
+        return False
+
+
+def write_products_atomic(products: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Пишет товары построчно во временный файл и атомарно переименовывает его в path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    count = 0
+    
+    with _open_text(tmp_path, 'w', compress=path.endswith('.gz')) as f:
+        for product in products:
+            f.write(json.dumps(as_dict(product), ensure_ascii=False) + '\n')
+            count += 1
+    
+    # Данные должны лечь на диск раньше, чем файл подменит старый
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    
+    return count
+
+
+def recover_journals(data_dir: str = 'data', limit: Optional[int] = None) -> List[str]:
+    """
+    Превращает оставшиеся от упавших запусков журналы в выгрузки
+    Журнал используется, только если он новее готового файла
+    Возвращает пути восстановленных файлов
+    """
+    from utils.topk import TopK
+    
+    recovered = []
+    if not os.path.isdir(data_dir):
+        return recovered
+    
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith('.part'):
+            continue
+        
+        journal_path = os.path.join(data_dir, filename)
+        path = journal_path[:-len('.part')]
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(journal_path):
+            continue
+        
+        # Журнал идёт в порядке обхода: ранжируем его ограниченной кучей
+        top = TopK(limit if limit is not None else sys.maxsize)
+        for product in iter_jsonl(journal_path):
+            top.push(product)
+        
+        count = write_products_atomic(top.sorted(), path)
+        os.remove(journal_path)
+        recovered.append(path)
+        print(f"♻️ Восстановлено {count} товаров из журнала {filename}")
+    
+    return recovered
+
+
+def _store_name(filename: str) -> Optional[str]:
+    """
+    Имя магазина по имени файла выгрузки или None для посторонних файлов
+    """
+    for extension in PRODUCT_EXTENSIONS:
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return None
+
+
+def is_store_file(filename: str) -> bool:
+    """
+    Является ли файл выгрузкой магазина (а не users.json, merged.jsonl и т.п.)
+    """
+    name = _store_name(filename)
+    return bool(name) and name not in SERVICE_NAMES
+
+
+def list_store_files(data_dir: str = 'data') -> List[str]:
+    """
+    Возвращает пути к выгрузкам магазинов в data/
+    Если у магазина есть файлы в разных форматах, берётся самый свежий
+    """
+    if not os.path.isdir(data_dir):
+        return []
+    
+    latest = {}
+    for filename in os.listdir(data_dir):
+        if not is_store_file(filename):
+            continue
+        name = _store_name(filename)
+        path = os.path.join(data_dir, filename)
+        if name not in latest or os.path.getmtime(path) > os.path.getmtime(latest[name]):
+            latest[name] = path
+    
+    return [latest[name] for name in sorted(latest)]
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает товары из JSON Lines (в том числе .jsonl.gz)
+    Оборванная последняя строка (запись прервалась) пропускается
+    """
+    with _open_text(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ {path}: пропущена повреждённая строка")
+                continue
+            if isinstance(item, dict):
+                yield item
+
+
+def iter_products(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает выгрузку магазина в любом поддерживаемом формате
+    """
+    if path.endswith('.json'):
+        return iter_json_array(path)
+    return iter_jsonl(path)
+
+
+def iter_json_array(path: str, chunk_size: int = 64 * 1024) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает JSON массив товаров (старый формат .json), не загружая файл целиком
+    Файлы, где лежит не массив, пропускаются
+    """
+    decoder = json.JSONDecoder()
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+        
+        while True:
+            # Пропускаем пробелы и запятые между элементами
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            
+            if pos >= len(buffer):
+                if eof:
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = chunk
+                pos = 0
+                continue
+            
+            if not started:
+                if buffer[pos] != '[':
+                    print(f"⚠️ {path}: ожидался массив товаров, файл пропущен")
+                    return
+                started = True
+                pos += 1
+                continue
+            
+            if buffer[pos] == ']':
+                return
+            
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент не поместился в буфер: дочитываем
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            
+            if isinstance(item, dict):
+                yield item
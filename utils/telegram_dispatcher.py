@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Общая очередь исходящих сообщений Telegram
+Все отправки бота и постера идут через неё: очередь с приоритетами,
+token bucket на общий лимит Bot API (~30 сообщений/сек) и на каждый чат,
+повтор после 429 с retry_after и склейка подряд идущих текстов одному чату
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Union
+
+from telegram.error import RetryAfter
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE
+except ImportError:
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '28'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', str(20 / 60)))
+
+# Приоритеты: меньше — раньше
+PRIORITY_HIGH = 0  # ответы на команды
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2  # рассылки и постинг
+
+# Лимит длины сообщения Bot API (для склейки текстов)
+MESSAGE_LIMIT = 4096
+# Сколько сообщений чату можно отправить подряд, прежде чем включится лимит скорости
+CHAT_BURST = 3
+# Сколько раз повторять запрос после 429
+MAX_RETRIES = 5
+# При таком числе корзин чатов удаляем корзины простаивающих чатов
+BUCKETS_PRUNE_AT = 10000
+
+ChatId = Union[int, str]
+
+
+class TokenBucket:
+    """
+    Token bucket без ожидания внутри: только считает, когда можно отправить
+    Стоимость больше ёмкости разрешена — корзина уходит в минус
+    (альбом из 10 фото занимает лимит на 10 сообщений вперёд)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float, now: float) -> float:
+        """
+        Через сколько секунд можно отправить запрос стоимостью cost
+        """
+        self._refill(now)
+        need = min(cost, self.capacity)
+        wait = 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, cost: float, now: float):
+        self._refill(now)
+        self.tokens -= cost
+
+    def pause(self, seconds: float, now: float):
+        """
+        429: не отправлять ничего seconds секунд и начать после паузы с пустой корзины
+        """
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class OutgoingMessage:
+    """
+    Запрос к Bot API в очереди и ожидающие его результат
+    """
+
+    __slots__ = ('method', 'kwargs', 'priority', 'cost', 'seq', 'attempts', 'futures')
+
+    def __init__(self, method: str, kwargs: Dict[str, Any], priority: int, cost: int, seq: int):
+        self.method = method
+        self.kwargs = kwargs
+        self.priority = priority
+        self.cost = cost
+        self.seq = seq
+        self.attempts = 0
+        self.futures: List[asyncio.Future] = []
+
+    def can_merge(self, kwargs: Dict[str, Any], priority: int) -> bool:
+        """
+        Можно ли дописать текст к этому сообщению
+        Кнопки допустимы только у последнего текста склейки; приоритет должен совпадать,
+        иначе ответ на команду ждал бы в очереди вместе с рассылкой
+        """
+        if self.method != 'send_message' or self.kwargs.get('reply_markup') is not None:
+            return False
+        if self.priority != priority:
+            return False
+        options = lambda data: {k: v for k, v in data.items() if k not in ('chat_id', 'text', 'reply_markup')}
+        return options(self.kwargs) == options(kwargs)
+
+
+class TelegramDispatcher:
+    """
+    Диспетчер исходящих сообщений поверх telegram.Bot
+    Сообщения одному чату уходят строго по порядку и по одному за раз,
+    разные чаты обслуживаются параллельно в пределах общего лимита
+    """
+
+    def __init__(self, bot=None, global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 chat_rate: float = TELEGRAM_CHAT_RATE, group_rate: float = TELEGRAM_GROUP_RATE,
+                 max_retries: int = MAX_RETRIES):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        # Небольшая ёмкость: за любую секунду уходит не больше rate + capacity сообщений
+        self.global_bucket = TokenBucket(global_rate, global_rate / 10)
+        self.chat_buckets: Dict[ChatId, TokenBucket] = {}
+
+        self.queues: Dict[ChatId, deque] = {}
+        self.ready: List[tuple] = []  # (приоритет, номер, чат) — чаты, готовые к отправке
+        self.sleeping: List[tuple] = []  # (время, номер, чат) — чаты, ждущие свой лимит
+        self.scheduled = set()  # чаты в ready, sleeping или с сообщением в полёте
+        self.seq = itertools.count()
+
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.deliveries = set()
+
+        # Счётчики
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+
+    # ========== ОТПРАВКА ==========
+
+    async def send_message(self, chat_id: ChatId, text: str, priority: int = PRIORITY_HIGH,
+                           coalesce: bool = True, **kwargs):
+        """
+        Отправляет текст; если в очереди чата последним стоит такой же текст,
+        дописывает к нему и возвращает общее сообщение
+        """
+        kwargs['text'] = text
+        queue = self.queues.get(chat_id)
+        if coalesce and queue:
+            tail = queue[-1]
+            if tail.can_merge(kwargs, priority) and len(tail.kwargs['text']) + 2 + len(text) <= MESSAGE_LIMIT:
+                tail.kwargs['text'] += '\n\n' + text
+                tail.kwargs['reply_markup'] = kwargs.get('reply_markup')
+                self.coalesced += 1
+                future = asyncio.get_running_loop().create_future()
+                tail.futures.append(future)
+                return await future
+        return await self.submit('send_message', chat_id, priority, **kwargs)
+
+    async def send_photo(self, chat_id: ChatId, photo, priority: int = PRIORITY_HIGH, **kwargs):
+        return await self.submit('send_photo', chat_id, priority, photo=photo, **kwargs)
+
+    async def send_media_group(self, chat_id: ChatId, media, priority: int = PRIORITY_HIGH, **kwargs):
+        # Каждое фото альбома Telegram считает отдельным сообщением
+        return await self.submit('send_media_group', chat_id, priority, cost=len(media), media=media, **kwargs)
+
+    async def edit_message_text(self, chat_id: ChatId, message_id: int, text: str,
+                                priority: int = PRIORITY_NORMAL, **kwargs):
+        return await self.submit('edit_message_text', chat_id, priority,
+                                 message_id=message_id, text=text, **kwargs)
+
+    def submit(self, method: str, chat_id: ChatId, priority: int = PRIORITY_NORMAL,
+               cost: int = 1, **kwargs) -> asyncio.Future:
+        """
+        Ставит вызов метода Bot API в очередь чата
+        Возвращает future с результатом метода или его исключением
+        """
+        self._ensure_started()
+        kwargs['chat_id'] = chat_id
+        message = OutgoingMessage(method, kwargs, priority, max(1, cost), next(self.seq))
+        future = asyncio.get_running_loop().create_future()
+        message.futures.append(future)
+
+        self.queues.setdefault(chat_id, deque()).append(message)
+        if chat_id not in self.scheduled:
+            self.scheduled.add(chat_id)
+            heapq.heappush(self.ready, (priority, message.seq, chat_id))
+            self.wakeup.set()
+        return future
+
+    # ========== ПЛАНИРОВЩИК ==========
+
+    def _ensure_started(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def _bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Каналы (@name) и группы (отрицательный ID) ограничены строже личных чатов
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_rate if is_group else self.chat_rate, CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _push_ready(self, chat_id: ChatId):
+        head = self.queues[chat_id][0]
+        heapq.heappush(self.ready, (head.priority, head.seq, chat_id))
+
+    async def _wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+
+            while self.sleeping and self.sleeping[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self.sleeping)
+                self._push_ready(chat_id)
+
+            if not self.ready:
+                await self._wait(self.sleeping[0][0] - now if self.sleeping else None)
+                continue
+
+            _, _, chat_id = self.ready[0]
+            message = self.queues[chat_id][0]
+
+            if all(future.cancelled() for future in message.futures):
+                # Результат никто не ждёт (например, остановленная рассылка) — не отправляем
+                heapq.heappop(self.ready)
+                self.queues[chat_id].popleft()
+                self._release(chat_id)
+                continue
+
+            # Общий лимит: ждём, но просыпаемся и при новом сообщении с более высоким приоритетом
+            wait = self.global_bucket.delay(message.cost, now)
+            if wait > 0:
+                await self._wait(wait)
+                continue
+
+            heapq.heappop(self.ready)
+            bucket = self._bucket(chat_id)
+            wait = bucket.delay(message.cost, now)
+            if wait > 0:
+                heapq.heappush(self.sleeping, (now + wait, message.seq, chat_id))
+                continue
+
+            self.queues[chat_id].popleft()
+            self.global_bucket.take(message.cost, now)
+            bucket.take(message.cost, now)
+
+            delivery = asyncio.get_running_loop().create_task(self._deliver(chat_id, message))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+
+            if len(self.chat_buckets) > BUCKETS_PRUNE_AT:
+                self._prune(now)
+
+    async def _deliver(self, chat_id: ChatId, message: OutgoingMessage):
+        try:
+            result = await getattr(self.bot, message.method)(**message.kwargs)
+        except RetryAfter as e:
+            message.attempts += 1
+            if message.attempts <= self.max_retries:
+                # Повторяем первым в очереди чата после паузы, которую назвал Telegram
+                self.retried += 1
+                now = time.monotonic()
+                self._bucket(chat_id).pause(e.retry_after, now)
+                self.global_bucket.pause(0, now)
+                self.queues[chat_id].appendleft(message)
+                heapq.heappush(self.sleeping, (now + e.retry_after, message.seq, chat_id))
+                self.wakeup.set()
+                return
+            self._finish(message, error=e)
+        except Exception as e:
+            self._finish(message, error=e)
+        else:
+            self._finish(message, result=result)
+
+        # Следующее сообщение чата — только после ответа на предыдущее
+        self._release(chat_id)
+        self.wakeup.set()
+
+    def _release(self, chat_id: ChatId):
+        """
+        Возвращает чат в очередь готовых или снимает с учёта, если сообщений больше нет
+        """
+        if self.queues[chat_id]:
+            self._push_ready(chat_id)
+        else:
+            del self.queues[chat_id]
+            self.scheduled.discard(chat_id)
+
+    def _finish(self, message: OutgoingMessage, result: Any = None, error: Optional[BaseException] = None):
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+        for future in message.futures:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _prune(self, now: float):
+        """
+        Удаляет корзины чатов без сообщений, у которых лимит полностью восстановился
+        """
+        for chat_id in [c for c, b in self.chat_buckets.items() if c not in self.scheduled and b.is_full(now)]:
+            del self.chat_buckets[chat_id]
+
+    # ========== ЖИЗНЕННЫЙ ЦИКЛ ==========
+
+    def pending(self) -> int:
+        """
+        Сообщений в очередях и в полёте
+        """
+        return sum(len(queue) for queue in self.queues.values()) + len(self.deliveries)
+
+    async def stop(self, timeout: float = 30):
+        """
+        Дожидается отправки очереди (не дольше timeout) и останавливает планировщик
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def __aenter__(self) -> 'TelegramDispatcher':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики отправок
+        """
+        return {
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retried': self.retried,
+            'failed': self.failed,
+            'queued': self.pending(),
+        }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Ограниченный отбор лучших товаров
+Min-куча размера K: память и сортировка O(K) вместо O(N)
+"""
+
+import heapq
+from itertools import count
+from typing import Dict, Any, List, Optional
+
+
+class TopK:
+    """
+    Хранит K товаров с наибольшим value_score
+    При равных оценках остаётся тот, что пришёл раньше (как при стабильной сортировке)
+    Товар, чей ID уже есть в топе, повторно не добавляется
+    """
+    
+    def __init__(self, k: int, key: str = 'value_score', id_key: str = 'id'):
+        self.k = k
+        self.key = key
+        self.id_key = id_key
+        self.heap = []
+        self.ids = set()
+        self.counter = count()
+        self.pushed = 0
+        self.rejected = 0
+    
+    def __len__(self) -> int:
+        return len(self.heap)
+    
+    def push(self, product: Dict[str, Any]) -> bool:
+        """
+        Предлагает товар; возвращает True, если он попал в топ
+        """
+        self.pushed += 1
+        product_id = product.get(self.id_key)
+        if self.k <= 0 or (product_id is not None and product_id in self.ids):
+            self.rejected += 1
+            return False
+        
+        # Более поздний товар с той же оценкой считается хуже
+        entry = (product.get(self.key, 0), -next(self.counter), product)
+        
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            self.ids.add(product_id)
+            return True
+        
+        if entry[:2] > self.heap[0][:2]:
+            evicted = heapq.heapreplace(self.heap, entry)
+            self.ids.discard(evicted[2].get(self.id_key))
+            self.ids.add(product_id)
+            return True
+        
+        self.rejected += 1
+        return False
+    
+    @property
+    def threshold(self) -> Optional[float]:
+        """
+        Оценка, которую нужно превысить, чтобы попасть в заполненный топ
+        """
+        if len(self.heap) < self.k:
+            return None
+        return self.heap[0][0]
+    
+    def is_saturated(self, max_score: float) -> bool:
+        """
+        Топ заполнен оценками не ниже максимально возможной:
+        дальнейший обход уже не изменит результат
+        """
+        threshold = self.threshold
+        return threshold is not None and threshold >= max_score
+    
+    def sorted(self) -> List[Dict[str, Any]]:
+        """
+        Товары топа по убыванию оценки
+        """
+        return [entry[2] for entry in sorted(self.heap, key=lambda e: e[:2], reverse=True)]
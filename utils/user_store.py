@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Хранилище пользователей и подписчиков на SQLite
+Заменяет data/users.json: проверка подписки читает одну строку по ключу
+(с кешем в памяти процесса), активация меняет одну строку, а не
+переписывает весь файл. При первом запуске пользователи переносятся из JSON
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional
+
+# Добавляем путь к проекту для импорта config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import USER_CACHE_TTL_SECONDS
+except ImportError:
+    USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+
+# Дата окончания у пользователей без подписки (как раньше в users.json)
+NO_EXPIRES = '2000-01-01'
+# Пользователей за один запрос при обходе для рассылки
+RECIPIENTS_PAGE = 1000
+
+
+def _parse_expires(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value or NO_EXPIRES)
+    except (TypeError, ValueError):
+        return None
+
+
+class UserStore:
+    """
+    Пользователи с ключом user_id
+    Дата окончания подписки — отдельная колонка с индексом, остальные поля
+    (способ оплаты, имя и т.п.) хранятся JSON-ом, как в прежнем файле.
+    Кроме подписчиков хранятся все, кто запускал бота (для рассылок),
+    и флаг blocked у тех, кто бота заблокировал
+    """
+
+    def __init__(self, db_path: str = 'data/users.db',
+                 json_path: Optional[str] = 'data/users.json',
+                 cache_ttl: float = USER_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+
+        # user_id → (окончание подписки или None, когда прочитано)
+        self.cache: Dict[str, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                expires TEXT NOT NULL,
+                data TEXT NOT NULL,
+                blocked INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(users)')}
+        if 'blocked' not in columns:
+            # База, созданная до появления рассылок
+            self.conn.execute('ALTER TABLE users ADD COLUMN blocked INTEGER NOT NULL DEFAULT 0')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS users_expires ON users (expires)')
+        self.conn.commit()
+
+        if json_path:
+            self.migrate_json(json_path)
+
+    def migrate_json(self, json_path: str) -> int:
+        """
+        Переносит пользователей из users.json, если база ещё пустая
+        Файл после переноса переименовывается в .migrated, чтобы не импортировать его повторно
+        Возвращает количество перенесённых пользователей
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+
+        with self.lock:
+            if self.conn.execute('SELECT 1 FROM users LIMIT 1').fetchone():
+                return 0
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO users (user_id, expires, data) VALUES (?, ?, ?)',
+                    (self._row(user_id, data) for user_id, data in users.items())
+                )
+
+        os.replace(json_path, json_path + '.migrated')
+        return len(users)
+
+    @staticmethod
+    def _row(user_id, data: Dict[str, Any]) -> tuple:
+        return (str(user_id), data.get('expires') or NO_EXPIRES, json.dumps(data, ensure_ascii=False))
+
+    def get(self, user_id) -> Optional[Dict[str, Any]]:
+        """
+        Данные пользователя или None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data FROM users WHERE user_id = ?', (str(user_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, user_id, data: Dict[str, Any]):
+        """
+        Создаёт или заменяет запись одного пользователя одной транзакцией
+        """
+        row = self._row(user_id, data)
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO users (user_id, expires, data) VALUES (?, ?, ?) '
+                    'ON CONFLICT(user_id) DO UPDATE SET expires = excluded.expires, data = excluded.data',
+                    row
+                )
+            self.cache[row[0]] = (_parse_expires(row[1]), time.monotonic())
+
+    def touch(self, user_id, username: Optional[str] = None, first_name: Optional[str] = None):
+        """
+        Запоминает пользователя, запустившего бота, чтобы рассылка до него дошла
+        Существующую запись не меняет, только снимает отметку о блокировке
+        """
+        data = {'expires': NO_EXPIRES, 'username': username, 'first_name': first_name}
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO users (user_id, expires, data) VALUES (?, ?, ?) '
+                    'ON CONFLICT(user_id) DO UPDATE SET blocked = 0',
+                    (str(user_id), NO_EXPIRES, json.dumps(data, ensure_ascii=False))
+                )
+
+    def mark_blocked(self, user_id):
+        """
+        Пользователь заблокировал бота: следующие рассылки его пропускают
+        """
+        with self.lock:
+            with self.conn:
+                self.conn.execute('UPDATE users SET blocked = 1 WHERE user_id = ?', (str(user_id),))
+
+    def iter_recipients(self, after: str = '', page: int = RECIPIENTS_PAGE) -> Iterator[str]:
+        """
+        ID незаблокировавших пользователей по возрастанию, начиная после after
+        Читает страницами по первичному ключу, так что память не зависит от числа пользователей
+        """
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    'SELECT user_id FROM users WHERE user_id > ? AND blocked = 0 ORDER BY user_id LIMIT ?',
+                    (after, page)
+                ).fetchall()
+            if not rows:
+                return
+            for (user_id,) in rows:
+                yield user_id
+            after = rows[-1][0]
+
+    def count_recipients(self, after: str = '') -> int:
+        with self.lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM users WHERE user_id > ? AND blocked = 0', (after,)
+            ).fetchone()[0]
+
+    def is_premium(self, user_id) -> bool:
+        """
+        Активна ли подписка
+        Окончание подписки кешируется на cache_ttl секунд, в том числе для
+        пользователей без записи — именно они чаще всего открывают платные команды
+        """
+        key = str(user_id)
+        now = time.monotonic()
+
+        cached = self.cache.get(key)
+        if cached is not None and now - cached[1] < self.cache_ttl:
+            self.hits += 1
+            expires = cached[0]
+        else:
+            self.misses += 1
+            with self.lock:
+                row = self.conn.execute(
+                    'SELECT expires FROM users WHERE user_id = ?', (key,)
+                ).fetchone()
+            expires = _parse_expires(row[0]) if row else None
+            self.cache[key] = (expires, now)
+
+        return expires is not None and expires > datetime.now()
+
+    def subscribers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Пользователи, у которых была подписка {user_id: данные}, по дате окончания (для админа)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT user_id, data FROM users WHERE expires > ? ORDER BY expires DESC', (NO_EXPIRES,)
+            ).fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def count_active(self) -> int:
+        """
+        Число активных подписок (по индексу expires)
+        """
+        with self.lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM users WHERE expires > ?', (datetime.now().isoformat(),)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики кеша проверок подписки
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': len(self.cache),
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()